@@ -1,15 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.security import get_current_admin_user
-from app.db.session import get_session
+from app.core.security import (
+    get_current_admin_user,
+    invalidate_cached_user,
+    token_cache,
+    user_cache
+)
+from app.core.hashing import password_hasher
+from app.core.catalog_cache import (
+    catalog_cache,
+    invalidate_product,
+    invalidate_listings,
+    stock_changed
+)
+from app.core.config import get_settings
+from app.core.export import ENCODERS, EXPORT_MEDIA_TYPES
+from app.core.imports import DECODERS, IMPORT_MEDIA_TYPES
+from app.core.pagination import count_rows
+from app.db.session import get_session, async_engine, replica_router
+from app.db.analytics import category_breakdown, report_range, revenue_series, top_products
+from app.db.attributes import sync_product_attributes
+from app.db.facets import FacetCounts
+from app.db.orders import order_filters, fetch_order_page, load_order_with_items
+from app.db.idempotency import idempotency_key_cleaner
+from app.db.jobs import FAILED, job_worker, queue_stats, retry_job
+from app.db.product_import import ImportReport, import_products
+from app.db.product_updates import BulkUpdateResult, bulk_update_products
 from app.models.user import User
 from app.models.product import Product
-from app.models.order import Order, OrderItem
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
-from app.schemas.order import OrderResponse, OrderListResponse, OrderDetailResponse, OrderItemResponse
+from app.models.order import Order, OrderStatus
+from app.models.job import BackgroundJob
+from app.schemas.product import (
+    ProductCreate,
+    ProductUpdate,
+    ProductResponse,
+    ProductImportResponse,
+    ProductBulkUpdate,
+    ProductBulkUpdateResponse
+)
+from app.schemas.user import AdminUserUpdate, UserResponse
+from app.schemas.order import OrderResponse, OrderListResponse, OrderDetailResponse
+from app.schemas.job import BackgroundJobResponse
+from app.schemas.analytics import CategoryReport, RevenueReport, TopProductsReport
 from datetime import datetime
 
+settings = get_settings()
 router = APIRouter()
 
 
@@ -18,27 +57,75 @@ router = APIRouter()
 async def create_product(
     product_data: ProductCreate,
     current_admin: User = Depends(get_current_admin_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Create a new product (Admin only)"""
     product = Product(**product_data.model_dump())
     
     session.add(product)
-    session.commit()
-    session.refresh(product)
+    await session.flush()
+    await sync_product_attributes(session, product)
+    counts = FacetCounts()
+    counts.add_product(product)
+    await counts.write(await session.connection())
+    await session.commit()
+    await session.refresh(product)
+    
+    invalidate_listings()
     
     return product
 
 
+@router.patch("/products", response_model=ProductBulkUpdateResponse)
+async def bulk_update_products_endpoint(
+    bulk_data: ProductBulkUpdate,
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Update price, stock and/or is_active of many products (Admin only)
+
+    Updates are applied in chunks of PRODUCT_BULK_UPDATE_CHUNK_SIZE products,
+    each committed on its own. When an id appears more than once, later
+    entries win field by field. Unknown ids are skipped and returned.
+    """
+    if len(bulk_data.updates) > settings.PRODUCT_BULK_UPDATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.PRODUCT_BULK_UPDATE_MAX_ITEMS} updates per request"
+        )
+    
+    updates = {}
+    for item in bulk_data.updates:
+        updates.setdefault(item.id, {}).update(item.model_dump(exclude={"id"}, exclude_none=True))
+    
+    result = BulkUpdateResult()
+    try:
+        await bulk_update_products(session, updates, settings.PRODUCT_BULK_UPDATE_CHUNK_SIZE, result)
+    finally:
+        # Stock-only changes get the same bounded staleness as checkouts
+        stock_only = [product_id for product_id in result.changed if updates[product_id].keys() == {"stock"}]
+        stock_changed(stock_only)
+        for product_id in result.changed.difference(stock_only):
+            invalidate_product(product_id)
+    
+    return {
+        "received": len(bulk_data.updates),
+        "matched": result.matched,
+        "updated": len(result.changed),
+        "unknown_ids": result.unknown_ids
+    }
+
+
 @router.put("/products/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: int,
     product_data: ProductUpdate,
     current_admin: User = Depends(get_current_admin_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Update a product (Admin only)"""
-    product = session.get(Product, product_id)
+    # Locked so its facet counts are moved from the state this update replaces
+    product = await session.get(Product, product_id, with_for_update=True)
     
     if not product:
         raise HTTPException(
@@ -47,15 +134,23 @@ async def update_product(
         )
     
     # Update fields
+    counts = FacetCounts()
+    counts.add_product(product, -1)
     update_data = product_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(product, key, value)
+    counts.add_product(product)
     
     product.updated_at = datetime.utcnow()
     
     session.add(product)
-    session.commit()
-    session.refresh(product)
+    if "sizes" in update_data or "colors" in update_data:
+        await sync_product_attributes(session, product)
+    await counts.write(await session.connection())
+    await session.commit()
+    await session.refresh(product)
+    
+    invalidate_product(product.id)
     
     return product
 
@@ -64,10 +159,10 @@ async def update_product(
 async def delete_product(
     product_id: int,
     current_admin: User = Depends(get_current_admin_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Delete a product (Admin only)"""
-    product = session.get(Product, product_id)
+    product = await session.get(Product, product_id, with_for_update=True)
     
     if not product:
         raise HTTPException(
@@ -76,37 +171,179 @@ async def delete_product(
         )
     
     # Soft delete by setting is_active to False
+    counts = FacetCounts()
+    counts.add_product(product, -1)
     product.is_active = False
     session.add(product)
-    session.commit()
+    await counts.write(await session.connection())
+    await session.commit()
+    
+    invalidate_product(product_id)
     
     return None
 
 
+@router.post("/products/import", response_model=ProductImportResponse)
+async def import_products_upload(
+    request: Request,
+    import_format: Optional[str] = Query(None, alias="format", regex="^(csv|ndjson)$"),
+    upsert_by: Optional[str] = Query(None, regex="^(id|name)$"),
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Bulk import products from a CSV or NDJSON request body (Admin only)
+
+    The body is parsed as it arrives and written in batches of
+    PRODUCT_IMPORT_BATCH_SIZE rows, each committed on its own. Rows that fail
+    validation are skipped and reported by line number. With upsert_by,
+    rows matching an existing product by id or name update it instead.
+    CSV list cells (sizes, colors, images) are separated by "|".
+    """
+    if import_format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        import_format = IMPORT_MEDIA_TYPES.get(content_type)
+        if import_format is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson"
+            )
+    
+    report = ImportReport(settings.PRODUCT_IMPORT_MAX_ERRORS)
+    try:
+        await import_products(
+            session,
+            DECODERS[import_format](request.stream()),
+            upsert_by,
+            settings.PRODUCT_IMPORT_BATCH_SIZE,
+            report
+        )
+    finally:
+        # Earlier batches are committed even if a later one fails
+        if report.inserted or report.updated:
+            invalidate_listings()
+        for product_id in report.updated_ids:
+            invalidate_product(product_id)
+    
+    return report.as_dict()
+
+
+# User Management
+@router.put("/users/{user_id}", response_model=UserResponse)
+async def update_user(
+    user_id: int,
+    user_data: AdminUserUpdate,
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Activate/deactivate a user or change their admin flag (Admin only)"""
+    user = await session.get(User, user_id)
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    update_data = user_data.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(user, key, value)
+    
+    user.updated_at = datetime.utcnow()
+    
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    
+    # Cached copies would keep the old permissions until they expire
+    invalidate_cached_user(user.id)
+    
+    return user
+
+
 # Order Management
 @router.get("/orders", response_model=OrderListResponse)
 async def list_all_orders(
+    page_size: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    count: str = Query("exact", regex="^(exact|approx|none)$"),
     current_admin: User = Depends(get_current_admin_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    """Get list of all orders (Admin only)"""
-    statement = select(Order).order_by(Order.created_at.desc())
-    orders = session.exec(statement).all()
+    """Get a page of orders, newest first (Admin only)
+
+    Filters on status, user and creation time (`created_from` inclusive,
+    `created_to` exclusive). Pass the returned `next_cursor` as `cursor` to
+    fetch the following page. `count` works as for the product list.
+    """
+    statement = select(Order).where(
+        *order_filters(order_status, user_id, created_from, created_to)
+    )
+    
+    total, total_is_estimate = await count_rows(
+        session, statement, count, settings.ORDER_COUNT_CAP
+    )
+    
+    orders, next_cursor = await fetch_order_page(session, statement, page_size, cursor)
     
     return {
         "orders": orders,
-        "total": len(orders)
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": next_cursor
     }
 
 
+@router.get("/orders/export")
+async def export_orders(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Download every matching order as NDJSON or CSV (Admin only)
+
+    Rows are streamed from a server-side cursor in batches of
+    ORDER_EXPORT_BATCH_SIZE, so memory use does not grow with the export.
+    """
+    columns = list(Order.__table__.columns)
+    statement = (
+        select(*columns)
+        .where(*order_filters(order_status, user_id, created_from, created_to))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .execution_options(yield_per=settings.ORDER_EXPORT_BATCH_SIZE)
+    )
+    
+    async def batches():
+        # The request's session is closed before the body is sent, so the
+        # stream holds its own connection for as long as it runs
+        async with AsyncSession(async_engine) as session:
+            result = await session.stream(statement)
+            async for rows in result.partitions():
+                yield rows
+    
+    encode = ENCODERS[export_format]
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        encode([column.name for column in columns], batches()),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/orders/{order_id}", response_model=OrderDetailResponse)
 async def get_order_detail(
     order_id: int,
     current_admin: User = Depends(get_current_admin_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Get order details (Admin only)"""
-    order = session.get(Order, order_id)
+    order = await load_order_with_items(session, order_id)
     
     if not order:
         raise HTTPException(
@@ -114,11 +351,158 @@ async def get_order_detail(
             detail="Order not found"
         )
     
-    # Get order items
-    statement = select(OrderItem).where(OrderItem.order_id == order_id)
-    items = session.exec(statement).all()
+    body = OrderDetailResponse.from_order(order).model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+# Sales analytics
+def checked_report_range(start: Optional[datetime], end: Optional[datetime]):
+    """report_range(), rejecting empty ranges"""
+    start, end = report_range(start, end)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    return start, end
+
+
+@router.get("/analytics/revenue", response_model=RevenueReport)
+async def revenue_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = Query("day", regex="^(hour|day)$"),
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Orders, units, subtotal, tax and revenue per hour or day (Admin only)
+
+    Covers the last 30 days unless `start`/`end` are given; both are
+    rounded out to whole hours, and `start` to the day for daily buckets.
+    Read from the sales rollups, which count orders when they are placed
+    and leave out pending and cancelled ones. Buckets without sales are
+    omitted.
+    """
+    start, end = checked_report_range(start, end)
+    buckets = await revenue_series(session, start, end, granularity)
+    totals = {
+        column: sum(bucket[column] for bucket in buckets)
+        for column in ("orders", "units", "subtotal", "tax", "revenue")
+    }
+    for column in ("subtotal", "tax", "revenue"):
+        totals[column] = round(totals[column], 2)
+    
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "buckets": buckets,
+        "totals": totals
+    }
+
+
+@router.get("/analytics/top-products", response_model=TopProductsReport)
+async def top_products_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+    by: str = Query("revenue", regex="^(revenue|units)$"),
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Best-selling products by revenue (before tax) or units (Admin only)
+
+    The range works as for the revenue report.
+    """
+    start, end = checked_report_range(start, end)
+    
+    return {
+        "start": start,
+        "end": end,
+        "products": await top_products(session, start, end, limit, by)
+    }
+
+
+@router.get("/analytics/categories", response_model=CategoryReport)
+async def category_report(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Orders, units and revenue (before tax) per category (Admin only)
+
+    The range works as for the revenue report.
+    """
+    start, end = checked_report_range(start, end)
+    
+    return {
+        "start": start,
+        "end": end,
+        "categories": await category_breakdown(session, start, end)
+    }
+
+
+# Background jobs
+@router.get("/jobs", response_model=List[BackgroundJobResponse])
+async def list_jobs(
+    job_status: str = Query(FAILED, alias="status", regex="^(queued|failed)$"),
+    kind: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """List background jobs, newest first; failed ones by default (Admin only)"""
+    statement = select(BackgroundJob).where(BackgroundJob.status == job_status)
+    if kind:
+        statement = statement.where(BackgroundJob.kind == kind)
+    statement = statement.order_by(BackgroundJob.id.desc()).limit(limit)
     
-    return OrderDetailResponse(
-        **order.model_dump(),
-        items=[OrderItemResponse(**item.model_dump()) for item in items]
-    )
\ No newline at end of file
+    return (await session.exec(statement)).all()
+
+
+@router.post("/jobs/{job_id}/retry", response_model=BackgroundJobResponse)
+async def retry_failed_job(
+    job_id: int,
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Queue a failed background job again, with fresh attempts (Admin only)"""
+    if not await retry_job(session, job_id):
+        job = await session.get(BackgroundJob, job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Only failed jobs can be retried"
+        )
+    
+    job_worker.notify()
+    
+    return await session.get(BackgroundJob, job_id)
+
+
+# Operational metrics
+@router.get("/metrics")
+async def get_metrics(
+    current_admin: User = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """Get in-process performance counters (Admin only)
+
+    `jobs` is this process's worker activity, plus the queue as a whole.
+    """
+    return {
+        "password_hashing": password_hasher.stats(),
+        "auth_cache": {
+            "tokens": token_cache.stats(),
+            "users": user_cache.stats()
+        },
+        "catalog_cache": catalog_cache.stats(),
+        "idempotency_key_cleaner": idempotency_key_cleaner.stats(),
+        "jobs": {**job_worker.stats(), "queue": await queue_stats(session)},
+        "replicas": replica_router.stats()
+    }
\ No newline at end of file
@@ -1,13 +1,15 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    password_needs_rehash,
     create_access_token,
-    get_current_user
+    get_current_user,
+    invalidate_cached_user
 )
+from app.core.hashing import password_hasher
 from app.core.config import get_settings
 from app.db.session import get_session
 from app.models.user import User
@@ -20,12 +22,12 @@ router = APIRouter()
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: UserRegister,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Register a new user"""
     # Check if user exists
     statement = select(User).where(User.email == user_data.email)
-    existing_user = session.exec(statement).first()
+    existing_user = (await session.exec(statement)).first()
     
     if existing_user:
         raise HTTPException(
@@ -36,14 +38,14 @@ async def register(
     # Create new user
     user = User(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await password_hasher.hash(user_data.password),
         full_name=user_data.full_name,
         phone=user_data.phone
     )
     
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     return user
 
@@ -51,14 +53,14 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(
     user_data: UserLogin,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Login and get access token"""
     # Find user
     statement = select(User).where(User.email == user_data.email)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user or not await password_hasher.verify(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -71,10 +73,17 @@ async def login(
             detail="Inactive user"
         )
     
+    # Upgrade hashes made with a different bcrypt cost than configured
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await password_hasher.hash(user_data.password)
+        session.add(user)
+        await session.commit()
+        invalidate_cached_user(user.id)
+    
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.id}, expires_delta=access_token_expires
+        data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -1,10 +1,19 @@
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.security import get_current_user
+from app.core.catalog_cache import stock_changed
+from app.core.config import get_settings
+from app.core.pagination import count_rows
 from app.db.session import get_session
+from app.db.idempotency import IN_PROGRESS, claim_key, complete_key, release_key, request_hash
+from app.db.inventory import reserve_stock
+from app.db.jobs import job_worker
+from app.db.orders import order_filters, fetch_order_page, load_order_with_items, queue_order_followups
 from app.models.user import User
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
@@ -12,34 +21,112 @@ from app.schemas.order import (
     OrderCreate,
     OrderResponse,
     OrderDetailResponse,
-    OrderListResponse,
-    OrderItemResponse
+    OrderListResponse
 )
 
+settings = get_settings()
 router = APIRouter()
 
 
 @router.post("", response_model=OrderDetailResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    """Create a new order"""
+    """Create a new order
+
+    Send a unique `Idempotency-Key` header per checkout to make retries
+    safe. Repeating the request with the same key returns the first
+    response (marked `Idempotent-Replayed: true`) instead of placing
+    another order. A repeat that arrives while the first request is still
+    running gets 409. Reusing a key for a different order gets 422. Failed
+    requests are not remembered.
+    """
+    user_id = current_user.id
+    
+    if idempotency_key is not None:
+        fingerprint = request_hash(order_data.model_dump_json())
+        existing, claimed_at = await claim_key(session, user_id, idempotency_key, fingerprint)
+        if existing is not None:
+            if existing.request_hash != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used for a different order"
+                )
+            if existing.status == IN_PROGRESS:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="An order with this Idempotency-Key is still being placed",
+                    headers={"Retry-After": "1"}
+                )
+            return Response(
+                content=existing.response_body,
+                status_code=existing.response_status,
+                media_type="application/json",
+                headers={"Idempotent-Replayed": "true"}
+            )
+    
+    try:
+        order, requested = await place_order(session, user_id, order_data)
+        body = OrderDetailResponse.from_order(order).model_dump_json()
+        # Stored with the order, so a replay never refers to a rolled-back one
+        if idempotency_key is not None and not await complete_key(
+            session, user_id, idempotency_key, claimed_at, status.HTTP_201_CREATED, body
+        ):
+            # Taken over as stale while this request ran: the new holder
+            # places the order, this one must not
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="An order with this Idempotency-Key is still being placed",
+                headers={"Retry-After": "1"}
+            )
+        await session.commit()
+    except Exception:
+        # Let the client retry the same key once the cart is fixed
+        if idempotency_key is not None:
+            await session.rollback()
+            await release_key(session, user_id, idempotency_key, claimed_at)
+        raise
+    stock_changed(requested)
+    job_worker.notify()
     
+    return Response(content=body, status_code=status.HTTP_201_CREATED, media_type="application/json")
+
+
+async def place_order(
+    session: AsyncSession,
+    user_id: int,
+    order_data: OrderCreate
+) -> Tuple[Order, Dict[int, int]]:
+    """Validate the cart, insert the order, reserve stock and queue the
+    order's follow-ups, all uncommitted.
+
+    Returns the order (items loaded) and the quantity taken per product.
+    """
     if not order_data.items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Order must contain at least one item"
         )
     
+    # Load every referenced product in one query
+    product_ids = {item.product_id for item in order_data.items}
+    statement = select(Product).where(col(Product.id).in_(product_ids))
+    products = {product.id: product for product in (await session.exec(statement)).all()}
+    
+    # Quantity requested per product (a cart may hold one product in several sizes)
+    requested = defaultdict(int)
+    for item in order_data.items:
+        requested[item.product_id] += item.quantity
+    
     # Calculate totals and validate products
     subtotal = 0.0
     order_items_data = []
     
     for item in order_data.items:
-        # Get product
-        product = session.get(Product, item.product_id)
+        product = products.get(item.product_id)
         
         if not product or not product.is_active:
             raise HTTPException(
@@ -48,7 +135,7 @@ async def create_order(
             )
         
         # Validate stock
-        if product.stock < item.quantity:
+        if product.stock < requested[product.id]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Insufficient stock for product {product.name}"
@@ -87,7 +174,7 @@ async def create_order(
     
     # Create order
     order = Order(
-        user_id=current_user.id,
+        user_id=user_id,
         subtotal=subtotal,
         tax=tax,
         total_amount=total_amount,
@@ -101,59 +188,72 @@ async def create_order(
         shipping_phone=order_data.shipping_address.shipping_phone
     )
     
-    session.add(order)
-    session.commit()
-    session.refresh(order)
-    
-    # Create order items and update stock
-    order_items = []
-    for item_data in order_items_data:
-        product = item_data["product"]
-        
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=product.id,
-            product_name=product.name,
-            product_image=product.images[0] if product.images else None,
+    # Items go in through the relationship, so one flush inserts the order
+    # and then its items; everything below is one transaction
+    order.items = [
+        OrderItem(
+            product_id=item_data["product"].id,
+            product_name=item_data["product"].name,
+            product_image=item_data["product"].images[0] if item_data["product"].images else None,
             unit_price=item_data["unit_price"],
             quantity=item_data["quantity"],
             selected_size=item_data["selected_size"],
             selected_color=item_data["selected_color"]
         )
-        
-        session.add(order_item)
-        order_items.append(order_item)
-        
-        # Update product stock
-        product.stock -= item_data["quantity"]
-        product.popularity += item_data["quantity"]  # Increase popularity
-        session.add(product)
-    
-    session.commit()
+        for item_data in order_items_data
+    ]
+    session.add(order)
+    await session.flush()
     
-    # Refresh order items
-    for order_item in order_items:
-        session.refresh(order_item)
+    # Reserve stock last so product rows stay locked only until the commit.
+    # The check above is just a fast path; this is what prevents overselling.
+    unavailable = await reserve_stock(session, requested)
+    if unavailable:
+        # Read the name before rolling back, which expires loaded objects
+        product_name = products[unavailable[0]].name
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient stock for product {product_name}"
+        )
     
-    # Return order with items
-    return OrderDetailResponse(
-        **order.model_dump(),
-        items=[OrderItemResponse(**item.model_dump()) for item in order_items]
-    )
+    # Everything that can wait runs in the background once this commits
+    await queue_order_followups(session, order, requested)
+    return order, requested
 
 
 @router.get("", response_model=OrderListResponse)
 async def list_orders(
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    count: str = Query("exact", regex="^(exact|approx|none)$"),
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    """Get list of orders for current user"""
-    statement = select(Order).where(Order.user_id == current_user.id).order_by(Order.created_at.desc())
-    orders = session.exec(statement).all()
+    """Get a page of the current user's orders, newest first
+
+    Filters on status and creation time (`created_from` inclusive,
+    `created_to` exclusive). Pass the returned `next_cursor` as `cursor` to
+    fetch the following page.
+    """
+    statement = select(Order).where(
+        *order_filters(order_status, current_user.id, created_from, created_to)
+    )
+    
+    total, total_is_estimate = await count_rows(
+        session, statement, count, settings.ORDER_COUNT_CAP
+    )
+    
+    orders, next_cursor = await fetch_order_page(session, statement, page_size, cursor)
     
     return {
         "orders": orders,
-        "total": len(orders)
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": next_cursor
     }
 
 
@@ -161,10 +261,10 @@ async def list_orders(
 async def get_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Get order details"""
-    order = session.get(Order, order_id)
+    order = await load_order_with_items(session, order_id)
     
     if not order:
         raise HTTPException(
@@ -179,11 +279,6 @@ async def get_order(
             detail="Not authorized to access this order"
         )
     
-    # Get order items
-    statement = select(OrderItem).where(OrderItem.order_id == order_id)
-    items = session.exec(statement).all()
-    
-    return OrderDetailResponse(
-        **order.model_dump(),
-        items=[OrderItemResponse(**item.model_dump()) for item in items]
-    )
\ No newline at end of file
+    # Validate once from the loaded ORM objects and serialize directly
+    body = OrderDetailResponse.from_order(order).model_dump_json()
+    return Response(content=body, media_type="application/json")
@@ -1,14 +1,100 @@
-from typing import Optional, List
-from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session, select, col, func
+from datetime import datetime
+from typing import Dict, Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import Integer, String, cast, literal, literal_column, tuple_, union_all
+from sqlmodel import select, col, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.session import get_session
-from app.models.product import Product
-from app.schemas.product import ProductResponse, ProductListResponse
+from app.core.catalog_cache import (
+    catalog_cache,
+    product_tag,
+    LIST_TAG,
+    POPULARITY_SORT_TAG
+)
+from app.core.config import get_settings
+from app.core.pagination import NUMBER, encode_cursor, decode_cursor, count_rows
+from app.db.search import apply_search, search_condition
+from app.db.session import get_read_session
+from app.db.attributes import SIZE, COLOR
+from app.db.facets import facet_combination_rows, facet_count_rows
+from app.models.product import Product, ProductAttribute
+from app.schemas.product import (
+    ProductResponse,
+    ProductListResponse,
+    ProductFacetsResponse
+)
 
+settings = get_settings()
 router = APIRouter()
 
 
+# Sort column and direction for each sort_by option. id breaks ties so the
+# ordering is total, which keyset pagination relies on.
+SORT_KEYS = {
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+    "newest": (Product.created_at, True),
+    "popularity": (Product.popularity, True),
+}
+
+# What a cursor must carry for each sort column
+CURSOR_TYPES = {
+    Product.price.key: NUMBER,
+    Product.created_at.key: datetime,
+    Product.popularity.key: NUMBER,
+}
+
+
+def build_filters(
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    size: Optional[str],
+    color: Optional[str]
+) -> Dict[str, list]:
+    """WHERE conditions for the catalog filters, grouped by facet"""
+    filters = {"category": [], "price": [], "size": [], "color": []}
+    
+    if category:
+        filters["category"].append(Product.category == category)
+    
+    if min_price is not None:
+        filters["price"].append(Product.price >= min_price)
+    
+    if max_price is not None:
+        filters["price"].append(Product.price <= max_price)
+    
+    # Sizes and colors are matched through the indexed product_attributes table
+    if size:
+        filters["size"].append(col(Product.id).in_(
+            select(ProductAttribute.product_id)
+            .where(ProductAttribute.kind == SIZE, ProductAttribute.value == size)
+        ))
+    
+    if color:
+        filters["color"].append(col(Product.id).in_(
+            select(ProductAttribute.product_id)
+            .where(ProductAttribute.kind == COLOR, ProductAttribute.value == color)
+        ))
+    
+    return filters
+
+
+def all_conditions(filters: Dict[str, list], exclude: Optional[str] = None) -> list:
+    """Flatten filters (optionally leaving one facet out) plus the active check"""
+    conditions = [Product.is_active == True]
+    for facet, facet_conditions in filters.items():
+        if facet != exclude:
+            conditions.extend(facet_conditions)
+    return conditions
+
+
+def substring_search(search: str):
+    """Legacy ILIKE search (PRODUCT_SEARCH_MODE=substring)"""
+    search_term = f"%{search}%"
+    return (Product.name.ilike(search_term)) | (Product.description.ilike(search_term))
+
+
 @router.get("", response_model=ProductListResponse)
 async def list_products(
     page: int = Query(1, ge=1),
@@ -18,88 +104,273 @@ async def list_products(
     max_price: Optional[float] = None,
     size: Optional[str] = None,
     color: Optional[str] = None,
-    sort_by: Optional[str] = Query(None, regex="^(price_asc|price_desc|newest|popularity)$"),
+    sort_by: Optional[str] = Query(None, regex="^(price_asc|price_desc|newest|popularity|relevance)$"),
     search: Optional[str] = None,
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = None,
+    count: str = Query("exact", regex="^(exact|approx|none)$"),
+    session: AsyncSession = Depends(get_read_session)
 ):
-    """Get list of products with filters and pagination"""
+    """Get list of products with filters and pagination
+
+    Pass the returned `next_cursor` as `cursor` to fetch the following page
+    without an OFFSET scan (`page` is then ignored). `count=approx` stops
+    counting at PRODUCT_COUNT_CAP rows and `count=none` skips the count.
+    `sort_by=relevance` ranks full-text `search` matches and pages by
+    number only.
+    """
+    sort_key = sort_by or "newest"
+    if sort_key == "relevance" and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination is not available for relevance sorting"
+        )
     
-    # Build base query
-    statement = select(Product).where(Product.is_active == True)
+    # Serve from the response cache when possible
+    cache_key = (
+        "list", page, page_size, category, min_price, max_price,
+        size, color, sort_key, search, cursor, count
+    )
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
     
-    # Apply filters
-    if category:
-        statement = statement.where(Product.category == category)
+    # Not cached if a product it shows is written while it is being read
+    generation = catalog_cache.generation()
     
-    if min_price is not None:
-        statement = statement.where(Product.price >= min_price)
+    # Build base query and apply filters
+    filters = build_filters(category, min_price, max_price, size, color)
+    statement = select(Product).where(*all_conditions(filters))
     
-    if max_price is not None:
-        statement = statement.where(Product.price <= max_price)
+    rank = None
+    if search and settings.PRODUCT_SEARCH_MODE == "fulltext":
+        statement, rank = apply_search(statement, search, session.bind.dialect.name)
+    elif search:
+        statement = statement.where(substring_search(search))
     
-    if size:
-        # Filter products that have this size in their sizes JSON array
-        statement = statement.where(col(Product.sizes).contains([size]))
-    
-    if color:
-        # Filter products that have this color in their colors JSON array
-        statement = statement.where(col(Product.colors).contains([color]))
-    
-    if search:
-        search_term = f"%{search}%"
-        statement = statement.where(
-            (Product.name.ilike(search_term)) | 
-            (Product.description.ilike(search_term))
-        )
+    # Get total count
+    total, total_is_estimate = await count_rows(
+        session, statement, count, settings.PRODUCT_COUNT_CAP
+    )
     
-    # Apply sorting
-    if sort_by == "price_asc":
-        statement = statement.order_by(Product.price.asc())
-    elif sort_by == "price_desc":
-        statement = statement.order_by(Product.price.desc())
-    elif sort_by == "newest":
-        statement = statement.order_by(Product.created_at.desc())
-    elif sort_by == "popularity":
-        statement = statement.order_by(Product.popularity.desc())
+    # Apply sorting (relevance without a full-text search falls back to newest)
+    sort_column, descending = SORT_KEYS.get(sort_key, SORT_KEYS["newest"])
+    if sort_key == "relevance" and rank is not None:
+        statement = statement.order_by(rank.desc(), Product.id.desc())
+    elif descending:
+        statement = statement.order_by(sort_column.desc(), Product.id.desc())
     else:
-        statement = statement.order_by(Product.created_at.desc())
+        statement = statement.order_by(sort_column.asc(), Product.id.asc())
     
-    # Get total count
-    count_statement = select(func.count()).select_from(statement.alias())
-    total = session.exec(count_statement).one()
+    # Apply pagination: continue after the cursor row, or fall back to OFFSET
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, sort_key, [CURSOR_TYPES[sort_column.key], int])
+        position = tuple_(sort_column, Product.id)
+        after = tuple_(literal(last_value), literal(last_id))
+        statement = statement.where(position < after if descending else position > after)
+    else:
+        offset = (page - 1) * page_size
+        statement = statement.offset(offset)
     
-    # Apply pagination
-    offset = (page - 1) * page_size
-    statement = statement.offset(offset).limit(page_size)
+    # Fetch one extra row to know whether another page follows
+    statement = statement.limit(page_size + 1)
     
     # Execute query
-    products = session.exec(statement).all()
+    products = (await session.exec(statement)).all()
+    
+    next_cursor = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        last = products[-1]
+        if sort_key != "relevance":
+            next_cursor = encode_cursor(sort_key, [getattr(last, sort_column.key), last.id])
     
     # Calculate total pages
-    total_pages = (total + page_size - 1) // page_size
+    total_pages = (total + page_size - 1) // page_size if total is not None else None
     
-    return {
-        "products": products,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": total_pages
-    }
+    body = ProductListResponse(
+        products=[ProductResponse.model_validate(product) for product in products],
+        total=total,
+        total_is_estimate=total_is_estimate,
+        page=page,
+        page_size=page_size,
+        total_pages=total_pages,
+        next_cursor=next_cursor
+    ).model_dump_json().encode("utf-8")
+    
+    # Tag with every product shown so stock changes can expire just these pages
+    tags = [LIST_TAG] + [product_tag(product.id) for product in products]
+    if sort_key == "popularity":
+        tags.append(POPULARITY_SORT_TAG)
+    catalog_cache.set(cache_key, body, tags, generation)
+    
+    return Response(content=body, media_type="application/json")
+
+
+async def count_facet_rows(
+    session: AsyncSession,
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    size: Optional[str],
+    color: Optional[str],
+    search: Optional[str],
+    price_bucket_size: float
+) -> list:
+    """(facet, value, bucket, count) rows counted from the matching products"""
+    filters = build_filters(category, min_price, max_price, size, color)
+    dialect = session.bind.dialect.name
+    
+    if search and settings.PRODUCT_SEARCH_MODE == "fulltext":
+        filters["search"] = [search_condition(search, dialect)]
+    elif search:
+        filters["search"] = [substring_search(search)]
+    
+    def attribute_counts(kind: str):
+        return (
+            select(
+                literal_column(f"'{kind}'").label("facet"),
+                ProductAttribute.value.label("value"),
+                cast(None, Integer).label("bucket"),
+                func.count().label("count")
+            )
+            .select_from(ProductAttribute)
+            .join(Product, Product.id == ProductAttribute.product_id)
+            .where(ProductAttribute.kind == kind, *all_conditions(filters, exclude=kind))
+            .group_by(ProductAttribute.value)
+        )
+    
+    # Inlined (not a bind parameter) so SELECT and GROUP BY match on PostgreSQL.
+    # PostgreSQL rounds when casting to integer, SQLite truncates.
+    bucket = Product.price / literal_column(repr(float(price_bucket_size)))
+    if dialect == "postgresql":
+        bucket = func.floor(bucket)
+    bucket = cast(bucket, Integer)
+    
+    # All facets in one round trip
+    parts = [
+        select(
+            literal_column("'category'").label("facet"),
+            Product.category.label("value"),
+            cast(None, Integer).label("bucket"),
+            func.count().label("count")
+        )
+        .where(*all_conditions(filters, exclude="category"))
+        .group_by(Product.category),
+        attribute_counts(SIZE),
+        attribute_counts(COLOR),
+        select(
+            literal_column("'price'").label("facet"),
+            cast(None, String).label("value"),
+            bucket.label("bucket"),
+            func.count().label("count")
+        )
+        .where(*all_conditions(filters, exclude="price"))
+        .group_by(bucket),
+        select(
+            literal_column("'total'").label("facet"),
+            cast(None, String).label("value"),
+            cast(None, Integer).label("bucket"),
+            func.count().label("count")
+        )
+        .where(*all_conditions(filters)),
+    ]
+    return (await session.exec(union_all(*parts))).all()
+
+
+@router.get("/facets", response_model=ProductFacetsResponse)
+async def get_facets(
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    search: Optional[str] = None,
+    price_bucket_size: float = Query(500, gt=0, le=1_000_000),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """Get product counts per category, size, color and price bucket
+
+    Takes the same filters as the product list. Each facet is counted with
+    every filter except its own, so the counts show what picking another
+    value of that facet would return. Without a search, and with a bucket
+    size and price bounds that are multiples of 100, the counts are read
+    from the maintained counts (see app.db.facets) instead of counted.
+    """
+    cache_key = (
+        "facets", category, min_price, max_price, size, color, search, price_bucket_size
+    )
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    generation = catalog_cache.generation()
+    
+    rows = None
+    if min_price is None and max_price is None and not (size or color or search):
+        # Only the category filter: read the maintained counts
+        rows = await facet_count_rows(session, category or None, price_bucket_size)
+    elif not search:
+        rows = await facet_combination_rows(
+            session, category or None, min_price, max_price, size or None, color or None, price_bucket_size
+        )
+    if rows is None:
+        rows = await count_facet_rows(
+            session, category, min_price, max_price, size, color, search, price_bucket_size
+        )
+    
+    facets = {"category": [], SIZE: [], COLOR: [], "price": []}
+    total = 0
+    for facet, value, bucket_index, count in rows:
+        if facet == "total":
+            total = count
+        elif facet == "price":
+            facets["price"].append({
+                "min": bucket_index * price_bucket_size,
+                "max": (bucket_index + 1) * price_bucket_size,
+                "count": count
+            })
+        else:
+            facets[facet].append({"value": value, "count": count})
+    
+    def by_count(values):
+        return sorted(values, key=lambda facet: (-facet["count"], facet["value"]))
+    
+    body = ProductFacetsResponse(
+        total=total,
+        categories=by_count(facets["category"]),
+        sizes=by_count(facets[SIZE]),
+        colors=by_count(facets[COLOR]),
+        price_buckets=sorted(facets["price"], key=lambda bucket: bucket["min"])
+    ).model_dump_json().encode("utf-8")
+    
+    # Facets count active products only, so stock changes never affect them
+    catalog_cache.set(cache_key, body, [LIST_TAG], generation)
+    
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     """Get product by ID"""
-    product = session.get(Product, product_id)
+    cache_key = ("detail", product_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    generation = catalog_cache.generation()
+    
+    product = await session.get(Product, product_id)
     
     if not product or not product.is_active:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
     
-    return product
\ No newline at end of file
+    body = ProductResponse.model_validate(product).model_dump_json().encode("utf-8")
+    catalog_cache.set(cache_key, body, [product_tag(product.id)], generation)
+    
+    return Response(content=body, media_type="application/json")
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+In-process caching primitives.
+
+Caches are per worker process and not shared, so anything cached here must
+tolerate being stale for up to its TTL on workers that did not see the write.
+"""
+import sys
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Hashable, Iterable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache with a maximum size and per-entry expiry"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries when full"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Snapshot of size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    """LRU cache of rendered response bodies, bounded by entry count and bytes.
+
+    Entries carry tags (e.g. "product:42") so writes can drop or shorten the
+    life of exactly the entries they affect. Each such write bumps its tag's
+    generation: take generation() before reading the database and pass it to
+    set(), so a response read before a write is not cached after it.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [expires_at, body, tags, size]
+        self._tags = defaultdict(set)
+        self._generation = 0
+        self._tag_generations = {}  # tag -> generation of its last write
+        self._cleared_generation = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def generation(self) -> int:
+        """Current generation, to pass to set() for a response about to be read"""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Return the cached body, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(
+        self,
+        key: Hashable,
+        body: bytes,
+        tags: Iterable[str] = (),
+        generation: Optional[int] = None
+    ) -> None:
+        """Store a body, evicting the least recently used entries to fit.
+
+        With `generation` (from generation() before the read), the body is
+        dropped if any of its tags was written since.
+        """
+        size = len(body) + sys.getsizeof(key)
+        if self.ttl <= 0 or self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        tags = frozenset(tags)
+        if generation is not None and self._written_since(generation, tags):
+            self.stale_writes += 1
+            return
+
+        if key in self._data:
+            self._remove(key)
+
+        self._data[key] = [time.monotonic() + self.ttl, body, tags, size]
+        self.bytes += size
+        for tag in tags:
+            self._tags[tag].add(key)
+
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def invalidate(self, tag: str) -> None:
+        """Drop every entry carrying the tag"""
+        self._bump(tag)
+        for key in list(self._tags.get(tag, ())):
+            self._remove(key)
+            self.invalidations += 1
+
+    def expire_within(self, tag: str, seconds: float) -> None:
+        """Let entries carrying the tag live at most `seconds` longer"""
+        if seconds <= 0:
+            self.invalidate(tag)
+            return
+
+        self._bump(tag)
+        deadline = time.monotonic() + seconds
+        for key in self._tags.get(tag, ()):
+            entry = self._data[key]
+            entry[0] = min(entry[0], deadline)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._data.clear()
+        self._tags.clear()
+        self.bytes = 0
+        self._generation += 1
+        self._tag_generations.clear()
+        self._cleared_generation = self._generation
+
+    def _bump(self, tag: str) -> None:
+        self._generation += 1
+        self._tag_generations[tag] = self._generation
+
+    def _written_since(self, generation: int, tags: Iterable[str]) -> bool:
+        if self._cleared_generation > generation:
+            return True
+        return any(self._tag_generations.get(tag, 0) > generation for tag in tags)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags, size = self._data.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Snapshot of size, memory and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,49 @@
+"""
+Response cache for the public catalog endpoints.
+
+Products only change through the admin endpoints (invalidated precisely
+here) and through checkouts, which touch nothing but stock and popularity.
+Those are allowed to be stale for CATALOG_CACHE_STOCK_STALENESS_SECONDS
+so a busy product does not flush the cache on every order. A response
+read while such a write lands is not cached (see ResponseCache.set).
+"""
+from typing import Iterable
+
+from app.core.cache import ResponseCache
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Tags attached to cached entries
+LIST_TAG = "list"
+POPULARITY_SORT_TAG = "sort:popularity"
+
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+catalog_cache = ResponseCache(
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CATALOG_CACHE_MAX_BYTES,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_product(product_id: int):
+    """A product's details changed: drop its detail page and every listing"""
+    catalog_cache.invalidate(product_tag(product_id))
+    catalog_cache.invalidate(LIST_TAG)
+
+
+def invalidate_listings():
+    """A product was added: drop every listing"""
+    catalog_cache.invalidate(LIST_TAG)
+
+
+def stock_changed(product_ids: Iterable[int]):
+    """Stock/popularity moved: bound how long affected entries stay stale"""
+    staleness = settings.CATALOG_CACHE_STOCK_STALENESS_SECONDS
+    for product_id in product_ids:
+        catalog_cache.expire_within(product_tag(product_id), staleness)
+    catalog_cache.expire_within(POPULARITY_SORT_TAG, staleness)
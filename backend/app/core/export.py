@@ -0,0 +1,67 @@
+"""
+Incremental encoders for streaming exports.
+
+Each encoder turns batches of result rows into body chunks as they
+arrive, so a response body never holds more than one batch in memory.
+"""
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Iterable, List, Sequence
+
+import orjson
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+# A spreadsheet runs a cell starting with one of these as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _json_default(value):
+    # orjson encodes datetimes, dates and enums itself
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def ndjson_chunks(columns: List[str], batches: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    """One JSON object per row, one chunk per batch"""
+    async for rows in batches:
+        yield b"".join(
+            orjson.dumps(dict(zip(columns, row)), default=_json_default) + b"\n"
+            for row in rows
+        )
+
+
+async def csv_chunks(columns: List[str], batches: AsyncIterator[Sequence]) -> AsyncIterator[str]:
+    """A header line, then one CSV chunk per batch"""
+    yield _csv_text([columns])
+    async for rows in batches:
+        yield _csv_text([_csv_cell(value) for value in row] for row in rows)
+
+
+def _csv_cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Shipping details and the like are user input: keep them text
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_text(rows: Iterable[Iterable]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+ENCODERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+}
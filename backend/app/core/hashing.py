@@ -0,0 +1,115 @@
+"""
+Bounded worker pool for bcrypt hashing and verification.
+
+bcrypt is deliberately slow, so calling it from an async handler pins the
+event loop for the whole hash. Calls are dispatched to an executor instead,
+and once the backlog is full new calls are rejected with 503 rather than
+queuing without bound.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+from app.core.security import verify_password, get_password_hash
+
+settings = get_settings()
+
+
+def _timed_call(fn, submitted_at: float, *args):
+    """Run fn in a worker and return (seconds spent queued, result)"""
+    return time.monotonic() - submitted_at, fn(*args)
+
+
+class PasswordHasher:
+    """Dispatches bcrypt work to a thread or process pool with a bounded backlog"""
+
+    def __init__(self, executor: str, workers: int, queue_size: int):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor '{executor}'")
+        self.executor = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self._pool: Optional[Executor] = None
+
+        # Metrics
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hash"
+                )
+        return self._pool
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        loop = asyncio.get_running_loop()
+        try:
+            wait, result = await loop.run_in_executor(
+                self._get_pool(), _timed_call, fn, time.monotonic(), *args
+            )
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password in the pool"""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password in the pool"""
+        return await self._run(get_password_hash, password)
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth and wait time"""
+        return {
+            "executor": self.executor,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "peak_in_flight": self.peak_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (self.total_wait / self.completed * 1000) if self.completed else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
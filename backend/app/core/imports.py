@@ -0,0 +1,104 @@
+"""
+Incremental decoders for streaming uploads.
+
+Each decoder reads a request body chunk by chunk and yields one record at a
+time as (line number, fields, error), so an upload is never held in memory.
+A record that cannot be decoded is yielded with fields=None and an error
+message instead of aborting the whole upload.
+"""
+import codecs
+import csv
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import orjson
+
+Record = Tuple[int, Optional[Dict], Optional[str]]
+
+IMPORT_MEDIA_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# Separator for list values (sizes, colors, images) in CSV cells
+CSV_LIST_SEPARATOR = "|"
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a UTF-8 byte stream into lines (a leading BOM is dropped)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """One JSON object per line; blank lines are skipped"""
+    line_number = 0
+    async for line in _lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            fields = orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            yield line_number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(fields, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, fields, None
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """CSV with a header row.
+
+    Empty cells count as missing. List columns hold values separated by
+    CSV_LIST_SEPARATOR; the caller decides which columns those are.
+    """
+    header = None
+    line_number = 0
+    record, record_line = "", 0
+    async for line in _lines(chunks):
+        line_number += 1
+        record = f"{record}\n{line}" if record else line
+        record_line = record_line or line_number
+        # An odd number of quotes means a quoted cell continues on the next line
+        if record.count('"') % 2:
+            continue
+
+        text, start = record, record_line
+        record, record_line = "", 0
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Expected {len(header)} columns, found {len(values)}"
+            continue
+        yield start, {name: value for name, value in zip(header, values) if value != ""}, None
+
+    if record:
+        yield record_line, None, "Unterminated quoted field"
+
+
+def split_list(value) -> list:
+    """Turn a CSV list cell into a list (JSON arrays pass through)"""
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+    return value
+
+
+DECODERS = {
+    "csv": csv_records,
+    "ndjson": ndjson_records,
+}
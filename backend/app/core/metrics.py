@@ -0,0 +1,185 @@
+"""
+Prometheus metrics for HTTP traffic and the database pools.
+
+MetricsMiddleware is a plain ASGI middleware that records, per route
+template and method, a latency histogram, status-code counts and a
+histogram of SQL statements issued while the request ran. Pool gauges are
+read from the engines at scrape time, so they cost nothing per request.
+
+Values live in plain dicts in this process and are rendered in the
+Prometheus text format by render_metrics(). With several workers each one
+keeps its own numbers; scrape every worker (or run one per container).
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Label for requests that matched no route, so unknown paths cannot
+# create unbounded label values
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Statements executed in the current request; a one-item list so the
+# SQLAlchemy listener can bump it without touching the ContextVar
+_query_count: ContextVar[Optional[List[int]]] = ContextVar("query_count", default=None)
+
+
+class RouteStats:
+    """Counters for one (method, route) pair"""
+    __slots__ = ("latency_counts", "latency_sum", "query_counts", "query_sum", "statuses")
+
+    def __init__(self):
+        # Per bucket (not cumulative); the last slot is +Inf
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.query_counts = [0] * (len(QUERY_BUCKETS) + 1)
+        self.query_sum = 0
+        self.statuses: Dict[int, int] = {}
+
+
+class HttpMetrics:
+    """Request metrics for this worker process"""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+        self.engines: Dict[str, object] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, queries: int) -> None:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.latency_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.latency_sum += seconds
+        stats.query_counts[bisect_left(QUERY_BUCKETS, queries)] += 1
+        stats.query_sum += queries
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def track_engine(self, name: str, engine) -> None:
+        """Count statements per request and report the engine's pool"""
+        self.engines[name] = engine
+        event.listen(engine, "before_cursor_execute", _count_query)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding HttpMetrics"""
+
+    def __init__(self, app, metrics: HttpMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]  # Reported if the app fails before responding
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _query_count.set(queries)
+        metrics = self.metrics
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.in_flight -= 1
+            _query_count.reset(token)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            metrics.observe(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status[0],
+                seconds,
+                queries[0]
+            )
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _histogram(lines: List[str], name: str, bounds, counts: List[int], total, labels: dict) -> None:
+    cumulative = 0
+    for bound, count in zip(bounds, counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    cumulative += counts[-1]
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {total}")
+    lines.append(f"{name}_count{_labels(**labels)} {cumulative}")
+
+
+def render_metrics(metrics: HttpMetrics) -> str:
+    """Everything in the Prometheus text exposition format"""
+    lines = [
+        "# HELP http_requests_in_flight Requests currently being handled",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {metrics.in_flight}",
+        "# HELP http_requests_total Requests handled, by route template and status code",
+        "# TYPE http_requests_total counter",
+    ]
+    routes = sorted(metrics.routes.items())
+    for (method, route), stats in routes:
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        "# HELP http_request_duration_seconds Time to handle a request, including streaming the body",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), stats in routes:
+        _histogram(lines, "http_request_duration_seconds", LATENCY_BUCKETS, stats.latency_counts,
+                   stats.latency_sum, {"method": method, "route": route})
+
+    lines += [
+        "# HELP http_request_db_queries SQL statements executed per request",
+        "# TYPE http_request_db_queries histogram",
+    ]
+    for (method, route), stats in routes:
+        _histogram(lines, "http_request_db_queries", QUERY_BUCKETS, stats.query_counts,
+                   stats.query_sum, {"method": method, "route": route})
+
+    pool_gauges = [
+        ("db_pool_size", "Connections the pool keeps open", "size"),
+        ("db_pool_checked_out", "Connections currently in use", "checkedout"),
+        ("db_pool_checked_in", "Idle connections in the pool", "checkedin"),
+        ("db_pool_overflow", "Connections open beyond pool_size (negative while below it)", "overflow"),
+    ]
+    for name, help_text, method in pool_gauges:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for engine_name, engine in metrics.engines.items():
+            # Pools without a fixed size (e.g. SQLite's StaticPool) lack these
+            read = getattr(engine.pool, method, None)
+            if read is not None:
+                lines.append(f"{name}{_labels(engine=engine_name)} {read()}")
+
+    return "\n".join(lines) + "\n"
+
+
+http_metrics = HttpMetrics()
@@ -0,0 +1,165 @@
+"""
+Per-request SQL profiling.
+
+For a sampled share of requests (SQL_PROFILE_SAMPLE_RATE), ProfilingMiddleware
+records every statement the request runs: how many, total database time,
+the slowest one, and how often each statement shape repeats. The summary
+goes out in a Server-Timing header, so it shows up in the browser's
+network panel, and requests slower than SQL_PROFILE_SLOW_REQUEST_MS or
+repeating one statement shape SQL_PROFILE_REPEAT_THRESHOLD times (the
+usual sign of an N+1 loop) are logged.
+
+Requests that are not sampled pay one ContextVar lookup per statement.
+
+Tests can hold an endpoint to a query budget:
+
+    with query_budget(3):
+        response = await client.get("/api/orders/1", headers=headers)
+"""
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements longer than this are cut in logs and error messages
+STATEMENT_PREVIEW_CHARS = 500
+
+_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("sql_profile", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+# A parenthesised list of placeholders or literals, e.g. IN (?, ?, ?)
+_VALUE_LIST = re.compile(r"\(\s*(?:\?|%s|\$\d+|%\(\w+\)s|'[^']*'|-?\d+(?:\.\d+)?)(?:\s*,\s*(?:\?|%s|\$\d+|%\(\w+\)s|'[^']*'|-?\d+(?:\.\d+)?))*\s*\)")
+_LITERAL = re.compile(r"'[^']*'|\b-?\d+(?:\.\d+)?\b")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """The statement's shape: literals and IN-list lengths folded away"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _VALUE_LIST.sub("(?)", shape)
+    return _LITERAL.sub("?", shape)
+
+
+class RequestProfile:
+    """Statements recorded for one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = ""
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement
+        self.shapes[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int):
+        """(shape, count) for shapes run at least `threshold` times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self) -> str:
+        lines = [f"{self.count} statements, {self.total * 1000:.1f} ms in the database"]
+        if self.count:
+            statement = _WHITESPACE.sub(" ", self.slowest_statement)
+            lines.append(f"slowest ({self.slowest * 1000:.1f} ms): {statement[:STATEMENT_PREVIEW_CHARS]}")
+        for shape, count in self.shapes.most_common(5):
+            if count > 1:
+                lines.append(f"{count}x {shape[:STATEMENT_PREVIEW_CHARS]}")
+        return "\n  ".join(lines)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _profile.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def track_engine(engine) -> None:
+    """Record the engine's statements into the active profile, if any"""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail if the code inside runs more than `max_queries` statements"""
+    profile = RequestProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+    if profile.count > max_queries:
+        raise QueryBudgetExceeded(f"Query budget of {max_queries} exceeded: {profile.summary()}")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling a sample of requests"""
+
+    def __init__(self, app, sample_rate: float, slow_request_ms: float, repeat_threshold: int):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_request = slow_request_ms / 1000
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        # Leave a profile started by the caller (query_budget) alone
+        if (
+            scope["type"] != "http"
+            or _profile.get() is not None
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                timing = (
+                    f'db;dur={profile.total * 1000:.2f};desc="{profile.count} queries", '
+                    f"app;dur={elapsed * 1000:.2f}"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        token = _profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _profile.reset(token)
+            self.report(scope, profile, time.perf_counter() - started)
+
+    def report(self, scope, profile: RequestProfile, seconds: float) -> None:
+        request = f"{scope['method']} {scope['path']}"
+        if seconds >= self.slow_request:
+            logger.warning("Slow request %s took %.1f ms: %s", request, seconds * 1000, profile.summary())
+
+        for shape, count in profile.repeated(self.repeat_threshold):
+            logger.warning("Possible N+1 in %s: %dx %s", request, count, shape[:STATEMENT_PREVIEW_CHARS])
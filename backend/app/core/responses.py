@@ -0,0 +1,25 @@
+"""
+Response class used for every route that returns Python objects.
+
+FastAPI validates the return value against response_model and converts it
+to JSON-compatible data (ISO 8601 strings for datetimes, values for enums
+such as OrderStatus); the response class only has to encode that to bytes.
+orjson does this several times faster than the stdlib json encoder used
+by the default JSONResponse. It also encodes datetime and Enum values
+itself, in the same format, for routes without a response_model.
+"""
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+RESPONSE_CLASSES = {
+    "orjson": ORJSONResponse,
+    "json": JSONResponse,
+}
+
+
+def get_response_class(name: str) -> type:
+    """Look up the JSON_RESPONSE_CLASS setting"""
+    if name not in RESPONSE_CLASSES:
+        raise ValueError(
+            f"Unknown JSON_RESPONSE_CLASS '{name}' (expected one of {', '.join(RESPONSE_CLASSES)})"
+        )
+    return RESPONSE_CLASSES[name]
@@ -1,11 +1,14 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.cache import TTLCache
 from app.core.config import get_settings
 from app.db.session import get_session
 
@@ -14,6 +17,17 @@ settings = get_settings()
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# Authenticated-user caches: token -> user id, user id -> User snapshot.
+# Call invalidate_cached_user after changing a user's is_active / is_admin.
+token_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+user_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password"""
@@ -22,10 +36,20 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check if a hash was made with a different bcrypt cost than configured"""
+    # bcrypt hashes look like $2b$<cost>$<salt+digest>
+    try:
+        rounds = int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.BCRYPT_ROUNDS
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -50,7 +74,7 @@ def decode_access_token(token: str) -> Optional[dict]:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
     """Dependency to get current authenticated user"""
     from app.models.user import User
@@ -62,24 +86,51 @@ async def get_current_user(
     )
     
     token = credentials.credentials
-    payload = decode_access_token(token)
-    
-    if payload is None:
-        raise credentials_exception
+    user_id = token_cache.get(token)
     
-    user_id: int = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
+        payload = decode_access_token(token)
+        
+        if payload is None:
+            raise credentials_exception
+        
+        # JWT "sub" must be a string, so the user id is round-tripped as one
+        subject = payload.get("sub")
+        if subject is None or not str(subject).isdigit():
+            raise credentials_exception
+        user_id = int(subject)
+        
+        # Never cache a token past its own expiry
+        token_cache.set(token, user_id, ttl=payload["exp"] - time.time())
     
-    statement = select(User).where(User.id == user_id)
-    user = session.exec(statement).first()
+    user = user_cache.get(user_id)
     
     if user is None:
-        raise credentials_exception
+        statement = select(User).where(User.id == user_id)
+        user = (await session.exec(statement)).first()
+        
+        if user is None:
+            raise credentials_exception
+        
+        # Concurrent requests share the cached user: cache a copy that
+        # belongs to no session, so no request's rollback can expire it
+        user = User.model_validate(user)
+        user_cache.set(user_id, user)
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
     
     return user
 
 
+def invalidate_cached_user(user_id: int):
+    """Drop a user's cached row so the next request reloads it"""
+    user_cache.pop(user_id)
+
+
 async def get_current_admin_user(
     current_user = Depends(get_current_user)
 ):
@@ -0,0 +1,126 @@
+"""
+Warm-up of a freshly imported app, before it takes traffic.
+
+The first request of each shape pays for one-off work: SQLAlchemy compiles
+the statement (then caches it per engine), FastAPI/pydantic build the
+validators and serializers, lazily imported modules load and the pool
+opens connections. warm_up() sends the common catalog requests through
+the app in-process so that work is done before the first real request.
+The gunicorn master runs it once after preloading the app and the forked
+workers inherit the result (see gunicorn.conf.py); a server without a
+preloading master warms up in its startup hook.
+
+Requests go to the router directly, so they skip the middleware: they do
+not show up in metrics or SQL profiles. The catalog cache is emptied
+afterwards so every worker starts with fresh data.
+"""
+import json
+import logging
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+
+from app.core.catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# Set once this process (or the master it was forked from) has warmed up
+warmed_up = False
+
+# Listings beyond the default first page, one per statement shape. The
+# values do not matter: compiled SQL is cached with parameters, not literals
+LISTING_PARAMS = [
+    {"sort_by": "price_asc", "category": "T-Shirts"},
+    {"sort_by": "price_desc", "min_price": 0, "max_price": 1000},
+    {"sort_by": "popularity", "page": 2},
+    {"size": "M", "color": "Black"},
+    {"count": "approx"},
+    {"search": "cotton"},
+    {"search": "cotton", "sort_by": "relevance"},
+]
+
+
+async def _get(app, path: str, params: Optional[dict] = None) -> Tuple[int, bytes]:
+    """Minimal in-process GET through the app's router"""
+    query = urlencode(params or {}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query,
+        "headers": [(b"host", b"warmup")],
+        "client": ("127.0.0.1", 0),
+        "server": ("warmup", 80),
+        # Normally set by the application itself, which is bypassed
+        "app": app,
+    }
+    status = 0
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app.router(scope, receive, send)
+    return status, b"".join(body)
+
+
+async def warm_up(app) -> List[Tuple[str, int]]:
+    """Send the common catalog requests; returns (request, status) pairs"""
+    results = []
+
+    async def get(path, params=None):
+        # Without the middleware, errors arrive as exceptions
+        try:
+            status, body = await _get(app, path, params)
+        except HTTPException as exc:
+            status, body = exc.status_code, b""
+        except Exception:
+            logger.exception("Warm-up request %s failed", path)
+            status, body = 500, b""
+        results.append((f"{path}?{urlencode(params or {})}".rstrip("?"), status))
+        return status, body
+
+    status, body = await get("/api/products")
+    listing = json.loads(body) if status == 200 else {}
+    if listing.get("next_cursor"):
+        await get("/api/products", {"cursor": listing["next_cursor"]})
+    for params in LISTING_PARAMS:
+        await get("/api/products", params)
+    await get("/api/products/facets")
+    await get("/api/products/facets", {"category": "T-Shirts", "size": "M"})
+    if listing.get("products"):
+        await get(f"/api/products/{listing['products'][0]['id']}")
+
+    catalog_cache.clear()
+    return results
+
+
+async def run_warm_up(app) -> None:
+    """Warm up once per process (forked workers inherit the master's) and log
+    the outcome"""
+    global warmed_up
+    if warmed_up:
+        return
+    started = time.perf_counter()
+    results = await warm_up(app)
+    warmed_up = True
+
+    # A cold worker is slower, not broken, so failures are only logged
+    failed = [f"{request} -> {status}" for request, status in results if status >= 500]
+    if failed:
+        logger.warning("Warm-up requests failed: %s", ", ".join(failed))
+    logger.info("Warmed up %d catalog requests in %.0f ms", len(results), (time.perf_counter() - started) * 1000)
@@ -0,0 +1,141 @@
+"""
+Sales reports for the admin analytics endpoints, read from the rollups
+(app.db.rollups) only.
+
+Report ranges are whole hours: the start is rounded down and the end up.
+Revenue series come in the requested granularity. Product and category
+reports read day rows for the whole days in the range and hour rows for
+the rest, so even a multi-year report reads a row per product per day.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.orders import naive_utc
+from app.db.rollups import DAY, HOUR, bucket_start
+from app.models.product import Product
+from app.models.sales import CategorySalesRollup, ProductSalesRollup, SalesRollup
+
+# Reports without a start cover this long
+DEFAULT_RANGE = timedelta(days=30)
+
+
+def report_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """The report's [start, end) as naive UTC whole hours"""
+    end = naive_utc(end) if end else datetime.utcnow()
+    start = naive_utc(start) if start else end - DEFAULT_RANGE
+    hour_of_end = bucket_start(end, HOUR)
+    return bucket_start(start, HOUR), hour_of_end if hour_of_end == end else hour_of_end + timedelta(hours=1)
+
+
+def bucket_ranges(start: datetime, end: datetime) -> List[Tuple[str, datetime, datetime]]:
+    """Cover [start, end) (whole hours) with day buckets where possible and
+    hour buckets at the edges"""
+    first_day = bucket_start(start, DAY)
+    if first_day < start:
+        first_day += timedelta(days=1)
+    last_day = bucket_start(end, DAY)
+    if first_day >= last_day:
+        return [(HOUR, start, end)]
+
+    ranges = [(DAY, first_day, last_day)]
+    if start < first_day:
+        ranges.append((HOUR, start, first_day))
+    if last_day < end:
+        ranges.append((HOUR, last_day, end))
+    return ranges
+
+
+def _in_range(model, start: datetime, end: datetime):
+    return or_(*(
+        and_(model.period == period, model.bucket_start >= low, model.bucket_start < high)
+        for period, low, high in bucket_ranges(start, end)
+    ))
+
+
+async def revenue_series(session: AsyncSession, start: datetime, end: datetime, granularity: str) -> List[dict]:
+    """Orders, units and money per hour or day, for buckets starting in
+    [start, end); buckets without sales are left out"""
+    statement = (
+        select(SalesRollup)
+        .where(
+            SalesRollup.period == granularity,
+            SalesRollup.bucket_start >= bucket_start(start, granularity),
+            SalesRollup.bucket_start < end
+        )
+        .order_by(SalesRollup.bucket_start)
+    )
+    return [
+        {
+            "bucket_start": row.bucket_start,
+            "orders": row.orders,
+            "units": row.units,
+            "subtotal": round(row.subtotal, 2),
+            "tax": round(row.tax, 2),
+            "revenue": round(row.revenue, 2),
+        }
+        for row in (await session.exec(statement)).all()
+    ]
+
+
+async def top_products(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    limit: int,
+    by: str
+) -> List[dict]:
+    """Best-selling products in [start, end), by revenue or units"""
+    units = func.sum(ProductSalesRollup.units)
+    revenue = func.sum(ProductSalesRollup.revenue)
+    ranking = revenue if by == "revenue" else units
+    rows = (await session.exec(
+        select(ProductSalesRollup.product_id, func.sum(ProductSalesRollup.orders), units, revenue)
+        .where(_in_range(ProductSalesRollup, start, end))
+        .group_by(ProductSalesRollup.product_id)
+        .order_by(ranking.desc(), ProductSalesRollup.product_id)
+        .limit(limit)
+    )).all()
+
+    products = {
+        product.id: product
+        for product in (await session.exec(
+            select(Product.id, Product.name, Product.category)
+            .where(col(Product.id).in_([row[0] for row in rows]))
+        )).all()
+    }
+    return [
+        {
+            "product_id": product_id,
+            "name": products[product_id].name if product_id in products else None,
+            "category": products[product_id].category if product_id in products else None,
+            "orders": orders,
+            "units": units_sold,
+            "revenue": round(sales, 2),
+        }
+        for product_id, orders, units_sold, sales in rows
+    ]
+
+
+async def category_breakdown(session: AsyncSession, start: datetime, end: datetime) -> List[dict]:
+    """Orders, units and revenue per category in [start, end), highest
+    revenue first"""
+    revenue = func.sum(CategorySalesRollup.revenue)
+    rows = (await session.exec(
+        select(
+            CategorySalesRollup.category,
+            func.sum(CategorySalesRollup.orders),
+            func.sum(CategorySalesRollup.units),
+            revenue
+        )
+        .where(_in_range(CategorySalesRollup, start, end))
+        .group_by(CategorySalesRollup.category)
+        .order_by(revenue.desc(), CategorySalesRollup.category)
+    )).all()
+    return [
+        {"category": category, "orders": orders, "units": units, "revenue": round(sales, 2)}
+        for category, orders, units, sales in rows
+    ]
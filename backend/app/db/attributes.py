@@ -0,0 +1,63 @@
+"""
+Maintenance of product_attributes, the indexable copy of Product.sizes and
+Product.colors used for size/color filters and facet counts.
+
+Every write path that sets sizes or colors must call sync_product_attributes
+in the same transaction.
+"""
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, exists, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.product import Product, ProductAttribute
+
+SIZE = "size"
+COLOR = "color"
+
+
+def attribute_rows(product_id: int, sizes: Iterable[str], colors: Iterable[str]) -> List[Dict]:
+    """Rows for product_attributes (duplicates dropped)"""
+    rows = [{"kind": SIZE, "value": value, "product_id": product_id} for value in set(sizes or [])]
+    rows += [{"kind": COLOR, "value": value, "product_id": product_id} for value in set(colors or [])]
+    return rows
+
+
+async def sync_product_attributes(session: AsyncSession, product: Product):
+    """Replace a product's attribute rows with its current sizes and colors"""
+    await session.execute(
+        delete(ProductAttribute).where(ProductAttribute.product_id == product.id)
+    )
+    rows = attribute_rows(product.id, product.sizes, product.colors)
+    if rows:
+        await session.execute(insert(ProductAttribute), rows)
+
+
+def backfill_product_attributes(engine, batch_size: int = 5000) -> int:
+    """Create attribute rows for products that have none; returns products done"""
+    done = 0
+    last_id = 0
+    with engine.begin() as conn:
+        while True:
+            # Walk by id in batches so memory stays flat on large catalogs
+            products = conn.execute(
+                select(Product.id, Product.sizes, Product.colors)
+                .where(
+                    Product.id > last_id,
+                    ~exists().where(ProductAttribute.product_id == Product.id)
+                )
+                .order_by(Product.id)
+                .limit(batch_size)
+            ).all()
+            if not products:
+                return done
+
+            rows = []
+            for product_id, sizes, colors in products:
+                rows += attribute_rows(product_id, sizes, colors)
+            if rows:
+                conn.execute(insert(ProductAttribute), rows)
+
+            done += len(products)
+            last_id = products[-1][0]
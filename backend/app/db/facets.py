@@ -0,0 +1,343 @@
+"""
+Maintained facet counts: active products per category, and per category
+and size, color or price bucket (product_facet_counts), and per
+combination of category, size, color and price slot
+(product_facet_combinations).
+
+GET /api/products/facets answers from the first table when no filter other
+than the category is set, which is how the storefront first opens a
+listing, and from the combinations when sizes, colors or a price range
+(on multiples of PRICE_STEP) are picked as well. Either way it reads at
+most a few thousand rows however large the catalog is. A search, or a
+price bound off the step, counts the matching rows instead.
+
+A combination row counts the products with that size and that color, ""
+standing for any; a product is counted once under each pair drawn from
+its sizes plus "" and its colors plus "". Each facet is then the sum over
+rows that fix the other filters: the size facet under a color filter sums
+the rows of that color, grouped by size.
+
+Every write path that creates products or changes their category, price,
+sizes, colors or is_active must record the change in a FacetCounts and
+write it in the same transaction. Counts are adjusted with upserts in key
+order, as the sales rollups are, so concurrent writers cannot deadlock.
+rebuild_facet_counts() recomputes both tables for rows loaded by other
+means.
+"""
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Integer, String, case, cast, delete, func, insert, literal, literal_column, or_, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select, col
+
+from app.db.attributes import COLOR, SIZE
+from app.models.product import Product, ProductAttribute, ProductFacetCombination, ProductFacetCount
+
+CATEGORY = "category"
+PRICE = "price"
+
+# Price buckets are kept this wide; coarser multiples are summed from them
+PRICE_STEP = 100
+
+# What a product's facet counts depend on
+FACET_STATE_COLUMNS = (
+    Product.id, Product.is_active, Product.category, Product.price, Product.sizes, Product.colors
+)
+
+
+def price_bucket(price: float) -> int:
+    return math.floor(price / PRICE_STEP)
+
+
+def price_slot(price: float) -> int:
+    """Twice the price bucket, plus one unless the price is the bucket's
+    lower bound, so that inclusive bounds on multiples of PRICE_STEP pick
+    whole slots: price >= k * PRICE_STEP is slot >= 2k, and
+    price <= k * PRICE_STEP is slot <= 2k"""
+    bucket = price_bucket(price)
+    return 2 * bucket + (0 if price == bucket * PRICE_STEP else 1)
+
+
+def price_slot_sql(price, dialect: str):
+    """price_slot() as SQL. PostgreSQL rounds when casting to integer,
+    SQLite truncates (prices are not negative)."""
+    bucket = price / literal_column(repr(float(PRICE_STEP)))
+    if dialect == "postgresql":
+        bucket = func.floor(bucket)
+    bucket = cast(bucket, Integer)
+    return 2 * bucket + case((price == bucket * PRICE_STEP, 0), else_=1)
+
+
+class FacetCounts:
+    """Changes to the facet counts, collected before they are written"""
+
+    def __init__(self):
+        self.changes: Dict[tuple, int] = defaultdict(int)
+        self.combinations: Dict[tuple, int] = defaultdict(int)
+
+    def add(
+        self,
+        category: str,
+        price: float,
+        sizes: Iterable[str],
+        colors: Iterable[str],
+        products: int = 1
+    ) -> None:
+        """Count `products` more (or fewer, if negative) active products"""
+        sizes, colors = set(sizes or []), set(colors or [])
+        changes, combinations = self.changes, self.combinations
+        changes[(category, CATEGORY, "")] += products
+        changes[(category, PRICE, str(price_bucket(price)))] += products
+        for value in sizes:
+            changes[(category, SIZE, value)] += products
+        for value in colors:
+            changes[(category, COLOR, value)] += products
+
+        # Bulk imports call this for every row
+        slot = price_slot(price)
+        colors.add("")
+        for size in ("", *sizes):
+            for color in colors:
+                combinations[(category, size, color, slot)] += products
+
+    def add_product(self, product, products: int = 1) -> None:
+        """Count a product (a Product or a FACET_STATE_COLUMNS row) if active"""
+        if product.is_active:
+            self.add(product.category, product.price, product.sizes, product.colors, products)
+
+    def replace(self, before: Iterable, after: Iterable) -> None:
+        """Swap products' counted state for their new one"""
+        for product in before:
+            self.add_product(product, -1)
+        for product in after:
+            self.add_product(product)
+
+    async def write(self, conn) -> None:
+        """Apply the changes on an AsyncConnection, in its transaction"""
+        await _add_counts(conn, ProductFacetCount, self.changes, {
+            "category": String, "facet": String, "value": String
+        })
+        await _add_counts(conn, ProductFacetCombination, self.combinations, {
+            "category": String, "size": String, "color": String, "price_slot": Integer
+        })
+        self.changes.clear()
+        self.combinations.clear()
+
+
+async def _add_counts(conn, model, changes: Dict[tuple, int], key: Dict[str, type]) -> None:
+    """Upsert the non-zero `changes` (key tuple -> products), adding them
+    to the existing counts in key order"""
+    rows = [(*values, products) for values, products in sorted(changes.items()) if products]
+    if not rows:
+        return
+
+    dialect = conn.dialect.name
+    update_products = {"products": model.products + literal_column("excluded.products")}
+    if dialect == "postgresql":
+        # product_updates imports this module
+        from app.db.product_updates import values_source
+
+        # One statement with an array per column: an import batch changes
+        # thousands of combinations, and an executemany sends each on its own
+        columns = {**key, "products": Integer}
+        added = values_source(dialect, rows, columns, "added")
+        statement = (
+            postgresql.insert(model)
+            .from_select(list(columns), select(*(added.c[name] for name in columns)))
+            .on_conflict_do_update(index_elements=list(key), set_=update_products)
+        )
+        await conn.execute(statement)
+    elif dialect == "sqlite":
+        statement = sqlite.insert(model).on_conflict_do_update(index_elements=list(key), set_=update_products)
+        await conn.execute(statement, [dict(zip([*key, "products"], row)) for row in rows])
+    else:
+        raise ValueError(f"Facet counts are not supported on '{dialect}'")
+
+
+async def facet_states(conn, product_ids: Iterable[int], lock: bool = False) -> list:
+    """FACET_STATE_COLUMNS rows of the given products, optionally locked
+    (in id order, as bulk updates lock them)"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    statement = select(*FACET_STATE_COLUMNS).where(col(Product.id).in_(product_ids)).order_by(Product.id)
+    if lock:
+        statement = statement.with_for_update(key_share=True)
+    return (await conn.execute(statement)).all()
+
+
+async def facet_count_rows(session, category: Optional[str], price_bucket_size: float) -> Optional[List[tuple]]:
+    """(facet, value, bucket, count) rows, as the facet counting query
+    returns them, for listings filtered by category only; None when the
+    bucket size is not a multiple of PRICE_STEP"""
+    steps = price_bucket_size / PRICE_STEP
+    if steps != int(steps):
+        return None
+    steps = int(steps)
+
+    statement = select(
+        ProductFacetCount.category,
+        ProductFacetCount.facet,
+        ProductFacetCount.value,
+        ProductFacetCount.products
+    ).where(ProductFacetCount.products > 0)
+    if category is not None:
+        # Categories are counted regardless of the category filter
+        statement = statement.where(or_(
+            ProductFacetCount.facet == CATEGORY,
+            ProductFacetCount.category == category
+        ))
+
+    totals = defaultdict(int)
+    for row_category, facet, value, products in (await session.exec(statement)).all():
+        if facet == CATEGORY:
+            totals[(CATEGORY, row_category, None)] += products
+            if category is None or row_category == category:
+                totals[("total", None, None)] += products
+        elif facet == PRICE:
+            totals[(PRICE, None, int(value) // steps)] += products
+        else:
+            totals[(facet, value, None)] += products
+    totals.setdefault(("total", None, None), 0)
+    return [(facet, value, bucket, count) for (facet, value, bucket), count in totals.items()]
+
+
+def _on_step(price: Optional[float]) -> bool:
+    return price is None or price % PRICE_STEP == 0
+
+
+async def facet_combination_rows(
+    session,
+    category: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    size: Optional[str],
+    color: Optional[str],
+    price_bucket_size: float
+) -> Optional[List[tuple]]:
+    """(facet, value, bucket, count) rows, as the facet counting query
+    returns them, for listings filtered by category, size, color and
+    price; None when the bucket size or a price bound is not a multiple
+    of PRICE_STEP"""
+    steps = price_bucket_size / PRICE_STEP
+    if steps != int(steps) or not (_on_step(min_price) and _on_step(max_price)):
+        return None
+    steps = int(steps)
+
+    cell = ProductFacetCombination
+    filters = {
+        CATEGORY: [cell.category == category] if category else [],
+        PRICE: [],
+        # Rows of products with the size (or color) picked, or of any
+        SIZE: [cell.size == (size or "")],
+        COLOR: [cell.color == (color or "")],
+    }
+    if min_price is not None:
+        filters[PRICE].append(cell.price_slot >= 2 * int(min_price // PRICE_STEP))
+    if max_price is not None:
+        filters[PRICE].append(cell.price_slot <= 2 * int(max_price // PRICE_STEP))
+
+    def conditions(exclude: Optional[str] = None) -> list:
+        # Each facet is counted with every filter except its own
+        return [condition for facet, facet_conditions in filters.items() if facet != exclude
+                for condition in facet_conditions]
+
+    def facet_counts(facet: str, value, bucket, *where):
+        grouped = value if bucket is None else bucket
+        return (
+            select(
+                literal_column(f"'{facet}'").label("facet"),
+                (value if value is not None else cast(None, String)).label("value"),
+                (bucket if bucket is not None else cast(None, Integer)).label("bucket"),
+                func.sum(cell.products).label("count")
+            )
+            .where(*conditions(exclude=facet), *where)
+            .group_by(grouped)
+            .having(func.sum(cell.products) > 0)
+        )
+
+    # Inlined so SELECT and GROUP BY match on PostgreSQL. Slots are not
+    # negative, so integer division floors.
+    bucket = cell.price_slot // literal_column(str(2 * steps), Integer)
+    parts = [
+        facet_counts(CATEGORY, cell.category, None),
+        facet_counts(SIZE, cell.size, None, cell.size != ""),
+        facet_counts(COLOR, cell.color, None, cell.color != ""),
+        facet_counts(PRICE, None, bucket),
+        select(
+            literal_column("'total'").label("facet"),
+            cast(None, String).label("value"),
+            cast(None, Integer).label("bucket"),
+            func.coalesce(func.sum(cell.products), 0).label("count")
+        )
+        .where(*conditions()),
+    ]
+    return (await session.exec(union_all(*parts))).all()
+
+
+def rebuild_facet_counts(engine) -> int:
+    """Recompute every facet count from the products; returns rows written"""
+    with Session(engine) as session:
+        dialect = session.bind.dialect.name
+        # Same bucket arithmetic as the facet counting query
+        bucket = Product.price / literal_column(repr(float(PRICE_STEP)))
+        if dialect == "postgresql":
+            bucket = func.floor(bucket)
+        bucket = cast(bucket, Integer)
+
+        active = Product.is_active == True
+        parts = [
+            select(Product.category, literal(CATEGORY), literal(""), func.count())
+            .where(active)
+            .group_by(Product.category),
+            select(Product.category, literal(PRICE), bucket, func.count())
+            .where(active)
+            .group_by(Product.category, bucket),
+            select(Product.category, ProductAttribute.kind, ProductAttribute.value, func.count())
+            .join(Product, Product.id == ProductAttribute.product_id)
+            .where(active)
+            .group_by(Product.category, ProductAttribute.kind, ProductAttribute.value),
+        ]
+        rows = [
+            {"category": category, "facet": facet, "value": str(value), "products": products}
+            for part in parts
+            for category, facet, value, products in session.exec(part)
+        ]
+
+        def values_or_any(kind: str):
+            return union_all(
+                select(ProductAttribute.product_id.label("product_id"), ProductAttribute.value.label("value"))
+                .where(ProductAttribute.kind == kind),
+                select(Product.id, literal("")),
+            ).subquery()
+
+        # One row per product and pair of its sizes and colors (or any)
+        sizes, colors = values_or_any(SIZE), values_or_any(COLOR)
+        pairs = (
+            select(
+                Product.category,
+                sizes.c.value.label("size"),
+                colors.c.value.label("color"),
+                price_slot_sql(Product.price, dialect).label("price_slot")
+            )
+            .join(sizes, sizes.c.product_id == Product.id)
+            .join(colors, colors.c.product_id == Product.id)
+            .where(active)
+            .subquery()
+        )
+        key = (pairs.c.category, pairs.c.size, pairs.c.color, pairs.c.price_slot)
+        combinations = [
+            {"category": category, "size": size, "color": color, "price_slot": slot, "products": products}
+            for category, size, color, slot, products in session.exec(select(*key, func.count()).group_by(*key))
+        ]
+
+        session.execute(delete(ProductFacetCount))
+        session.execute(delete(ProductFacetCombination))
+        if rows:
+            session.execute(insert(ProductFacetCount), rows)
+        if combinations:
+            session.execute(insert(ProductFacetCombination), combinations)
+        session.commit()
+    return len(rows) + len(combinations)
@@ -0,0 +1,237 @@
+"""
+Idempotency keys for checkout.
+
+A client that times out on POST /api/orders and retries with the same
+Idempotency-Key must not place a second order. The first request claims
+the key with a short committed INSERT (the primary key lets only one
+win), so a concurrent duplicate finds the claim and is turned away (409)
+without touching products. The order is then placed and the response
+stored on the key in the same transaction as the order, so a key is only
+ever completed together with its order.
+Later repeats get that response back from a single primary-key lookup.
+
+A request that fails (bad product, no stock) releases its claim, so the
+client can fix the cart and retry with the same key. A claim left behind by
+a crashed worker is taken over after IDEMPOTENCY_KEY_LOCK_TIMEOUT_SECONDS;
+should the first request still be running, it can no longer complete the
+key and its order is rolled back.
+Completed keys expire after IDEMPOTENCY_KEY_TTL_SECONDS and are deleted by
+IdempotencyKeyCleaner.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import get_settings
+from app.db.session import async_engine
+from app.models.order import CheckoutIdempotencyKey
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+def request_hash(body: str) -> str:
+    """Fingerprint of a request body, to spot a key reused for another request"""
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _key_is(user_id: int, key: str):
+    return (CheckoutIdempotencyKey.user_id == user_id) & (CheckoutIdempotencyKey.key == key)
+
+
+async def claim_key(
+    session: AsyncSession,
+    user_id: int,
+    key: str,
+    fingerprint: str
+) -> Tuple[Optional[CheckoutIdempotencyKey], Optional[datetime]]:
+    """Claim `key` for a new request (committed at once).
+
+    Returns (None, claimed_at) when the caller now holds the key; pass
+    claimed_at to complete_key and release_key, which only act while the
+    claim is still the caller's. Returns (existing row, None) when another
+    request has it: in progress, or completed with a response to replay.
+    Expired keys and stale claims are taken over.
+    """
+    while True:
+        now = datetime.utcnow()
+        claim = {
+            "request_hash": fingerprint,
+            "status": IN_PROGRESS,
+            "response_status": None,
+            "response_body": None,
+            "locked_at": now,
+            "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+        }
+
+        # Read first: a retry of a finished request needs no write at all
+        existing = (await session.exec(
+            select(CheckoutIdempotencyKey).where(_key_is(user_id, key))
+        )).first()
+        await session.commit()
+
+        if existing is None:
+            try:
+                await session.execute(
+                    insert(CheckoutIdempotencyKey).values(user_id=user_id, key=key, **claim)
+                )
+                await session.commit()
+                return None, now
+            except IntegrityError:
+                # A concurrent duplicate claimed it first
+                await session.rollback()
+                continue
+
+        stale = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_LOCK_TIMEOUT_SECONDS)
+        if existing.expires_at > now and not (existing.status == IN_PROGRESS and existing.locked_at < stale):
+            return existing, None
+
+        # Take over only the row we looked at, so two requests cannot both win
+        result = await session.execute(
+            update(CheckoutIdempotencyKey)
+            .where(_key_is(user_id, key), CheckoutIdempotencyKey.locked_at == existing.locked_at)
+            .values(**claim)
+        )
+        await session.commit()
+        if result.rowcount == 1:
+            return None, now
+
+
+def _claim_is(user_id: int, key: str, claimed_at: datetime):
+    return (
+        _key_is(user_id, key)
+        & (CheckoutIdempotencyKey.status == IN_PROGRESS)
+        & (CheckoutIdempotencyKey.locked_at == claimed_at)
+    )
+
+
+async def complete_key(
+    session: AsyncSession,
+    user_id: int,
+    key: str,
+    claimed_at: datetime,
+    status_code: int,
+    body: str
+) -> bool:
+    """Store the response on a claimed key, in the caller's transaction.
+
+    Returns False when the claim was taken over as stale meanwhile; the
+    caller must then roll back, as the new holder places the order.
+    """
+    result = await session.execute(
+        update(CheckoutIdempotencyKey)
+        .where(_claim_is(user_id, key, claimed_at))
+        .values(status=COMPLETED, response_status=status_code, response_body=body)
+    )
+    return result.rowcount == 1
+
+
+async def release_key(session: AsyncSession, user_id: int, key: str, claimed_at: datetime) -> None:
+    """Give up a claim after a failed request (committed at once)"""
+    await session.execute(
+        delete(CheckoutIdempotencyKey)
+        .where(_claim_is(user_id, key, claimed_at))
+    )
+    await session.commit()
+
+
+async def delete_expired_keys(session: AsyncSession, batch_size: int) -> int:
+    """Delete up to `batch_size` expired keys; returns how many went"""
+    expired = (
+        select(CheckoutIdempotencyKey.user_id, CheckoutIdempotencyKey.key)
+        .where(CheckoutIdempotencyKey.expires_at <= datetime.utcnow())
+        .order_by(CheckoutIdempotencyKey.expires_at)
+        .limit(batch_size)
+    )
+    result = await session.execute(
+        delete(CheckoutIdempotencyKey)
+        .where(tuple_(CheckoutIdempotencyKey.user_id, CheckoutIdempotencyKey.key).in_(expired))
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+class IdempotencyKeyCleaner:
+    """Background task that deletes expired idempotency keys on an interval"""
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.keys_deleted = 0
+        self.errors = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_ms = 0.0
+
+    async def cleanup(self) -> int:
+        """Delete every expired key; returns how many"""
+        started = time.monotonic()
+        deleted = 0
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            while True:
+                batch = await delete_expired_keys(session, self.batch_size)
+                deleted += batch
+                if batch < self.batch_size:
+                    break
+        self.keys_deleted += deleted
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_run_ms = (time.monotonic() - started) * 1000
+        return deleted
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.cleanup()
+            except Exception:
+                # Expired keys are never replayed, so they can wait for the next run
+                self.errors += 1
+                logger.exception("Idempotency key cleanup failed")
+
+    def start(self):
+        """Start cleaning up in the background (idempotent)"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Snapshot of cleanup activity"""
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "keys_deleted": self.keys_deleted,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_run_ms": self.last_run_ms,
+        }
+
+
+idempotency_key_cleaner = IdempotencyKeyCleaner(
+    interval=settings.IDEMPOTENCY_KEY_CLEANUP_INTERVAL_SECONDS,
+    batch_size=settings.IDEMPOTENCY_KEY_CLEANUP_BATCH_SIZE,
+)
@@ -0,0 +1,56 @@
+"""
+Atomic stock reservation.
+
+Stock is decremented with a conditional UPDATE (``stock >= quantity``) rather
+than read-check-write in Python, so concurrent checkouts of the same product
+can never oversell: the database re-checks the condition against the latest
+row version before applying each decrement.
+
+Popularity is not touched here; the order's background job adds it (see
+app.db.popularity), so the hot row's update leaves the indexed popularity
+column (and, on PostgreSQL, every index on products) alone.
+"""
+from typing import Dict, List
+
+from sqlalchemy import case, update
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.product import Product
+
+
+async def reserve_stock(session: AsyncSession, quantities: Dict[int, int]) -> List[int]:
+    """Decrement stock for every product, or for none.
+
+    `quantities` maps product id to units. Returns the ids that could not be
+    reserved; when that list is non-empty the caller must roll back, since
+    the other products in the cart have already been decremented.
+    """
+    product_ids = sorted(quantities)
+
+    if len(product_ids) > 1:
+        # Lock the rows in id order so overlapping carts cannot deadlock.
+        # FOR NO KEY UPDATE does not block the FK checks of concurrent
+        # order_items inserts on PostgreSQL; SQLite ignores the clause.
+        await session.exec(
+            select(Product.id)
+            .where(col(Product.id).in_(product_ids))
+            .order_by(Product.id)
+            .with_for_update(key_share=True)
+        )
+
+    quantity_by_id = case(quantities, value=Product.id)
+    result = await session.execute(
+        update(Product)
+        .where(
+            col(Product.id).in_(product_ids),
+            Product.is_active == True,
+            Product.stock >= quantity_by_id
+        )
+        .values(stock=Product.stock - quantity_by_id)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    reserved = set(result.scalars().all())
+
+    return [product_id for product_id in product_ids if product_id not in reserved]
@@ -0,0 +1,351 @@
+"""
+Durable background jobs.
+
+Work that need not finish before a request returns (the follow-ups of a
+checkout, say) is queued as a background_jobs row in the same transaction
+as the change that caused it, so a job exists exactly when its order does.
+JobWorker coroutines in every API process claim due jobs in batches and
+pass them to the handler registered for their kind.
+
+A claim is one short statement (SKIP LOCKED on PostgreSQL): it bumps the
+job's attempts and moves available_at JOB_VISIBILITY_TIMEOUT_SECONDS ahead,
+so other workers pass over the job until that lease runs out. A handler's
+writes commit together with the delete of its jobs, and the delete only
+matches the attempts of the claim: if a lease expired and another worker
+claimed the job again, the slower one rolls back instead of applying it
+twice. Failed jobs are retried with exponential backoff; after
+JOB_MAX_ATTEMPTS they are kept with status "failed" until an admin retries
+them.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, tuple_, update
+from sqlalchemy.engine import Row
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import get_settings
+from app.db.session import async_engine
+from app.models.job import BackgroundJob
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+FAILED = "failed"
+
+# Kept with a failed job, enough to see what went wrong
+MAX_ERROR_LENGTH = 2000
+
+# Throughput is reported over this window
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+JobHandler = Callable[[AsyncSession, List[dict]], Awaitable[None]]
+handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """Register the handler for jobs of `kind`.
+
+    The handler gets a session and the payloads of a batch of jobs. It
+    must not commit: its writes commit with the jobs' completion.
+    """
+    def register(handler: JobHandler) -> JobHandler:
+        handlers[kind] = handler
+        return handler
+    return register
+
+
+async def enqueue_job(session: AsyncSession, kind: str, payload: dict) -> None:
+    """Queue a job in the caller's transaction"""
+    now = datetime.utcnow()
+    await session.execute(
+        insert(BackgroundJob).values(
+            kind=kind, payload=payload, status=QUEUED, attempts=0, available_at=now, created_at=now
+        )
+    )
+
+
+async def claim_jobs(session: AsyncSession, batch_size: int, visibility_timeout: float) -> List[Row]:
+    """Claim up to `batch_size` due jobs (committed at once), oldest first"""
+    now = datetime.utcnow()
+    due = (
+        select(BackgroundJob.id)
+        .where(BackgroundJob.status == QUEUED, BackgroundJob.available_at <= now)
+        .order_by(BackgroundJob.available_at, BackgroundJob.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(BackgroundJob)
+        .where(col(BackgroundJob.id).in_(due))
+        .values(
+            attempts=BackgroundJob.attempts + 1,
+            available_at=now + timedelta(seconds=visibility_timeout)
+        )
+        .returning(
+            BackgroundJob.id,
+            BackgroundJob.kind,
+            BackgroundJob.payload,
+            BackgroundJob.attempts,
+            BackgroundJob.created_at
+        )
+        .execution_options(synchronize_session=False)
+    )
+    jobs = sorted(result.all(), key=lambda job: job.id)
+    await session.commit()
+    return jobs
+
+
+async def finish_jobs(session: AsyncSession, jobs: List[Row]) -> bool:
+    """Delete completed jobs in the caller's transaction.
+
+    Returns False if any of them was claimed again after its lease ran out.
+    """
+    result = await session.execute(
+        delete(BackgroundJob)
+        .where(tuple_(BackgroundJob.id, BackgroundJob.attempts).in_([(job.id, job.attempts) for job in jobs]))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(jobs)
+
+
+async def fail_job(
+    session: AsyncSession,
+    job: Row,
+    error: str,
+    max_attempts: int,
+    backoff: float,
+    backoff_max: float
+) -> bool:
+    """Schedule a retry, or give up after `max_attempts` (committed at once).
+
+    Returns True if the job was given up on.
+    """
+    given_up = job.attempts >= max_attempts
+    delay = min(backoff * 2 ** (job.attempts - 1), backoff_max)
+    await session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job.id, BackgroundJob.attempts == job.attempts)
+        .values(
+            status=FAILED if given_up else QUEUED,
+            available_at=datetime.utcnow() + timedelta(seconds=delay),
+            last_error=error[:MAX_ERROR_LENGTH]
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return given_up
+
+
+async def retry_job(session: AsyncSession, job_id: int) -> bool:
+    """Queue a failed job again with fresh attempts (committed at once)"""
+    result = await session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id, BackgroundJob.status == FAILED)
+        .values(status=QUEUED, attempts=0, available_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def queue_stats(session: AsyncSession) -> dict:
+    """Jobs per status, and how far behind the queue is"""
+    now = datetime.utcnow()
+    counts = dict((await session.exec(
+        select(BackgroundJob.status, func.count()).group_by(BackgroundJob.status)
+    )).all())
+    # Due but not claimed yet: the age of the oldest is the queue's lag
+    oldest_due = (await session.exec(
+        select(func.min(BackgroundJob.available_at))
+        .where(BackgroundJob.status == QUEUED, BackgroundJob.available_at <= now)
+    )).one()
+    return {
+        "queued": counts.get(QUEUED, 0),
+        "failed": counts.get(FAILED, 0),
+        "lag_seconds": (now - oldest_due).total_seconds() if oldest_due else 0.0,
+    }
+
+
+class JobWorker:
+    """Background tasks that claim and run queued jobs"""
+
+    def __init__(
+        self,
+        workers: int,
+        poll_interval: float,
+        batch_size: int,
+        visibility_timeout: float,
+        max_attempts: int,
+        retry_backoff: float,
+        retry_backoff_max: float
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._tasks: List[asyncio.Task] = []
+        # Made by start(): an Event belongs to the event loop that first waits on it
+        self._wakeup: Optional[asyncio.Event] = None
+        self._completions = deque()
+
+        # Metrics
+        self.batches = 0
+        self.jobs_succeeded = 0
+        self.jobs_retried = 0
+        self.jobs_failed = 0
+        self.jobs_lost = 0
+        self.errors = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def notify(self):
+        """Wake idle workers now rather than at their next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run_pending(self) -> int:
+        """Run due jobs until none are left; returns how many were claimed"""
+        claimed = 0
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            while True:
+                jobs = await claim_jobs(session, self.batch_size, self.visibility_timeout)
+                if not jobs:
+                    break
+                claimed += len(jobs)
+                self.batches += 1
+                self._record_lag(jobs)
+
+                by_kind = defaultdict(list)
+                for job in jobs:
+                    by_kind[job.kind].append(job)
+                for kind, batch in by_kind.items():
+                    await self._run_batch(session, kind, batch)
+
+                # A short batch means the queue is drained
+                if len(jobs) < self.batch_size:
+                    break
+        return claimed
+
+    async def _run_batch(self, session: AsyncSession, kind: str, jobs: List[Row]):
+        error = None
+        try:
+            handler = handlers.get(kind)
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {kind!r}")
+            await handler(session, [job.payload for job in jobs])
+            finished = await finish_jobs(session, jobs)
+        except Exception as exc:
+            error = exc
+            finished = False
+
+        if finished:
+            await session.commit()
+            self.jobs_succeeded += len(jobs)
+            self._completions.append((time.monotonic(), len(jobs)))
+            return
+
+        await session.rollback()
+        if len(jobs) > 1:
+            # Run them one by one, so only the failing jobs are held back
+            for job in jobs:
+                await self._run_batch(session, kind, [job])
+            return
+        if error is None:
+            # The lease ran out and another worker has the job now
+            self.jobs_lost += 1
+            return
+
+        logger.error("Background job %s (%s) failed", jobs[0].id, kind, exc_info=error)
+        given_up = await fail_job(
+            session, jobs[0], f"{type(error).__name__}: {error}",
+            self.max_attempts, self.retry_backoff, self.retry_backoff_max
+        )
+        if given_up:
+            self.jobs_failed += 1
+        else:
+            self.jobs_retried += 1
+
+    def _record_lag(self, jobs: List[Row]):
+        # Queued to claimed, for first attempts (retries wait on purpose)
+        now = datetime.utcnow()
+        lags = [(now - job.created_at).total_seconds() * 1000 for job in jobs if job.attempts == 1]
+        if lags:
+            self.last_lag_ms = max(lags)
+            self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+
+    def throughput(self) -> float:
+        """Jobs completed per second over the last minute"""
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW_SECONDS
+        while self._completions and self._completions[0][0] < cutoff:
+            self._completions.popleft()
+        return sum(count for _, count in self._completions) / THROUGHPUT_WINDOW_SECONDS
+
+    async def _run(self):
+        while True:
+            # Cleared before looking, so a job queued meanwhile is not missed
+            self._wakeup.clear()
+            try:
+                await self.run_pending()
+            except Exception:
+                # Claimed jobs come back when their lease runs out
+                self.errors += 1
+                logger.exception("Background job batch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the worker tasks (idempotent)"""
+        if not self._tasks:
+            self._wakeup = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the worker tasks; jobs they had claimed are retried elsewhere"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._wakeup = None
+
+    def stats(self) -> dict:
+        """Snapshot of job activity in this process"""
+        return {
+            "workers": len(self._tasks),
+            "batches": self.batches,
+            "jobs_succeeded": self.jobs_succeeded,
+            "jobs_retried": self.jobs_retried,
+            "jobs_failed": self.jobs_failed,
+            "jobs_lost": self.jobs_lost,
+            "errors": self.errors,
+            "jobs_per_second": self.throughput(),
+            "last_lag_ms": self.last_lag_ms,
+            "max_lag_ms": self.max_lag_ms,
+        }
+
+
+job_worker = JobWorker(
+    workers=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    batch_size=settings.JOB_BATCH_SIZE,
+    visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_backoff=settings.JOB_RETRY_BACKOFF_SECONDS,
+    retry_backoff_max=settings.JOB_RETRY_BACKOFF_MAX_SECONDS,
+)
@@ -0,0 +1,121 @@
+"""
+Order queries: listing filters, keyset pagination and detail loading, and
+the background follow-ups of a new order.
+
+Orders are listed newest first on (created_at, id). The admin listing is
+served by ix_orders_created_at_id / ix_orders_status_created_at_id, a user's
+history by ix_orders_user_id_created_at_id.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import literal, tuple_
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.pagination import encode_cursor, decode_cursor
+from app.db.jobs import enqueue_job, job_handler
+from app.db.popularity import add_popularity
+from app.db.rollups import add_orders_to_rollups
+from app.models.order import Order, OrderStatus
+
+CURSOR_TAG = "orders"
+
+# Background job queued with every order (see app.db.jobs)
+ORDER_PLACED = "order_placed"
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC (naive values are taken as UTC)"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def order_filters(
+    order_status: Optional[OrderStatus] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> list:
+    """WHERE conditions for the order listing filters"""
+    conditions = []
+
+    if order_status:
+        conditions.append(Order.status == order_status.value)
+
+    if user_id is not None:
+        conditions.append(Order.user_id == user_id)
+
+    # created_at is stored as naive UTC
+    if created_from:
+        conditions.append(Order.created_at >= naive_utc(created_from))
+
+    if created_to:
+        conditions.append(Order.created_at < naive_utc(created_to))
+
+    return conditions
+
+
+async def fetch_order_page(
+    session: AsyncSession,
+    statement,
+    page_size: int,
+    cursor: Optional[str]
+) -> Tuple[List[Order], Optional[str]]:
+    """Fetch one newest-first page of a filtered `select(Order)`.
+
+    Returns the orders and the cursor for the next page (None on the last).
+    """
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, CURSOR_TAG, [datetime, int])
+        position = tuple_(Order.created_at, Order.id)
+        statement = statement.where(position < tuple_(literal(last_created_at), literal(last_id)))
+
+    # Fetch one extra row to know whether another page follows
+    statement = (
+        statement
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(page_size + 1)
+    )
+    orders = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_cursor = encode_cursor(CURSOR_TAG, [orders[-1].created_at, orders[-1].id])
+
+    return orders, next_cursor
+
+
+async def load_order_with_items(session: AsyncSession, order_id: int) -> Optional[Order]:
+    """Fetch an order and its items in a single joined query"""
+    statement = (
+        select(Order)
+        .where(Order.id == order_id)
+        .options(joinedload(Order.items))
+    )
+    return (await session.exec(statement)).unique().first()
+
+
+async def queue_order_followups(session: AsyncSession, order: Order, quantities: Dict[int, int]) -> None:
+    """Queue the work that follows an order, in the order's transaction"""
+    await enqueue_job(session, ORDER_PLACED, {
+        "order_id": order.id,
+        # JSON object keys are strings
+        "quantities": {str(product_id): quantity for product_id, quantity in quantities.items()}
+    })
+
+
+@job_handler(ORDER_PLACED)
+async def run_order_followups(session: AsyncSession, payloads: List[dict]) -> None:
+    """Follow-ups of a batch of new orders: count the units sold towards
+    product popularity and add the orders to the sales rollups"""
+    sold = Counter()
+    for payload in payloads:
+        for product_id, quantity in payload["quantities"].items():
+            sold[int(product_id)] += quantity
+    await add_popularity(session, sold)
+    await add_orders_to_rollups(session, [payload["order_id"] for payload in payloads])
@@ -0,0 +1,53 @@
+"""
+Popularity counters.
+
+Checkout does not bump Product.popularity on the product row it already
+locks for the stock decrement. The order's background job (see
+app.db.orders) adds the units sold instead, for a whole batch of orders
+with one UPDATE, so a hot product's row and its popularity index are
+written once per batch rather than once per order.
+
+The increments commit with the completion of the jobs that carry them
+(see app.db.jobs), so a crash at any point neither loses nor
+double-counts a sale.
+"""
+from typing import Dict
+
+from sqlalchemy import Integer, update
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.catalog_cache import stock_changed
+from app.db.product_updates import values_source
+from app.models.product import Product
+
+
+async def add_popularity(session: AsyncSession, quantities: Dict[int, int]) -> None:
+    """Add units sold to the products' popularity, in the caller's transaction"""
+    product_ids = sorted(product_id for product_id, quantity in quantities.items() if quantity)
+    if not product_ids:
+        return
+
+    # Lock in id order, as reserve_stock does, so the job cannot deadlock
+    # with checkouts
+    await session.exec(
+        select(Product.id)
+        .where(col(Product.id).in_(product_ids))
+        .order_by(Product.id)
+        .with_for_update(key_share=True)
+    )
+    sold = values_source(
+        session.bind.dialect.name,
+        [(product_id, quantities[product_id]) for product_id in product_ids],
+        {"id": Integer, "quantity": Integer},
+        "sold"
+    )
+    await session.execute(
+        update(Product)
+        .where(Product.id == sold.c.id)
+        .values(popularity=Product.popularity + sold.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+    # The popularity sort moved: bound how long cached pages stay stale
+    stock_changed(product_ids)
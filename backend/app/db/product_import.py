@@ -0,0 +1,310 @@
+"""
+Bulk product import.
+
+Rows are validated one by one and written in batches, each batch in its own
+transaction: COPY on PostgreSQL, a single executemany elsewhere. New
+products get their product_attributes rows and facet counts in the same
+batch, so size and color filters see them as soon as the batch commits.
+
+With an upsert key, rows are validated as partial updates: a row matching an
+existing product (by id, or by name for the oldest product with that name)
+updates only the fields it sets, and a row that matches nothing must carry
+every field a create needs (upsert_by=id never creates).
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from operator import itemgetter
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.imports import Record
+from app.db.attributes import attribute_rows
+from app.db.facets import FacetCounts, facet_states
+from app.db.search import SQLITE_FTS_INSERT_DDL, SQLITE_FTS_INSERT_TRIGGER
+from app.models.product import Product, ProductAttribute
+from app.schemas.product import ProductImportPatch, ProductImportRow
+
+# Column order for COPY
+PRODUCT_COLUMNS = [
+    "id", "name", "description", "price", "category", "sizes", "colors", "images",
+    "stock", "is_active", "popularity", "created_at", "updated_at",
+]
+JSON_COLUMNS = {"sizes", "colors", "images"}
+_JSON_POSITIONS = [index for index, column in enumerate(PRODUCT_COLUMNS) if column in JSON_COLUMNS]
+_copy_values = itemgetter(*PRODUCT_COLUMNS[1:])
+# Columns an update must move facet counts for
+FACET_COLUMNS = {"category", "price", "sizes", "colors", "is_active"}
+ATTRIBUTE_COLUMNS = ["kind", "value", "product_id"]
+_attribute_values = itemgetter(*ATTRIBUTE_COLUMNS)
+
+
+class ImportReport:
+    """Counts and per-row errors for one import"""
+
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.updated_ids: Set[int] = set()
+
+    def fail(self, line: int, errors: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+
+    def as_dict(self) -> Dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def validation_messages(exc: ValidationError) -> List[str]:
+    """Flatten pydantic errors to "field: message" strings"""
+    return [
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in exc.errors()
+    ]
+
+
+async def import_products(
+    session: AsyncSession,
+    records: AsyncIterator[Record],
+    upsert_by: Optional[str],
+    batch_size: int,
+    report: ImportReport
+) -> None:
+    """Validate and write every record, committing after each batch.
+
+    Batches already committed stay committed if a later one fails.
+    """
+    schema = ProductImportPatch if upsert_by else ProductImportRow
+    batch: List[Tuple[int, BaseModel]] = []
+    # The previous batch is written while the next one is parsed
+    writing: Optional[asyncio.Task] = None
+    try:
+        async for line, fields, error in records:
+            report.received += 1
+            if error:
+                report.fail(line, [error])
+                continue
+
+            try:
+                row = schema.model_validate(fields)
+            except ValidationError as exc:
+                report.fail(line, validation_messages(exc))
+                continue
+
+            if upsert_by and getattr(row, upsert_by) is None:
+                report.fail(line, [f"{upsert_by}: required when upsert_by={upsert_by}"])
+                continue
+
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                if writing:
+                    await writing
+                writing = asyncio.create_task(write_batch(session, batch, upsert_by, report))
+                batch = []
+    finally:
+        # Never leave a write running on the session, even if the upload broke off
+        if writing:
+            await writing
+
+    if batch:
+        await write_batch(session, batch, upsert_by, report)
+
+
+async def write_batch(
+    session: AsyncSession,
+    batch: List[Tuple[int, BaseModel]],
+    upsert_by: Optional[str],
+    report: ImportReport
+) -> None:
+    """Insert and update one batch of rows in a single transaction"""
+    conn = await session.connection()
+    now = datetime.utcnow()
+
+    # Existing products matched by the upsert key
+    existing: Dict = {}
+    if upsert_by == "id":
+        ids = {row.id for _, row in batch}
+        result = await conn.execute(select(Product.id).where(col(Product.id).in_(ids)))
+        existing = {product_id: product_id for product_id in result.scalars()}
+    elif upsert_by == "name":
+        names = {row.name for _, row in batch}
+        result = await conn.execute(
+            select(Product.id, Product.name).where(col(Product.name).in_(names)).order_by(Product.id)
+        )
+        for product_id, name in result:
+            existing.setdefault(name, product_id)
+
+    new_rows: List[Dict] = []
+    new_by_name: Dict[str, Dict] = {}
+    updates: Dict[int, Dict] = {}
+    for line, row in batch:
+        if not upsert_by:
+            values = row.model_dump()
+        else:
+            # Nulls are treated like missing fields
+            values = row.model_dump(exclude_unset=True, exclude_none=True, exclude={"id"})
+            key = getattr(row, upsert_by)
+            if key in existing:
+                updates.setdefault(existing[key], {}).update(values)
+                report.updated += 1
+                continue
+            if upsert_by == "id":
+                report.fail(line, [f"id: product {key} not found"])
+                continue
+            if key in new_by_name:
+                # Repeated name within the batch updates the pending insert
+                new_by_name[key].update(values)
+                report.updated += 1
+                continue
+
+            # New product: the row must have every field a create needs
+            try:
+                values = ProductImportRow.model_validate(values).model_dump()
+            except ValidationError as exc:
+                report.fail(line, validation_messages(exc))
+                continue
+            new_by_name[key] = values
+
+        values.update(is_active=True, popularity=0, created_at=now, updated_at=now)
+        new_rows.append(values)
+        report.inserted += 1
+
+    counts = FacetCounts()
+    if new_rows:
+        await insert_products(conn, new_rows, counts)
+    if updates:
+        await update_products(conn, updates, now, counts)
+        report.updated_ids.update(updates)
+    await counts.write(conn)
+
+    await session.commit()
+
+
+def copy_record(product_id: int, values: Dict) -> tuple:
+    """A new product's row for COPY, in PRODUCT_COLUMNS order"""
+    record = [product_id, *_copy_values(values)]
+    for index in _JSON_POSITIONS:
+        record[index] = orjson.dumps(record[index]).decode()
+    return tuple(record)
+
+
+async def insert_products(conn, rows: List[Dict], counts: FacetCounts) -> None:
+    """Insert new products and their attribute rows, counting them in `counts`"""
+    dialect = conn.dialect.name
+
+    if dialect == "postgresql":
+        # Reserve ids up front so COPY can write them along with the rows.
+        # One array, since fetching a row per id costs more than the nextval.
+        result = await conn.execute(
+            text(
+                "SELECT array_agg(nextval(pg_get_serial_sequence('products', 'id'))) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"count": len(rows)}
+        )
+        ids = result.scalar_one()
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            "products",
+            columns=PRODUCT_COLUMNS,
+            records=[copy_record(product_id, values) for product_id, values in zip(ids, rows)]
+        )
+    elif dialect == "sqlite":
+        # Filling products_fts row by row from the insert trigger costs more
+        # than the insert itself, so the batch drops the trigger, indexes its
+        # rows with one INSERT ... SELECT and puts the trigger back. DDL is
+        # transactional in SQLite and this transaction holds the write lock
+        # from the DROP on, so no other write can miss the index, and the new
+        # rowids are the last len(rows)
+        await conn.exec_driver_sql(f"DROP TRIGGER {SQLITE_FTS_INSERT_TRIGGER}")
+        await conn.execute(insert(Product), rows)
+        last_id = (await conn.execute(select(func.max(Product.id)))).scalar_one()
+        ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        await conn.execute(
+            text(
+                "INSERT INTO products_fts(rowid, name, description) "
+                "SELECT id, name, description FROM products WHERE id >= :first_id"
+            ),
+            {"first_id": ids[0]}
+        )
+        await conn.exec_driver_sql(SQLITE_FTS_INSERT_DDL)
+    else:
+        result = await conn.execute(insert(Product).returning(Product.id, sort_by_parameter_order=True), rows)
+        ids = list(result.scalars())
+
+    attributes = []
+    for product_id, values in zip(ids, rows):
+        attributes += attribute_rows(product_id, values["sizes"], values["colors"])
+        counts.add(values["category"], values["price"], values["sizes"], values["colors"])
+    await insert_attributes(conn, attributes)
+
+
+async def update_products(conn, updates: Dict[int, Dict], now: datetime, counts: FacetCounts) -> None:
+    """Apply partial updates, one executemany per distinct set of columns,
+    moving the facet counts of products they change in `counts`"""
+    recounted = sorted(product_id for product_id, values in updates.items() if FACET_COLUMNS & values.keys())
+    # Locked so the counts move from the state these updates replace
+    before = await facet_states(conn, recounted, lock=True)
+
+    groups = defaultdict(list)
+    for product_id, values in updates.items():
+        # Bind names must differ from column names in an UPDATE
+        params = {f"_{column}": value for column, value in values.items()}
+        groups[tuple(sorted(values))].append({"_id": product_id, **params})
+
+    for columns, params in groups.items():
+        statement = (
+            update(Product)
+            .where(Product.id == bindparam("_id"))
+            .values({column: bindparam(f"_{column}") for column in columns} | {"updated_at": now})
+        )
+        await conn.execute(statement, params)
+    counts.replace(before, await facet_states(conn, recounted))
+
+    # Rebuild attribute rows for products whose sizes or colors changed
+    changed = [
+        product_id for product_id, values in updates.items()
+        if "sizes" in values or "colors" in values
+    ]
+    if changed:
+        await conn.execute(
+            delete(ProductAttribute).where(col(ProductAttribute.product_id).in_(changed))
+        )
+        result = await conn.execute(
+            select(Product.id, Product.sizes, Product.colors).where(col(Product.id).in_(changed))
+        )
+        attributes = []
+        for product_id, sizes, colors in result:
+            attributes += attribute_rows(product_id, sizes, colors)
+        await insert_attributes(conn, attributes)
+
+
+async def insert_attributes(conn, rows: List[Dict]) -> None:
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        raw = (await conn.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            "product_attributes",
+            columns=ATTRIBUTE_COLUMNS,
+            records=[_attribute_values(row) for row in rows]
+        )
+    else:
+        await conn.execute(insert(ProductAttribute), rows)
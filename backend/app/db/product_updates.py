@@ -0,0 +1,128 @@
+"""
+Set-based bulk updates of product price, stock and active flag.
+
+Each chunk is applied with a single UPDATE ... FROM joined against the
+chunk's new values, in its own short transaction. The values travel as
+arrays unnested on PostgreSQL and as one JSON document read with json_each
+on SQLite (see values_source).
+Rows whose values would not change are left alone, so repeated warehouse
+syncs of the same stock levels do not bump updated_at or invalidate cached
+pages. Price and is_active changes move the products' facet counts in the
+same transaction.
+"""
+import json
+from datetime import datetime
+from typing import Dict, List, Set
+
+from sqlalchemy import Boolean, Float, Integer, and_, cast, func, or_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlmodel import select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.facets import FACET_STATE_COLUMNS, FacetCounts
+from app.models.product import Product
+
+# Columns the bulk update may set
+BULK_UPDATE_COLUMNS = {"price": Float, "stock": Integer, "is_active": Boolean}
+
+
+class BulkUpdateResult:
+    """What a bulk update matched and changed, filled in chunk by chunk"""
+
+    def __init__(self):
+        self.matched = 0
+        self.changed: Set[int] = set()
+        self.unknown_ids: List[int] = []
+
+
+def values_source(dialect: str, rows: List[tuple], columns: Dict[str, type], name: str):
+    """A joinable row set built from `rows` (tuples in `columns` order).
+
+    The rows are sent as a few bind parameters however many there are.
+    """
+    names = list(columns)
+    if dialect == "postgresql":
+        arrays = [
+            cast([row[index] for row in rows], ARRAY(type_))
+            for index, type_ in enumerate(columns.values())
+        ]
+        return func.unnest(*arrays).table_valued(*names).render_derived(name=name)
+
+    if dialect == "sqlite":
+        each = func.json_each(json.dumps(rows)).table_valued("value")
+        return select(
+            *(func.json_extract(each.c.value, f"$[{index}]").label(column) for index, column in enumerate(names))
+        ).subquery(name)
+
+    raise ValueError(f"Set-based updates are not supported on '{dialect}'")
+
+
+async def bulk_update_products(
+    session: AsyncSession,
+    updates: Dict[int, Dict],
+    chunk_size: int,
+    result: BulkUpdateResult
+) -> None:
+    """Apply `updates` (product id -> new column values) chunk by chunk.
+
+    Chunks already committed stay committed, and recorded in `result`, if
+    a later one fails.
+    """
+    dialect = session.bind.dialect.name
+    product_ids = sorted(updates)
+
+    for offset in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[offset:offset + chunk_size]
+
+        # Lock the rows in id order, as reserve_stock does, so a sync racing
+        # checkouts cannot deadlock; this also finds the unknown ids
+        rows = await session.exec(
+            select(*FACET_STATE_COLUMNS)
+            .where(col(Product.id).in_(chunk))
+            .order_by(Product.id)
+            .with_for_update(key_share=True)
+        )
+        before = {row.id: row for row in rows}
+        existing = sorted(before)
+        missing = sorted(set(chunk).difference(existing))
+
+        columns = [
+            column for column in BULK_UPDATE_COLUMNS
+            if any(column in updates[product_id] for product_id in existing)
+        ]
+        changed = []
+        if columns:
+            new_values = values_source(
+                dialect,
+                [(product_id, *(updates[product_id].get(column) for column in columns)) for product_id in existing],
+                {"id": Integer, **{column: BULK_UPDATE_COLUMNS[column] for column in columns}},
+                "new_values"
+            )
+            differs = [
+                and_(new_values.c[column].isnot(None), new_values.c[column] != getattr(Product, column))
+                for column in columns
+            ]
+            rows = await session.execute(
+                update(Product)
+                .where(Product.id == new_values.c.id, or_(*differs))
+                .values({
+                    **{column: func.coalesce(new_values.c[column], getattr(Product, column)) for column in columns},
+                    "updated_at": datetime.utcnow()
+                })
+                .returning(Product.id, Product.price, Product.is_active)
+                .execution_options(synchronize_session=False)
+            )
+            counts = FacetCounts()
+            for product_id, price, is_active in rows:
+                old = before[product_id]
+                counts.add_product(old, -1)
+                if is_active:
+                    counts.add(old.category, price, old.sizes, old.colors)
+                changed.append(product_id)
+            await counts.write(await session.connection())
+
+        await session.commit()
+
+        result.matched += len(existing)
+        result.changed.update(changed)
+        result.unknown_ids += missing
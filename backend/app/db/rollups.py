@@ -0,0 +1,244 @@
+"""
+Sales rollups: orders, units and revenue per hour and per day, in total
+(sales_rollups), per product and per category.
+
+The analytics endpoints read only these tables (see app.db.analytics), so
+a report reads a row per hour or day instead of scanning orders and
+order_items. New orders are added by their order_placed background job
+(app.db.orders) in the same transaction as the job's completion, so each
+order is counted exactly once. Rows are upserted in key order, so
+concurrent workers cannot deadlock on them.
+
+rebuild_rollups() recomputes whole days from the orders, for history
+loaded by other means than checkout or orders corrected by hand. It skips
+orders whose job has not run yet (the job will add them) and locks the
+rollup tables for each day it rewrites, so it cannot interleave with a
+job.
+
+Orders count at their creation time unless pending or cancelled. A
+product's sales go to the category it had when they were rolled up.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, delete, distinct, func, text, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select, col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.job import BackgroundJob
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.product import Product
+from app.models.sales import CategorySalesRollup, ProductSalesRollup, SalesRollup
+
+HOUR = "hour"
+DAY = "day"
+PERIODS = (HOUR, DAY)
+
+COUNTED_STATUSES = [
+    order_status.value for order_status in OrderStatus
+    if order_status not in (OrderStatus.PENDING, OrderStatus.CANCELLED)
+]
+
+# Key and summed columns of each rollup table
+ROLLUP_COLUMNS = {
+    SalesRollup: (("period", "bucket_start"), ("orders", "units", "subtotal", "tax", "revenue")),
+    ProductSalesRollup: (("period", "bucket_start", "product_id"), ("orders", "units", "revenue")),
+    CategorySalesRollup: (("period", "bucket_start", "category"), ("orders", "units", "revenue")),
+}
+
+
+def bucket_start(moment: datetime, period: str) -> datetime:
+    """Start of the hour or day `moment` falls in"""
+    if period == HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RollupTotals:
+    """Amounts to add to rollup rows, collected before they are written"""
+
+    def __init__(self):
+        self.rows: Dict[type, Dict[tuple, dict]] = {model: {} for model in ROLLUP_COLUMNS}
+
+    def add(self, model: type, moment: datetime, key: tuple, **values) -> None:
+        """Add `values` to the hour and the day row of `model` for `moment`"""
+        rows = self.rows[model]
+        for period in PERIODS:
+            row = rows.setdefault((period, bucket_start(moment, period)) + key, dict.fromkeys(values, 0))
+            for column, value in values.items():
+                row[column] += value
+
+    def add_order(self, order, items: list) -> None:
+        """Add an order and its items (with their product's category)"""
+        products = defaultdict(lambda: [0, 0.0])
+        categories = defaultdict(lambda: [0, 0.0])
+        for item in items:
+            # A cart may hold one product in several sizes
+            for totals in (products[item.product_id], categories[item.category]):
+                totals[0] += item.quantity
+                totals[1] += item.quantity * item.unit_price
+
+        self.add(
+            SalesRollup, order.created_at, (),
+            orders=1,
+            units=sum(item.quantity for item in items),
+            subtotal=order.subtotal,
+            tax=order.tax,
+            revenue=order.total_amount
+        )
+        for product_id, (units, revenue) in products.items():
+            self.add(ProductSalesRollup, order.created_at, (product_id,), orders=1, units=units, revenue=revenue)
+        for category, (units, revenue) in categories.items():
+            self.add(CategorySalesRollup, order.created_at, (category,), orders=1, units=units, revenue=revenue)
+
+    def upserts(self, dialect: str) -> Iterator[Tuple[object, List[dict]]]:
+        """(statement, rows) pairs that add the totals to the tables"""
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            raise ValueError(f"Sales rollups are not supported on '{dialect}'")
+
+        for model, rows in self.rows.items():
+            if not rows:
+                continue
+            keys, sums = ROLLUP_COLUMNS[model]
+            table = model.__table__
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(keys),
+                set_={column: table.c[column] + statement.excluded[column] for column in sums}
+            )
+            # Key order, so concurrent writers lock rows in the same order
+            yield statement, [dict(zip(keys, key), **values) for key, values in sorted(rows.items())]
+
+
+async def add_orders_to_rollups(session: AsyncSession, order_ids: List[int]) -> None:
+    """Add new orders to the rollups, in the caller's transaction"""
+    orders = (await session.exec(
+        select(Order.id, Order.created_at, Order.subtotal, Order.tax, Order.total_amount)
+        .where(col(Order.id).in_(order_ids), col(Order.status).in_(COUNTED_STATUSES))
+    )).all()
+    if not orders:
+        return
+
+    items = defaultdict(list)
+    for item in (await session.exec(
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price, Product.category)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(col(OrderItem.order_id).in_([order.id for order in orders]))
+    )).all():
+        items[item.order_id].append(item)
+
+    totals = RollupTotals()
+    for order in orders:
+        totals.add_order(order, items[order.id])
+    for statement, rows in totals.upserts(session.bind.dialect.name):
+        await session.execute(statement, rows)
+
+
+def bucket_start_sql(column, period: str, dialect: str):
+    """SQL for the start of the hour or day of a timestamp column"""
+    if dialect == "postgresql":
+        return func.date_trunc(period, column)
+    if dialect == "sqlite":
+        # In the format SQLAlchemy stores datetimes in, so keys match
+        pattern = "%Y-%m-%d %H:00:00.000000" if period == HOUR else "%Y-%m-%d 00:00:00.000000"
+        return type_coerce(func.strftime(pattern, column), DateTime)
+    raise ValueError(f"Sales rollups are not supported on '{dialect}'")
+
+
+def rebuild_day(session: Session, day: datetime) -> None:
+    """Recompute one day's hour and day rows from the orders (committed)"""
+    from app.db.orders import ORDER_PLACED  # app.db.orders imports this module
+
+    dialect = session.bind.dialect.name
+    next_day = day + timedelta(days=1)
+    if dialect == "postgresql":
+        # Waits for jobs already writing rollups; jobs that start now wait
+        # for this, and are still queued, so skipped below
+        session.execute(text(
+            "LOCK TABLE sales_rollups, product_sales_rollups, category_sales_rollups IN EXCLUSIVE MODE"
+        ))
+    # On SQLite the first DELETE takes the database's write lock
+    for model in ROLLUP_COLUMNS:
+        session.execute(
+            delete(model)
+            .where(model.bucket_start >= day, model.bucket_start < next_day)
+            .execution_options(synchronize_session=False)
+        )
+
+    pending = (
+        select(BackgroundJob.payload["order_id"].as_integer())
+        .where(BackgroundJob.kind == ORDER_PLACED, BackgroundJob.payload["order_id"].as_integer().is_not(None))
+    )
+    counted = [
+        Order.created_at >= day,
+        Order.created_at < next_day,
+        col(Order.status).in_(COUNTED_STATUSES),
+        col(Order.id).not_in(pending),
+    ]
+    hour = bucket_start_sql(Order.created_at, HOUR, dialect)
+    orders = func.count(distinct(OrderItem.order_id))
+    units = func.sum(OrderItem.quantity)
+    revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+    totals = RollupTotals()
+
+    for row in session.exec(
+        select(hour, func.count(), func.sum(Order.subtotal), func.sum(Order.tax), func.sum(Order.total_amount))
+        .where(*counted)
+        .group_by(hour)
+    ):
+        totals.add(SalesRollup, row[0], (), orders=row[1], units=0, subtotal=row[2], tax=row[3], revenue=row[4])
+
+    for row in session.exec(
+        select(hour, OrderItem.product_id, orders, units, revenue)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(*counted)
+        .group_by(hour, OrderItem.product_id)
+    ):
+        totals.add(ProductSalesRollup, row[0], (row[1],), orders=row[2], units=row[3], revenue=row[4])
+
+    for row in session.exec(
+        select(hour, Product.category, orders, units, revenue)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(*counted)
+        .group_by(hour, Product.category)
+    ):
+        totals.add(CategorySalesRollup, row[0], (row[1],), orders=row[2], units=row[3], revenue=row[4])
+        # Units in total, as checkout counts them: items of existing products
+        totals.add(SalesRollup, row[0], (), units=row[3])
+
+    for statement, rows in totals.upserts(dialect):
+        session.execute(statement, rows)
+    session.commit()
+
+
+def rebuild_rollups(
+    engine,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    progress: Optional[Callable[[str], None]] = None
+) -> int:
+    """Recompute the rollups of every day from `start` to `end` (default:
+    all days with orders), one transaction per day; returns days rebuilt"""
+    with Session(engine) as session:
+        first, last = session.exec(select(func.min(Order.created_at), func.max(Order.created_at))).one()
+    if first is None and (start is None or end is None):
+        return 0
+    day = bucket_start(start or first, DAY)
+    end = end or bucket_start(last, DAY) + timedelta(days=1)
+
+    days = 0
+    while day < end:
+        with Session(engine) as session:
+            rebuild_day(session, day)
+        days += 1
+        if progress:
+            progress(f"rollups: {day:%Y-%m-%d} rebuilt")
+        day += timedelta(days=1)
+    return days
@@ -0,0 +1,97 @@
+"""
+Full-text search over product names and descriptions.
+
+PostgreSQL keeps a generated, weighted ``tsvector`` column on ``products``
+with a GIN index. SQLite keeps an FTS5 inverted index in ``products_fts``,
+synced by triggers. Both use English stemming, match every search term as
+a prefix, and weight name matches above description matches. Migration
+0006 creates both.
+"""
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import column, false, func, literal_column, table
+from sqlmodel import select, col
+
+from app.models.product import Product
+
+
+# Bulk loads drop the insert trigger and rebuild the index once at the end;
+# this must match the trigger created by migration 0006
+SQLITE_FTS_INSERT_TRIGGER = "products_fts_insert"
+
+SQLITE_FTS_INSERT_DDL = f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_INSERT_TRIGGER} AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """
+
+# Relative weight of name vs description matches in SQLite's bm25()
+SQLITE_COLUMN_WEIGHTS = "10.0, 1.0"
+
+
+def search_terms(search: str) -> list:
+    """Split a search string into lowercase word tokens"""
+    return re.findall(r"\w+", search.lower())
+
+
+def apply_search(statement, search: str, dialect: str) -> Tuple[object, Optional[object]]:
+    """Restrict a products query to full-text matches.
+
+    Returns the new statement and a relevance expression (higher is better).
+    A search with no words matches nothing.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return statement.where(false()), None
+
+    if dialect == "postgresql":
+        # Terms are \w+ only, so they are safe to splice into tsquery syntax
+        query = " & ".join(f"{term}:*" for term in terms)
+        vector = literal_column("products.search_vector")
+        ts_query = func.to_tsquery(literal_column("'english'::regconfig"), query)
+        statement = statement.where(vector.op("@@")(ts_query))
+        return statement, func.ts_rank_cd(vector, ts_query)
+
+    if dialect == "sqlite":
+        query = " ".join(f'"{term}"*' for term in terms)
+        fts = table("products_fts", column("rowid"))
+        matches = (
+            select(
+                fts.c.rowid.label("product_id"),
+                literal_column(f"-bm25(products_fts, {SQLITE_COLUMN_WEIGHTS})").label("rank")
+            )
+            .where(literal_column("products_fts").op("MATCH")(query))
+            .subquery("search_matches")
+        )
+        statement = statement.join_from(Product, matches, matches.c.product_id == Product.id)
+        return statement, matches.c.rank
+
+    raise ValueError(f"Full-text search is not supported on '{dialect}'")
+
+
+def search_condition(search: str, dialect: str):
+    """WHERE condition matching products for a search, without ranking.
+
+    On SQLite this is an uncorrelated IN-subquery, which is evaluated once;
+    joining the FTS table instead lets the planner probe it once per row of
+    the outer query (e.g. once per attribute row when counting facets).
+    """
+    terms = search_terms(search)
+    if not terms:
+        return false()
+
+    if dialect == "postgresql":
+        query = " & ".join(f"{term}:*" for term in terms)
+        ts_query = func.to_tsquery(literal_column("'english'::regconfig"), query)
+        return literal_column("products.search_vector").op("@@")(ts_query)
+
+    if dialect == "sqlite":
+        query = " ".join(f'"{term}"*' for term in terms)
+        fts = table("products_fts", column("rowid"))
+        return col(Product.id).in_(
+            select(fts.c.rowid).where(literal_column("products_fts").op("MATCH")(query))
+        )
+
+    raise ValueError(f"Full-text search is not supported on '{dialect}'")
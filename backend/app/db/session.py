@@ -1,22 +1,304 @@
-from sqlmodel import create_engine, Session, SQLModel
+import asyncio
+import logging
+from functools import lru_cache
+from itertools import count
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Async drivers used for each supported backend
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+def engine_options(url: str) -> dict:
+    """Pool settings for an engine on `url` (none for in-memory SQLite)"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS,
+    }
+
 
-# Create engine
+# Create sync engine (schema management and scripts)
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
     pool_pre_ping=True,
+    **engine_options(settings.DATABASE_URL)
 )
 
+# Create async engine (request handlers)
+async_database_url = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    async_database_url,
+    echo=settings.DEBUG,
+    pool_pre_ping=True,
+    **engine_options(async_database_url)
+)
+
+# Read replicas (read-only endpoints; see ReplicaRouter)
+replica_engines = [
+    create_async_engine(
+        get_async_database_url(url),
+        echo=settings.DEBUG,
+        pool_pre_ping=True,
+        **engine_options(url)
+    )
+    for url in (url.strip() for url in settings.DATABASE_REPLICA_URLS.split(","))
+    if url
+]
+
+
+def alembic_config():
+    """Alembic configuration for the backend's migrations"""
+    from alembic.config import Config
+
+    return Config(str(ALEMBIC_INI))
+
+
+@lru_cache()
+def latest_revision() -> str:
+    """Head revision of the migration scripts (read once per process)"""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def schema_revision() -> Optional[str]:
+    """Migration the database is at; None if it was never migrated"""
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
 
 def init_db():
-    """Create all tables in the database"""
-    SQLModel.metadata.create_all(engine)
+    """Bring the schema up to the latest migration (no-op when it is there).
+
+    Run it from one process (seed.py, the gunicorn master, `alembic upgrade
+    head`); API workers only check the revision, see check_schema_version.
+    """
+    from alembic import command
+    from sqlalchemy import inspect
+
+    current = schema_revision()
+    if current == latest_revision():
+        return
+
+    # Tables created by create_all() before there were migrations
+    adopt = current is None and inspect(engine).has_table("users")
+
+    config = alembic_config()
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        if adopt:
+            command.stamp(config, "0001")
+        command.upgrade(config, "head")
+
+
+def check_schema_version():
+    """Refuse to serve a database that is not at the latest migration"""
+    current = schema_revision()
+    if current != latest_revision():
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {latest_revision()}; "
+            "run `alembic upgrade head` (or set DATABASE_MIGRATE_ON_STARTUP=True)"
+        )
+
 
+# Set once this process has migrated or checked the schema. Workers forked by
+# the preloading launcher (gunicorn.conf.py) inherit it, so they only check.
+_schema_prepared = False
 
-def get_session():
-    """Dependency to get database session"""
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+
+def prepare_schema():
+    """Startup schema step: migrate when DATABASE_MIGRATE_ON_STARTUP is set
+    and no parent process did already, else refuse an out-of-date schema"""
+    global _schema_prepared
+    if settings.DATABASE_MIGRATE_ON_STARTUP and not _schema_prepared:
+        init_db()
+    else:
+        check_schema_version()
+    _schema_prepared = True
+
+
+async def get_session():
+    """Dependency to get async database session"""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_read_session():
+    """Dependency for read-only endpoints: a session on a healthy replica,
+    or on the primary when there is none"""
+    async with AsyncSession(replica_router.pick(), expire_on_commit=False) as session:
+        yield session
+
+
+# PostgreSQL standby lag; 0 when it has replayed everything it received.
+# NULL on a server that is not a standby.
+REPLICA_LAG_SQL = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+           ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+"""
+
+
+class ReplicaRouter:
+    """Round-robin choice of read replica, with health checks.
+
+    A replica leaves the rotation when a health check fails (unreachable,
+    or more than max_lag seconds behind) or a connection to it breaks, and
+    rejoins after a check passes. The request that runs into a broken
+    replica fails; later ones go elsewhere. With no healthy replica, reads
+    go to the primary.
+
+    Replica lag adds to catalog cache staleness: a page read from a replica
+    just after an invalidation is cached until it expires.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: List[AsyncEngine], check_interval: float, max_lag: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.healthy = list(replicas)
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._turn = count()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.reads = {id(replica): 0 for replica in replicas}
+        self.fallbacks = 0
+        self.failures = 0
+
+        for replica in replicas:
+            event.listen(replica.sync_engine, "handle_error", self._on_error(replica))
+
+    def pick(self) -> AsyncEngine:
+        """The next healthy replica, or the primary"""
+        healthy = self.healthy
+        if not healthy:
+            if self.replicas:
+                self.fallbacks += 1
+            return self.primary
+        replica = healthy[next(self._turn) % len(healthy)]
+        self.reads[id(replica)] += 1
+        return replica
+
+    def mark_down(self, replica: AsyncEngine, reason: str) -> None:
+        if replica in self.healthy:
+            self.healthy = [engine for engine in self.healthy if engine is not replica]
+            self.failures += 1
+            logger.warning("Replica %s left the rotation: %s", _display_url(replica), reason)
+
+    def mark_up(self, replica: AsyncEngine) -> None:
+        if replica not in self.healthy:
+            # Keep configuration order so the rotation stays predictable
+            self.healthy = [engine for engine in self.replicas if engine in self.healthy or engine is replica]
+            logger.info("Replica %s rejoined the rotation", _display_url(replica))
+
+    def _on_error(self, replica: AsyncEngine):
+        def on_error(context):
+            # A dropped connection or a failed connect, not a bad query
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(replica, str(context.original_exception))
+        return on_error
+
+    async def check(self, replica: AsyncEngine) -> None:
+        """Probe one replica and move it in or out of the rotation"""
+        try:
+            async with replica.connect() as connection:
+                if replica.dialect.name == "postgresql" and self.max_lag > 0:
+                    lag = (await connection.exec_driver_sql(REPLICA_LAG_SQL)).scalar()
+                    if lag is not None and lag > self.max_lag:
+                        self.mark_down(replica, f"{lag:.1f}s behind the primary")
+                        return
+                else:
+                    await connection.exec_driver_sql("SELECT 1")
+        except Exception as exc:
+            self.mark_down(replica, str(exc))
+            return
+        self.mark_up(replica)
+
+    async def _run(self):
+        # Check right away so a replica that is down at startup gets no reads
+        while True:
+            for replica in self.replicas:
+                try:
+                    # A hung connect must not stall the other checks
+                    await asyncio.wait_for(self.check(replica), timeout=self.check_interval)
+                except asyncio.TimeoutError:
+                    self.mark_down(replica, "health check timed out")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        """Start health checks in the background (idempotent)"""
+        if self._task is None and self.replicas and self.check_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop health checks and close the replica pools"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def stats(self) -> dict:
+        """Snapshot of routing and health"""
+        return {
+            "replicas": [
+                {
+                    "url": _display_url(replica),
+                    "healthy": replica in self.healthy,
+                    "reads": self.reads[id(replica)],
+                }
+                for replica in self.replicas
+            ],
+            "primary_fallbacks": self.fallbacks,
+            "failures": self.failures,
+        }
+
+
+def _display_url(engine) -> str:
+    return engine.url.render_as_string(hide_password=True)
+
+
+replica_router = ReplicaRouter(
+    async_engine,
+    replica_engines,
+    check_interval=settings.REPLICA_HEALTH_CHECK_INTERVAL_SECONDS,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+)
@@ -0,0 +1,541 @@
+"""
+Deterministic synthetic data: catalogue, customers and order history.
+
+generate() appends products, users and orders (with their items) to
+whatever is already in the database, in sizes from a demo shop up to
+capacity-test volumes. Every row is a pure function of (seed, table, row
+number), so the same seed gives the same data whatever the number of
+workers or the chunk size.
+
+Distributions:
+- categories lean towards T-shirts; prices are log-normal around a
+  per-category median and end in 49 or 99
+- sizes are a contiguous run of the category's size scale (waist sizes
+  for jeans); colors lean towards black, white and navy
+- order lines pick products from a Zipf-like law, so a few hundred
+  products take most sales, and Product.popularity follows the same ranking
+- a minority of customers place most orders
+- orders are spread over `days` days with a status that depends on age;
+  totals include the 18% tax create_order charges
+
+Rows are generated in chunks by `workers` processes and written by the
+calling process, with COPY on PostgreSQL (psycopg2) and executemany
+elsewhere. product_attributes rows are written with their products and
+the facet counts recomputed after them. On SQLite the FTS insert trigger
+is dropped for the load and the index filled in bulk afterwards, as the
+product importer does.
+"""
+import csv
+import io
+import json
+import math
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import SQLModel, select
+
+from app.core.security import get_password_hash
+from app.db.attributes import attribute_rows
+from app.db.facets import rebuild_facet_counts
+from app.db.search import SQLITE_FTS_INSERT_DDL, SQLITE_FTS_INSERT_TRIGGER
+from app.models.order import Order, OrderStatus
+from app.models.product import Product
+from app.models.user import User
+
+# Relative share of the catalogue per category
+CATEGORY_WEIGHTS = {"T-Shirts": 30, "Shirts": 20, "Jeans": 20, "Dresses": 15, "Jackets": 15}
+CATEGORY_SINGULAR = {"T-Shirts": "T-Shirt", "Shirts": "Shirt", "Jeans": "Jeans", "Dresses": "Dress", "Jackets": "Jacket"}
+MEDIAN_PRICE = {"T-Shirts": 599, "Shirts": 1199, "Jeans": 1799, "Dresses": 2199, "Jackets": 3499}
+MIN_PRICE, MAX_PRICE = 199, 19999
+
+APPAREL_SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+WAIST_SIZES = ["28", "30", "32", "34", "36", "38"]
+COLOR_WEIGHTS = {"Black": 25, "White": 20, "Navy": 12, "Blue": 12, "Grey": 10, "Red": 8, "Green": 7, "Brown": 6}
+
+MATERIALS = {
+    "T-Shirts": ["Cotton", "Organic Cotton", "Jersey", "Linen Blend"],
+    "Shirts": ["Cotton", "Linen", "Oxford", "Poplin", "Flannel"],
+    "Jeans": ["Denim", "Stretch Denim", "Raw Denim"],
+    "Dresses": ["Cotton", "Silk", "Linen", "Chiffon", "Jersey"],
+    "Jackets": ["Leather", "Denim", "Wool", "Fleece", "Nylon"],
+}
+ADJECTIVES = [
+    "Classic", "Slim", "Relaxed", "Vintage", "Everyday", "Premium", "Casual",
+    "Formal", "Lightweight", "Oversized", "Cropped", "Tailored", "Summer", "Winter",
+]
+FEATURES = [
+    "breathable fabric", "stretch fit", "button front", "ribbed cuffs", "soft finish",
+    "relaxed silhouette", "reinforced seams", "machine washable", "tapered leg",
+    "side pockets", "hidden zip", "contrast stitching", "organic fibres",
+]
+IMAGES = {
+    "T-Shirts": [
+        "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=500",
+        "https://images.unsplash.com/photo-1527719327859-c6ce80353573?w=500",
+        "https://images.unsplash.com/photo-1583743814966-8936f5b7be1a?w=500",
+        "https://images.unsplash.com/photo-1581655353564-df123a1eb820?w=500",
+    ],
+    "Shirts": [
+        "https://images.unsplash.com/photo-1602810318383-e386cc2a3ccf?w=500",
+        "https://images.unsplash.com/photo-1596755094514-f87e34085b2c?w=500",
+        "https://images.unsplash.com/photo-1603252109303-2751441dd157?w=500",
+    ],
+    "Jeans": [
+        "https://images.unsplash.com/photo-1542272604-787c3835535d?w=500",
+        "https://images.unsplash.com/photo-1604176354204-9268737828e4?w=500",
+        "https://images.unsplash.com/photo-1541099649105-f69ad21f3246?w=500",
+    ],
+    "Dresses": [
+        "https://images.unsplash.com/photo-1595777457583-95e059d581b8?w=500",
+        "https://images.unsplash.com/photo-1566174053879-31528523f8ae?w=500",
+        "https://images.unsplash.com/photo-1572804013309-59a88b7e92f1?w=500",
+    ],
+    "Jackets": [
+        "https://images.unsplash.com/photo-1551028719-00167b16eac5?w=500",
+        "https://images.unsplash.com/photo-1576995853123-5a10305d93c0?w=500",
+        "https://images.unsplash.com/photo-1591047139829-d91aecb6caea?w=500",
+    ],
+}
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Arjun", "Ishaan", "Rohan", "Kabir", "Aryan", "Dev", "Kunal",
+    "Ananya", "Diya", "Isha", "Kavya", "Meera", "Priya", "Riya", "Saanvi", "Tara", "Zara",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Patel", "Iyer", "Nair", "Reddy", "Gupta", "Mehta", "Singh", "Kapoor",
+    "Joshi", "Das", "Rao", "Menon", "Bose", "Malhotra", "Chopra", "Pillai", "Kulkarni", "Shah",
+]
+STREETS = ["MG Road", "Park Street", "Link Road", "Station Road", "Church Street", "Lake View Road", "Hill Road"]
+# (city, state, first three digits of the PIN code)
+CITIES = [
+    ("Mumbai", "MH", "400"), ("Pune", "MH", "411"), ("Delhi", "DL", "110"), ("Bengaluru", "KA", "560"),
+    ("Chennai", "TN", "600"), ("Hyderabad", "TS", "500"), ("Kolkata", "WB", "700"), ("Jaipur", "RJ", "302"),
+]
+
+# Zipf-like exponents: how strongly sales concentrate on the top products
+# and orders on the most active customers
+PRODUCT_SKEW = 1.2
+CUSTOMER_SKEW = 0.8
+
+# Popularity of the best-selling product; the rest follow PRODUCT_SKEW
+TOP_POPULARITY = 100_000
+
+# Lines per order and units per line
+LINE_COUNT_WEIGHTS = {1: 45, 2: 25, 3: 15, 4: 10, 5: 5}
+QUANTITY_WEIGHTS = {1: 75, 2: 20, 3: 5}
+
+TAX_RATE = 0.18
+
+PRODUCT_COLUMNS = (
+    "id", "name", "description", "price", "category", "sizes", "colors", "images",
+    "stock", "is_active", "popularity", "created_at", "updated_at",
+)
+ATTRIBUTE_COLUMNS = ("kind", "value", "product_id")
+USER_COLUMNS = (
+    "id", "email", "password_hash", "full_name", "phone", "is_admin", "is_active", "created_at", "updated_at",
+)
+ORDER_COLUMNS = (
+    "id", "user_id", "subtotal", "tax", "total_amount", "status", "shipping_name",
+    "shipping_address_line1", "shipping_address_line2", "shipping_city", "shipping_state",
+    "shipping_pincode", "shipping_phone", "created_at", "updated_at",
+)
+ORDER_ITEM_COLUMNS = (
+    "order_id", "product_id", "product_name", "product_image", "unit_price", "quantity",
+    "selected_size", "selected_color", "created_at",
+)
+COLUMNS = {
+    "products": PRODUCT_COLUMNS,
+    "product_attributes": ATTRIBUTE_COLUMNS,
+    "users": USER_COLUMNS,
+    "orders": ORDER_COLUMNS,
+    "order_items": ORDER_ITEM_COLUMNS,
+}
+
+# Tag mixed into each row's seed so tables draw independent streams
+_PRODUCT, _USER, _ORDER = 1, 2, 3
+
+# Multiplier that scatters popularity ranks over the catalogue; prime, so
+# it is coprime with any catalogue smaller than itself
+_SCATTER = 2_654_435_761
+
+
+def _rng(seed: int, table: int, index: int) -> random.Random:
+    return random.Random(((seed * 8 + table) << 40) + index)
+
+
+def _cumulative(weights: Dict) -> Tuple[list, list]:
+    return list(weights), list(accumulate(weights.values()))
+
+
+_CATEGORIES = _cumulative(CATEGORY_WEIGHTS)
+_COLORS = _cumulative(COLOR_WEIGHTS)
+_LINE_COUNTS = _cumulative(LINE_COUNT_WEIGHTS)
+_QUANTITIES = _cumulative(QUANTITY_WEIGHTS)
+
+
+def _weighted(rng: random.Random, choices: Tuple[list, list]):
+    values, cum_weights = choices
+    return rng.choices(values, cum_weights=cum_weights)[0]
+
+
+def skewed_rank(rng: random.Random, count: int, skew: float) -> int:
+    """A rank in [0, count), rank r drawn with weight ~ 1 / (r + 1) ** skew"""
+    # Inverse CDF of the continuous power law on [1, count + 1)
+    exponent = 1 - skew
+    x = (((count + 1) ** exponent - 1) * rng.random() + 1) ** (1 / exponent)
+    return min(int(x) - 1, count - 1)
+
+
+def rank_to_index(rank: int, count: int) -> int:
+    """Spread ranks over the catalogue so best sellers are not all adjacent ids"""
+    return rank * _SCATTER % count
+
+
+def index_to_rank(index: int, count: int) -> int:
+    return index * pow(_SCATTER, -1, count) % count if count > 1 else 0
+
+
+class Context:
+    """What every chunk needs to know; small enough to pickle per task"""
+
+    def __init__(self, seed: int, until: datetime, days: int, products: int, users: int, orders: int,
+                 first_product_id: int, first_user_id: int, first_order_id: int,
+                 customer_ids: Tuple[int, int], password_hash: str):
+        self.seed = seed
+        self.until = until
+        self.days = days
+        self.products = products
+        self.users = users
+        self.orders = orders
+        self.first_product_id = first_product_id
+        self.first_user_id = first_user_id
+        self.first_order_id = first_order_id
+        self.customer_ids = customer_ids
+        self.password_hash = password_hash
+
+    def spread(self, index: int, count: int, rng: random.Random) -> datetime:
+        """A timestamp for row `index` of `count`, rising with the index"""
+        step = self.days * 86400 / max(count, 1)
+        return self.until - timedelta(seconds=self.days * 86400 - (index + rng.random()) * step)
+
+
+def product_row(context: Context, index: int) -> tuple:
+    """Row `index` of the generated catalogue, in PRODUCT_COLUMNS order"""
+    rng = _rng(context.seed, _PRODUCT, index)
+    category = _weighted(rng, _CATEGORIES)
+    material = rng.choice(MATERIALS[category])
+    singular = CATEGORY_SINGULAR[category]
+    product_id = context.first_product_id + index
+
+    price = rng.lognormvariate(math.log(MEDIAN_PRICE[category]), 0.35)
+    price = float(min(MAX_PRICE, max(MIN_PRICE, round(price / 50) * 50 - 1)))
+
+    scale = WAIST_SIZES if category == "Jeans" else APPAREL_SIZES
+    run = rng.randint(3, len(scale))
+    start = rng.randint(0, len(scale) - run)
+    colors = []
+    for _ in range(rng.randint(1, 4)):
+        color = _weighted(rng, _COLORS)
+        if color not in colors:
+            colors.append(color)
+    images = IMAGES[category]
+    first_image = rng.randrange(len(images))
+
+    rank = index_to_rank(index, context.products)
+    created_at = context.spread(index, context.products, rng)
+    return (
+        product_id,
+        f"{rng.choice(ADJECTIVES)} {material} {singular} {product_id}",
+        f"{material} {singular.lower()} with {' and '.join(rng.sample(FEATURES, 2))}.",
+        price,
+        category,
+        scale[start:start + run],
+        colors,
+        [images[(first_image + i) % len(images)] for i in range(rng.randint(1, 2))],
+        0 if rng.random() < 0.05 else rng.randint(1, 500),
+        rng.random() >= 0.03,
+        int(TOP_POPULARITY / (rank + 1) ** PRODUCT_SKEW),
+        created_at,
+        created_at,
+    )
+
+
+def user_row(context: Context, index: int) -> tuple:
+    """Row `index` of the generated customers, in USER_COLUMNS order"""
+    rng = _rng(context.seed, _USER, index)
+    user_id = context.first_user_id + index
+    created_at = context.spread(index, context.users, rng)
+    return (
+        user_id,
+        f"customer{user_id}@example.com",
+        context.password_hash,
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        f"+91{rng.randint(6_000_000_000, 9_999_999_999)}",
+        False,
+        True,
+        created_at,
+        created_at,
+    )
+
+
+def order_rows(context: Context, index: int, products: Dict[int, tuple]) -> Tuple[tuple, List[tuple]]:
+    """Order `index` and its items; `products` caches product rows by index"""
+    rng = _rng(context.seed, _ORDER, index)
+    order_id = context.first_order_id + index
+    created_at = context.spread(index, context.orders, rng)
+
+    lowest, highest = context.customer_ids
+    customers = highest - lowest + 1
+    user_id = lowest + rank_to_index(skewed_rank(rng, customers, CUSTOMER_SKEW), customers)
+
+    items = []
+    chosen = set()
+    subtotal = 0.0
+    for _ in range(min(_weighted(rng, _LINE_COUNTS), context.products)):
+        product_index = rank_to_index(skewed_rank(rng, context.products, PRODUCT_SKEW), context.products)
+        while product_index in chosen:
+            product_index = rng.randrange(context.products)
+        chosen.add(product_index)
+
+        product = products.get(product_index)
+        if product is None:
+            product = products[product_index] = product_row(context, product_index)
+        quantity = _weighted(rng, _QUANTITIES)
+        subtotal += product[3] * quantity
+        items.append((
+            order_id, product[0], product[1], product[7][0], product[3], quantity,
+            rng.choice(product[5]), rng.choice(product[6]), created_at,
+        ))
+
+    age = context.until - created_at
+    if rng.random() < 0.05:
+        status = OrderStatus.CANCELLED
+    elif age < timedelta(days=1):
+        status = rng.choice([OrderStatus.PENDING, OrderStatus.PAID, OrderStatus.PROCESSING])
+    elif age < timedelta(days=7):
+        status = rng.choice([OrderStatus.PROCESSING, OrderStatus.SHIPPED])
+    else:
+        status = OrderStatus.DELIVERED
+
+    city, state, pin_prefix = rng.choice(CITIES)
+    subtotal = round(subtotal, 2)
+    tax = round(subtotal * TAX_RATE, 2)
+    order = (
+        order_id,
+        user_id,
+        subtotal,
+        tax,
+        round(subtotal + tax, 2),
+        status.value,
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+        None,
+        city,
+        state,
+        f"{pin_prefix}{rng.randint(0, 999):03d}",
+        f"+91{rng.randint(6_000_000_000, 9_999_999_999)}",
+        created_at,
+        created_at,
+    )
+    return order, items
+
+
+def generate_chunk(kind: str, context: Context, start: int, stop: int) -> Dict[str, List[tuple]]:
+    """Rows for indexes [start, stop) of `kind`, by table name"""
+    if kind == "products":
+        products, attributes = [], []
+        for index in range(start, stop):
+            row = product_row(context, index)
+            products.append(row)
+            attributes += [(a["kind"], a["value"], a["product_id"]) for a in attribute_rows(row[0], row[5], row[6])]
+        return {"products": products, "product_attributes": attributes}
+
+    if kind == "users":
+        return {"users": [user_row(context, index) for index in range(start, stop)]}
+
+    orders, items = [], []
+    # Skewed picks hit the same products over and over
+    products: Dict[int, tuple] = {}
+    for index in range(start, stop):
+        order, lines = order_rows(context, index, products)
+        orders.append(order)
+        items += lines
+    return {"orders": orders, "order_items": items}
+
+
+def _generate_chunk(task):
+    return generate_chunk(*task)
+
+
+def _chunks(kind: str, context: Context, workers: int, count: int, chunk_size: int):
+    """Generated chunks in order, from a pool of `workers` processes"""
+    tasks = [(kind, context, start, min(count, start + chunk_size)) for start in range(0, count, chunk_size)]
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_chunk(task)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        # Keep a couple of chunks per worker in flight so memory stays flat
+        # when writing is slower than generating
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_generate_chunk, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _copy_value(value):
+    if isinstance(value, list):
+        return json.dumps(value)
+    return value
+
+
+def write_rows(connection, table_name: str, rows: List[tuple]) -> None:
+    """Bulk-insert rows given in COLUMNS[table_name] order"""
+    if not rows:
+        return
+    columns = COLUMNS[table_name]
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(value) for value in row])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        table = SQLModel.metadata.tables[table_name]
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+class GenerationReport:
+    """Rows written per table and the time spent on each"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, float]] = {}
+
+    def add(self, table: str, rows: int, seconds: float) -> None:
+        self.tables[table] = {
+            "rows": rows,
+            "seconds": round(seconds, 2),
+            "rows_per_second": round(rows / seconds) if seconds else 0,
+        }
+
+    def as_dict(self) -> dict:
+        return dict(self.tables)
+
+
+def _next_id(connection, model) -> int:
+    return connection.execute(select(func.coalesce(func.max(model.id), 0))).scalar_one() + 1
+
+
+def _sync_sequences(connection, tables) -> None:
+    """Move PostgreSQL id sequences past the explicitly written ids"""
+    if connection.dialect.name != "postgresql":
+        return
+    for table in tables:
+        connection.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM {table}))"
+        )
+
+
+def generate(
+    engine,
+    products: int = 0,
+    users: int = 0,
+    orders: int = 0,
+    seed: int = 42,
+    workers: int = 1,
+    chunk_size: int = 10_000,
+    days: int = 730,
+    until: Optional[datetime] = None,
+    password: str = "password123",
+    progress: Optional[Callable[[str], None]] = None,
+) -> GenerationReport:
+    """Append synthetic products, customers and orders; see the module docstring.
+
+    Order lines reference the products generated by the same call, so
+    `orders` needs `products`. Orders go to this call's customers, or to
+    the existing users when `users` is 0. Customers log in with `password`.
+    Timestamps end at `until` (default: midnight UTC today).
+    """
+    if orders and not products:
+        raise ValueError("Orders are generated against this call's products; pass products as well")
+
+    with engine.connect() as connection:
+        first_product_id = _next_id(connection, Product)
+        first_user_id = _next_id(connection, User)
+        first_order_id = _next_id(connection, Order)
+    customer_ids = (first_user_id, first_user_id + users - 1) if users else (1, first_user_id - 1)
+    if orders and customer_ids[1] < customer_ids[0]:
+        raise ValueError("Orders need customers; pass users or create some first")
+
+    context = Context(
+        seed=seed,
+        until=until or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
+        days=days,
+        products=products,
+        users=users,
+        orders=orders,
+        first_product_id=first_product_id,
+        first_user_id=first_user_id,
+        first_order_id=first_order_id,
+        customer_ids=customer_ids,
+        # One hash for everyone: bcrypt per row would dominate the run
+        password_hash=get_password_hash(password) if users else "",
+    )
+    report = GenerationReport()
+    sqlite_fts = False
+    if products and engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            sqlite_fts = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+            ).first() is not None
+            if sqlite_fts:
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {SQLITE_FTS_INSERT_TRIGGER}")
+
+    try:
+        for kind, count in (("products", products), ("users", users), ("orders", orders)):
+            if not count:
+                continue
+            started = time.perf_counter()
+            written: Dict[str, int] = {}
+            for chunk in _chunks(kind, context, workers, count, chunk_size):
+                with engine.begin() as connection:
+                    for table_name, rows in chunk.items():
+                        write_rows(connection, table_name, rows)
+                        written[table_name] = written.get(table_name, 0) + len(rows)
+                if progress:
+                    done = written[kind]
+                    progress(f"{kind}: {done:,}/{count:,} ({done / (time.perf_counter() - started):,.0f} rows/s)")
+
+            if kind == "products" and sqlite_fts:
+                with engine.begin() as connection:
+                    connection.exec_driver_sql(
+                        "INSERT INTO products_fts(rowid, name, description) "
+                        "SELECT id, name, description FROM products WHERE id >= ?",
+                        (first_product_id,)
+                    )
+            if kind == "products":
+                written["product_facet_counts"] = rebuild_facet_counts(engine)
+            seconds = time.perf_counter() - started
+            for table_name, rows in written.items():
+                report.add(table_name, rows, seconds)
+    finally:
+        if sqlite_fts:
+            with engine.begin() as connection:
+                connection.exec_driver_sql(SQLITE_FTS_INSERT_DDL)
+
+    with engine.begin() as connection:
+        _sync_sequences(connection, [table for table in ("products", "users", "orders") if table in report.tables])
+    return report
@@ -1,8 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
-from app.db.session import init_db
+from app.core.hashing import password_hasher
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, http_metrics, render_metrics
+from app.core import profiling, warmup
+from app.core.responses import get_response_class
+from app.db.session import prepare_schema, engine, async_engine, replica_engines, replica_router
+from app.db.idempotency import idempotency_key_cleaner
+from app.db.jobs import job_worker
 from app.api import auth, products, orders, admin
 
 settings = get_settings()
@@ -11,7 +17,8 @@ settings = get_settings()
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    default_response_class=get_response_class(settings.JSON_RESPONSE_CLASS)
 )
 
 # Configure CORS
@@ -23,6 +30,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# SQL profiling; the listeners are always on so tests can use query_budget()
+profiling.track_engine(engine)
+profiling.track_engine(async_engine.sync_engine)
+for replica in replica_engines:
+    profiling.track_engine(replica.sync_engine)
+if settings.SQL_PROFILE_SAMPLE_RATE > 0:
+    app.add_middleware(
+        profiling.ProfilingMiddleware,
+        sample_rate=settings.SQL_PROFILE_SAMPLE_RATE,
+        slow_request_ms=settings.SQL_PROFILE_SLOW_REQUEST_MS,
+        repeat_threshold=settings.SQL_PROFILE_REPEAT_THRESHOLD,
+    )
+
+# Added last so it wraps everything, CORS included
+if settings.METRICS_ENABLED:
+    http_metrics.track_engine("sync", engine)
+    http_metrics.track_engine("async", async_engine.sync_engine)
+    for number, replica in enumerate(replica_engines):
+        http_metrics.track_engine(f"replica{number}", replica.sync_engine)
+    app.add_middleware(MetricsMiddleware, metrics=http_metrics)
+
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -33,8 +61,22 @@ app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
-    init_db()
+    """Check the schema and start background tasks"""
+    prepare_schema()
+    if settings.CATALOG_WARMUP:
+        await warmup.run_warm_up(app)
+    idempotency_key_cleaner.start()
+    job_worker.start()
+    replica_router.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker pools on shutdown"""
+    await idempotency_key_cleaner.stop()
+    await job_worker.stop()
+    await replica_router.stop()
+    password_hasher.shutdown()
 
 
 @app.get("/")
@@ -50,4 +92,11 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(content=render_metrics(http_metrics), media_type=CONTENT_TYPE)
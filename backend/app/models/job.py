@@ -0,0 +1,22 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field, Column, JSON, Index
+
+
+class BackgroundJob(SQLModel, table=True):
+    """Deferred work, queued until a background worker runs it"""
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        # Claim order: due queued jobs, oldest first
+        Index("ix_background_jobs_status_available_at", "status", "available_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)  # Selects the handler, e.g. "order_placed"
+    payload: dict = Field(default={}, sa_column=Column(JSON))
+    status: str = Field(default="queued")  # "queued", or "failed" once retries run out
+    attempts: int = Field(default=0)  # Claims so far; a claim only counts with the latest number
+    # When the job is due; pushed forward while it is claimed or backing off
+    available_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
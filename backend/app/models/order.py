@@ -1,7 +1,7 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
 
 
 class OrderStatus(str, Enum):
@@ -17,9 +17,16 @@ class OrderStatus(str, Enum):
 class Order(SQLModel, table=True):
     """Order model"""
     __tablename__ = "orders"
+    __table_args__ = (
+        # Newest-first keyset pagination of the admin listing, optionally by status
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        # A user's order history; also serves plain user_id lookups
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id", nullable=False, index=True)
+    user_id: int = Field(foreign_key="users.id", nullable=False)
     
     # Totals
     subtotal: float = Field(nullable=False)
@@ -40,6 +47,13 @@ class Order(SQLModel, table=True):
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Not loaded implicitly (that would need I/O under async); load with
+    # load_order_with_items() or assign items before flushing
+    items: List["OrderItem"] = Relationship(
+        back_populates="order",
+        sa_relationship_kwargs={"order_by": "OrderItem.id", "lazy": "raise_on_sql"}
+    )
 
 
 class OrderItem(SQLModel, table=True):
@@ -60,4 +74,25 @@ class OrderItem(SQLModel, table=True):
     selected_size: Optional[str] = None
     selected_color: Optional[str] = None
     
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    order: Optional[Order] = Relationship(
+        back_populates="items",
+        sa_relationship_kwargs={"lazy": "raise_on_sql"}
+    )
+
+
+class CheckoutIdempotencyKey(SQLModel, table=True):
+    """A checkout's Idempotency-Key: claimed while the order is placed, then
+    holding the response to replay for repeats of the request"""
+    __tablename__ = "checkout_idempotency_keys"
+    
+    user_id: int = Field(foreign_key="users.id", primary_key=True)  # Keys are per user
+    key: str = Field(primary_key=True)
+    request_hash: str = Field(nullable=False)  # Same key with another body is rejected
+    status: str = Field(nullable=False)  # "in_progress" or "completed"
+    response_status: Optional[int] = None
+    response_body: Optional[str] = None
+    # When the key was claimed (or last taken over after a crash)
+    locked_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(nullable=False, index=True)
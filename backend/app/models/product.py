@@ -1,11 +1,17 @@
 from typing import Optional, List
 from datetime import datetime
-from sqlmodel import SQLModel, Field, Column, JSON
+from sqlmodel import SQLModel, Field, Column, JSON, Index
 
 
 class Product(SQLModel, table=True):
     """Product model for clothing items"""
     __tablename__ = "products"
+    __table_args__ = (
+        # Sort column + id tie-breaker, for keyset pagination of each sort_by
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_popularity_id", "popularity", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(nullable=False, index=True)
@@ -23,4 +29,40 @@ class Product(SQLModel, table=True):
     popularity: int = Field(default=0)  # For sorting by popularity
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ProductAttribute(SQLModel, table=True):
+    """Indexable copy of a product's sizes and colors, one row per value"""
+    __tablename__ = "product_attributes"
+    
+    kind: str = Field(primary_key=True)  # "size" or "color"
+    value: str = Field(primary_key=True)
+    product_id: int = Field(foreign_key="products.id", primary_key=True, index=True)
+
+
+class ProductFacetCount(SQLModel, table=True):
+    """Active products per category and facet value (see app.db.facets)"""
+    __tablename__ = "product_facet_counts"
+    
+    category: str = Field(primary_key=True)
+    facet: str = Field(primary_key=True)  # "category", "size", "color" or "price"
+    value: str = Field(primary_key=True)  # "" for "category", the bucket index for "price"
+    products: int = Field(default=0)
+
+
+class ProductFacetCombination(SQLModel, table=True):
+    """Active products per category, size, color and price slot, behind
+    the facet counts of filtered listings (see app.db.facets)"""
+    __tablename__ = "product_facet_combinations"
+    __table_args__ = (
+        # Facets fix the size and the color, or one of them and group by the other
+        Index("ix_product_facet_combinations_size_color", "size", "color"),
+        Index("ix_product_facet_combinations_color_size", "color", "size"),
+    )
+    
+    category: str = Field(primary_key=True)
+    size: str = Field(primary_key=True)  # "" for any size
+    color: str = Field(primary_key=True)  # "" for any color
+    price_slot: int = Field(primary_key=True)  # see app.db.facets.price_slot
+    products: int = Field(default=0)
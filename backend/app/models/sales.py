@@ -0,0 +1,40 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class SalesRollup(SQLModel, table=True):
+    """Orders and revenue per hour or day (see app.db.rollups)"""
+    __tablename__ = "sales_rollups"
+
+    period: str = Field(primary_key=True)  # "hour" or "day"
+    bucket_start: datetime = Field(primary_key=True)  # UTC
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    subtotal: float = Field(default=0.0)
+    tax: float = Field(default=0.0)
+    revenue: float = Field(default=0.0)  # Order totals, tax included
+
+
+class ProductSalesRollup(SQLModel, table=True):
+    """Units and revenue per product, hour or day"""
+    __tablename__ = "product_sales_rollups"
+
+    period: str = Field(primary_key=True)
+    bucket_start: datetime = Field(primary_key=True)
+    # No foreign key, so rollup writes take no lock on the product rows checkout updates
+    product_id: int = Field(primary_key=True)
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0.0)  # Item prices before tax
+
+
+class CategorySalesRollup(SQLModel, table=True):
+    """Units and revenue per product category, hour or day"""
+    __tablename__ = "category_sales_rollups"
+
+    period: str = Field(primary_key=True)
+    bucket_start: datetime = Field(primary_key=True)
+    category: str = Field(primary_key=True)  # The product's category when the sale was rolled up
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0.0)  # Item prices before tax
@@ -0,0 +1,57 @@
+from typing import Optional, List
+from datetime import datetime
+from pydantic import BaseModel
+
+
+# Response schemas
+class SalesBucket(BaseModel):
+    bucket_start: datetime
+    orders: int
+    units: int
+    subtotal: float
+    tax: float
+    revenue: float
+
+
+class SalesTotals(BaseModel):
+    orders: int
+    units: int
+    subtotal: float
+    tax: float
+    revenue: float
+
+
+class RevenueReport(BaseModel):
+    granularity: str
+    start: datetime
+    end: datetime
+    buckets: List[SalesBucket]
+    totals: SalesTotals
+
+
+class ProductSales(BaseModel):
+    product_id: int
+    name: Optional[str] = None
+    category: Optional[str] = None
+    orders: int
+    units: int
+    revenue: float
+
+
+class TopProductsReport(BaseModel):
+    start: datetime
+    end: datetime
+    products: List[ProductSales]
+
+
+class CategorySales(BaseModel):
+    category: str
+    orders: int
+    units: int
+    revenue: float
+
+
+class CategoryReport(BaseModel):
+    start: datetime
+    end: datetime
+    categories: List[CategorySales]
@@ -0,0 +1,18 @@
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+
+# Response schemas
+class BackgroundJobResponse(BaseModel):
+    id: int
+    kind: str
+    payload: dict
+    status: str
+    attempts: int
+    available_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
@@ -1,6 +1,8 @@
 from typing import Optional, List
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
+
+from app.core.imports import split_list
 
 
 # Request schemas
@@ -27,6 +29,29 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+# Bulk import rows (CSV cells hold lists as "S|M|L")
+class ProductImportRow(ProductCreate):
+    _split_lists = field_validator("sizes", "colors", "images", mode="before")(split_list)
+
+
+class ProductImportPatch(ProductUpdate):
+    # Upsert rows: fields left out keep their current values
+    id: Optional[int] = None  # Key for upsert_by=id
+    
+    _split_lists = field_validator("sizes", "colors", "images", mode="before")(split_list)
+
+
+class ProductBulkUpdateItem(BaseModel):
+    id: int
+    price: Optional[float] = None
+    stock: Optional[int] = None
+    is_active: Optional[bool] = None
+
+
+class ProductBulkUpdate(BaseModel):
+    updates: List[ProductBulkUpdateItem]
+
+
 # Response schemas
 class ProductResponse(BaseModel):
     id: int
@@ -49,7 +74,49 @@ class ProductResponse(BaseModel):
 
 class ProductListResponse(BaseModel):
     products: List[ProductResponse]
-    total: int
+    total: Optional[int] = None  # None when count=none
+    total_is_estimate: bool = False
     page: int
     page_size: int
-    total_pages: int
\ No newline at end of file
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    min: float
+    max: float
+    count: int
+
+
+class ProductFacetsResponse(BaseModel):
+    total: int
+    categories: List[FacetCount]
+    sizes: List[FacetCount]
+    colors: List[FacetCount]
+    price_buckets: List[PriceBucket]
+
+
+class ProductImportError(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class ProductImportResponse(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[ProductImportError]
+    errors_truncated: bool = False  # More rows failed than are listed
+
+
+class ProductBulkUpdateResponse(BaseModel):
+    received: int
+    matched: int  # Distinct ids that exist
+    updated: int  # Products whose values changed
+    unknown_ids: List[int]
@@ -21,6 +21,11 @@ class UserUpdate(BaseModel):
     phone: Optional[str] = None
 
 
+class AdminUserUpdate(BaseModel):
+    is_admin: Optional[bool] = None
+    is_active: Optional[bool] = None
+
+
 # Response schemas
 class UserResponse(BaseModel):
     id: int
@@ -0,0 +1 @@
+# Benchmark scripts for the backend (run with `python -m benchmarks.<name>`)
@@ -0,0 +1,59 @@
+"""
+Benchmark for auth-heavy endpoints with the authenticated-user cache off and on.
+
+    python -m benchmarks.bench_auth_cache --requests 3000 --concurrency 20
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import (
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    run_load,
+)
+
+
+async def main(args):
+    from app.core import security
+
+    init_database()
+    create_user("bench@example.com")
+    create_user("admin@example.com", is_admin=True)
+
+    async with make_client() as client:
+        headers = await login(client, "bench@example.com")
+        admin_headers = await login(client, "admin@example.com")
+
+        async def me(i):
+            response = await client.get("/api/auth/me", headers=headers)
+            return response.status_code == 200
+
+        async def my_orders(i):
+            response = await client.get("/api/orders", headers=headers)
+            return response.status_code == 200
+
+        async def admin_metrics(i):
+            response = await client.get("/api/admin/metrics", headers=admin_headers)
+            return response.status_code == 200
+
+        ttl = security.user_cache.ttl
+        for label, cache_ttl in (("off", 0), ("on", ttl)):
+            for cache in (security.token_cache, security.user_cache):
+                cache.clear()
+                cache.ttl = cache_ttl
+            for name, flow in (("me", me), ("orders", my_orders), ("admin", admin_metrics)):
+                result = await run_load(f"{name} (cache {label})", flow, args.requests, args.concurrency)
+                print(result.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
@@ -0,0 +1,238 @@
+"""
+Background job queue: checks, checkout latency with follow-ups offloaded,
+and worker throughput by batch size.
+
+    python -m benchmarks.bench_background_jobs --orders 300 --followup-ms 20
+
+Checks, and exits with status 1 if any fails:
+
+    drain       every checkout queued one job, and running them counts
+                every unit sold towards popularity
+    retry       a job that fails once is retried after its backoff and
+                then completes
+    isolation   one failing job in a batch does not hold back the others;
+                it is kept as "failed" after JOB_MAX_ATTEMPTS
+    lease       a job whose lease ran out is claimed again, and the first
+                claim can no longer complete it
+    admin       POST /api/admin/jobs/{id}/retry queues a failed job again
+                (404 for unknown jobs, 409 for jobs that have not failed)
+
+--followup-ms stands in for post-order work the queue exists for (an
+email or a call to another service). "inline" runs the follow-ups inside
+the checkout as before; "offloaded" queues them, with a worker running
+alongside the load.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    run_load,
+    seed_catalog,
+)
+
+FLAKY = "bench_flaky"
+
+
+async def main(args) -> int:
+    from sqlalchemy import func, insert
+    from sqlmodel import Session, select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    import app.api.orders as orders_api
+    from app.db import jobs
+    from app.db.orders import ORDER_PLACED, run_order_followups
+    from app.db.session import async_engine, engine
+    from app.models.job import BackgroundJob
+    from app.models.product import Product
+
+    init_database()
+    seed_catalog(50)
+    create_user("jobs@example.com")
+    create_user("jobs-admin@example.com", is_admin=True)
+
+    failures = []
+
+    def check(name: str, ok: bool, detail: str) -> None:
+        print(f"{name:<10} {'ok' if ok else 'FAILED'}  {detail}")
+        if not ok:
+            failures.append(name)
+
+    def job_counts() -> dict:
+        with Session(engine) as session:
+            return dict(session.exec(
+                select(BackgroundJob.status, func.count()).group_by(BackgroundJob.status)
+            ).all())
+
+    def total_popularity() -> int:
+        with Session(engine) as session:
+            return session.exec(select(func.sum(Product.popularity))).one()
+
+    def enqueue(kind: str, payloads: list) -> None:
+        with Session(engine) as session:
+            session.execute(insert(BackgroundJob), [
+                {"kind": kind, "payload": payload, "status": jobs.QUEUED, "attempts": 0}
+                for payload in payloads
+            ])
+            session.commit()
+
+    def worker(**overrides) -> "jobs.JobWorker":
+        options = dict(workers=1, poll_interval=0.05, batch_size=100, visibility_timeout=30,
+                       max_attempts=3, retry_backoff=0.05, retry_backoff_max=0.2)
+        options.update(overrides)
+        return jobs.JobWorker(**options)
+
+    # Stand-in for slow post-order work, in both modes
+    async def slow_followups(session, payloads):
+        await run_order_followups(session, payloads)
+        await asyncio.sleep(args.followup_ms / 1000)
+
+    jobs.handlers[ORDER_PLACED] = slow_followups
+    queue_followups = orders_api.queue_order_followups
+    default_worker = orders_api.job_worker
+
+    async def inline_followups(session, order, quantities):
+        await slow_followups(session, [{"order_id": order.id, "quantities": quantities}])
+
+    async with make_client() as client:
+        headers = await login(client, "jobs@example.com")
+        admin_headers = await login(client, "jobs-admin@example.com")
+        cart = {"items": [{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 2}],
+                "shipping_address": SHIPPING_ADDRESS}
+
+        async def checkout(i):
+            response = await client.post("/api/orders", json=cart, headers=headers)
+            return response.status_code == 201
+
+        print(f"{'checkout':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  queue")
+        for mode in args.modes:
+            popularity_before = total_popularity()
+            running = None
+            if mode == "inline":
+                orders_api.queue_order_followups = inline_followups
+            else:
+                orders_api.queue_order_followups = queue_followups
+                running = worker(workers=args.workers, batch_size=args.batch_size)
+                running.start()
+            # Checkouts wake the worker that is running
+            orders_api.job_worker = running or default_worker
+
+            result = await run_load(mode, checkout, args.orders, args.concurrency)
+            queue = ""
+            if running is not None:
+                # Let the workers catch up, then report what they saw
+                started = time.perf_counter()
+                while job_counts().get(jobs.QUEUED) and time.perf_counter() - started < 60:
+                    await asyncio.sleep(0.05)
+                caught_up_ms = (time.perf_counter() - started) * 1000
+                await running.stop()
+                stats = running.stats()
+                queue = (f"{stats['jobs_succeeded']} jobs in {stats['batches']} batches, "
+                         f"max lag {stats['max_lag_ms']:.0f} ms, drained {caught_up_ms:.0f} ms after the load")
+            orders_api.job_worker = default_worker
+            print(f"{mode:<12} {result.rps:>8.1f} {result.percentile(50):>8.2f} "
+                  f"{result.percentile(95):>8.2f} {result.percentile(99):>8.2f}  {queue}")
+
+            sold = total_popularity() - popularity_before
+            if mode == "offloaded":
+                check("drain", result.errors == 0 and not job_counts() and sold == 3 * args.orders,
+                      f"{args.orders} orders, {sold} units counted, jobs left {job_counts()}")
+        orders_api.queue_order_followups = queue_followups
+        jobs.handlers[ORDER_PLACED] = run_order_followups
+
+        # A handler that fails on the first attempt, or always for "poison"
+        logging.getLogger("app.db.jobs").setLevel(logging.CRITICAL)
+        seen = set()
+
+        @jobs.job_handler(FLAKY)
+        async def flaky(session, payloads):
+            for payload in payloads:
+                if payload.get("poison") or payload["id"] not in seen:
+                    seen.add(payload["id"])
+                    raise RuntimeError(f"flaky job {payload['id']}")
+
+        checker = worker()
+        enqueue(FLAKY, [{"id": "retry"}])
+        await checker.run_pending()
+        retried = (checker.jobs_retried, job_counts())
+        await asyncio.sleep(0.1)
+        await checker.run_pending()
+        check("retry", retried == (1, {jobs.QUEUED: 1}) and checker.jobs_succeeded == 1 and not job_counts(),
+              f"retried {retried[0]}, then succeeded {checker.jobs_succeeded}")
+
+        checker = worker()
+        seen.update(str(i) for i in range(9))
+        enqueue(FLAKY, [{"id": str(i)} for i in range(9)] + [{"id": "poison", "poison": True}])
+        await checker.run_pending()
+        first_pass = checker.jobs_succeeded
+        for _ in range(3):
+            await asyncio.sleep(0.25)
+            await checker.run_pending()
+        check("isolation", first_pass == 9 and checker.jobs_failed == 1 and job_counts() == {jobs.FAILED: 1},
+              f"{first_pass} of 10 done in the first batch, then {job_counts()}")
+
+        enqueue(FLAKY, [{"id": "lease"}])
+        seen.add("lease")
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            first = await jobs.claim_jobs(session, 10, visibility_timeout=0.1)
+            await asyncio.sleep(0.2)
+            checker = worker()
+            await checker.run_pending()
+            stale = await jobs.finish_jobs(session, first)
+            await session.rollback()
+        check("lease", len(first) == 1 and checker.jobs_succeeded == 1 and not stale,
+              f"claimed again after the lease: {checker.jobs_succeeded == 1}, first claim completed: {stale}")
+
+        with Session(engine) as session:
+            poison_id = session.exec(select(BackgroundJob.id).where(BackgroundJob.status == jobs.FAILED)).one()
+        retried = await client.post(f"/api/admin/jobs/{poison_id}/retry", headers=admin_headers)
+        again = await client.post(f"/api/admin/jobs/{poison_id}/retry", headers=admin_headers)
+        missing = await client.post("/api/admin/jobs/999999/retry", headers=admin_headers)
+        metrics = (await client.get("/api/admin/metrics", headers=admin_headers)).json()["jobs"]
+        check("admin", (retried.status_code, again.status_code, missing.status_code) == (200, 409, 404)
+              and retried.json()["attempts"] == 0 and metrics["queue"]["queued"] == 1,
+              f"statuses {retried.status_code}, {again.status_code}, {missing.status_code}; queue {metrics['queue']}")
+        with Session(engine) as session:
+            session.execute(BackgroundJob.__table__.delete())
+            session.commit()
+
+    # Worker throughput on a backlog of order jobs, without the stand-in delay
+    print(f"\n{'batch size':>10} {'jobs':>7} {'seconds':>8} {'jobs/s':>8}")
+    for batch_size in args.batch_sizes:
+        enqueue(ORDER_PLACED, [
+            {"order_id": i, "quantities": {str(i % 50 + 1): 1}} for i in range(args.backlog)
+        ])
+        draining = worker(batch_size=batch_size)
+        started = time.perf_counter()
+        await draining.run_pending()
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>10} {draining.jobs_succeeded:>7} {elapsed:>8.2f} {draining.jobs_succeeded / elapsed:>8.0f}")
+
+    if failures:
+        print(f"\nFAILED: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--followup-ms", type=float, default=20.0, help="simulated post-order work per job batch")
+    parser.add_argument("--modes", nargs="+", default=["inline", "offloaded"], choices=["inline", "offloaded"])
+    parser.add_argument("--workers", type=int, default=1, help="worker coroutines during the checkout load")
+    parser.add_argument("--batch-size", type=int, default=100, help="jobs per claim during the checkout load")
+    parser.add_argument("--backlog", type=int, default=5000, help="queued jobs drained per batch size")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,87 @@
+"""
+Bulk price/stock update throughput: PATCH /api/admin/products vs one
+PUT /api/admin/products/{id} per product.
+
+    python -m benchmarks.bench_bulk_update --products 200000 --updates 50000
+
+"stock sync" sets a new stock level on every product in the request,
+"stock sync, unchanged" replays the same request (nothing is written), and
+"price + stock" sets both on every product. Bulk modes are repeated for
+each --chunk-sizes value.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import (
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    seed_catalog,
+)
+
+ADMIN_EMAIL = "bulk-admin@example.com"
+
+
+async def main(args):
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    init_database()
+    seed_catalog(args.products)
+    create_user(ADMIN_EMAIL, is_admin=True)
+    rng = random.Random(7)
+
+    async with make_client() as client:
+        headers = await login(client, ADMIN_EMAIL)
+        print(f"{'mode':<26} {'chunk':>6} {'updates':>8} {'seconds':>8} {'updates/s':>10} {'changed':>8}")
+
+        def report(mode, chunk, count, seconds, changed):
+            print(f"{mode:<26} {chunk:>6} {count:>8} {seconds:>8.2f} {count / seconds:>10.0f} {changed:>8}")
+
+        # The old way: one request with get, setattr, commit and refresh per product
+        if args.baseline_updates:
+            started = time.perf_counter()
+            for product_id in rng.sample(range(1, args.products + 1), args.baseline_updates):
+                response = await client.put(
+                    f"/api/admin/products/{product_id}", json={"stock": rng.randint(0, 500)}, headers=headers
+                )
+                assert response.status_code == 200, response.text
+            report("PUT /products/{id}", "-", args.baseline_updates, time.perf_counter() - started, "-")
+
+        for chunk_size in args.chunk_sizes:
+            settings.PRODUCT_BULK_UPDATE_CHUNK_SIZE = chunk_size
+            product_ids = rng.sample(range(1, args.products + 1), args.updates)
+            stock_sync = [{"id": product_id, "stock": rng.randint(0, 500)} for product_id in product_ids]
+            price_and_stock = [
+                {"id": product_id, "price": round(rng.uniform(199, 4999), 2), "stock": rng.randint(0, 500)}
+                for product_id in product_ids
+            ]
+
+            for mode, updates in (
+                ("stock sync", stock_sync),
+                ("stock sync, unchanged", stock_sync),
+                ("price + stock", price_and_stock),
+            ):
+                started = time.perf_counter()
+                response = await client.patch("/api/admin/products", json={"updates": updates}, headers=headers)
+                seconds = time.perf_counter() - started
+                assert response.status_code == 200, response.text
+                result = response.json()
+                assert result["matched"] == len(updates) and not result["unknown_ids"], result
+                report(mode, chunk_size, len(updates), seconds, result["updated"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--updates", type=int, default=50_000, help="products per bulk request")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--baseline-updates", type=int, default=500, help="products updated one request at a time")
+    args = parser.parse_args()
+
+    configure_environment()
+    asyncio.run(main(args))
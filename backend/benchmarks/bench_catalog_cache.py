@@ -0,0 +1,84 @@
+"""
+Anonymous catalog traffic with the response cache off and on.
+
+Query parameters follow a skewed distribution (a few popular listings and
+products get most traffic), with an occasional checkout mixed in so stock
+changes exercise invalidation.
+
+    python -m benchmarks.bench_catalog_cache --products 20000 --requests 5000
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import (
+    CATEGORIES,
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    run_load,
+    seed_catalog,
+)
+
+
+async def main(args):
+    from app.core.catalog_cache import catalog_cache
+
+    init_database()
+    seed_catalog(args.products)
+    create_user("bench@example.com")
+
+    sorts = ["price_asc", "price_desc", "newest", "popularity"]
+
+    async with make_client() as client:
+        headers = await login(client, "bench@example.com")
+
+        def skewed(n):
+            return min(n, int(random.paretovariate(1.2)))
+
+        async def browse(i):
+            if i % 200 == 0:
+                response = await client.post(
+                    "/api/orders",
+                    json={"items": [{"product_id": skewed(50), "quantity": 1}],
+                          "shipping_address": SHIPPING_ADDRESS},
+                    headers=headers,
+                )
+                return response.status_code == 201
+            if i % 3 == 0:
+                response = await client.get(f"/api/products/{skewed(args.products)}")
+            else:
+                params = {
+                    "page": skewed(50),
+                    "category": CATEGORIES[skewed(len(CATEGORIES)) - 1],
+                    "sort_by": sorts[skewed(len(sorts)) - 1],
+                }
+                response = await client.get("/api/products", params=params)
+            return response.status_code == 200
+
+        ttl = catalog_cache.ttl
+        for label, cache_ttl in (("off", 0), ("on", ttl)):
+            random.seed(11)
+            catalog_cache.clear()
+            catalog_cache.ttl = cache_ttl
+            result = await run_load(f"catalog (cache {label})", browse, args.requests, args.concurrency)
+            print(result.report())
+
+        stats = catalog_cache.stats()
+        print(f"hit ratio {stats['hit_ratio']:.2%}, {stats['entries']} entries, "
+              f"{stats['bytes'] / 1024:.0f} KiB, {stats['evictions']} evictions, "
+              f"{stats['invalidations']} invalidations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
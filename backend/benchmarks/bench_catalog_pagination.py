@@ -0,0 +1,71 @@
+"""
+Catalog pagination latency: OFFSET vs keyset cursor, shallow vs deep pages.
+
+    python -m benchmarks.bench_catalog_pagination --products 1000000 --deep-page 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import configure_environment, init_database, make_client, seed_catalog
+
+
+async def timed(client, params, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/api/products", params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(latencies)
+
+
+async def main(args):
+    from sqlmodel import Session, select
+    from app.api.products import SORT_KEYS
+    from app.core.pagination import encode_cursor
+    from app.db.session import engine
+    from app.models.product import Product
+
+    init_database()
+    started = time.perf_counter()
+    seed_catalog(args.products)
+    print(f"seeded {args.products} products in {time.perf_counter() - started:.1f}s")
+
+    page_size = 20
+    print(f"{'sort_by':<11} {'mode':<22} {'page 1 ms':>10} {f'page {args.deep_page} ms':>14}")
+    async with make_client() as client:
+        for sort_by, (column, descending) in SORT_KEYS.items():
+            # Cursor pointing at the last row of the page before the deep page
+            order = (column.desc(), Product.id.desc()) if descending else (column.asc(), Product.id.asc())
+            with Session(engine) as session:
+                last = session.exec(
+                    select(Product)
+                    .where(Product.is_active == True)
+                    .order_by(*order)
+                    .offset((args.deep_page - 1) * page_size - 1)
+                    .limit(1)
+                ).one()
+            deep_cursor = encode_cursor(sort_by, [getattr(last, column.key), last.id])
+
+            base = {"sort_by": sort_by, "page_size": page_size}
+            for mode, extra in (("offset + exact count", {}), ("offset, count=none", {"count": "none"})):
+                first = await timed(client, {**base, **extra, "page": 1}, args.repeat)
+                deep = await timed(client, {**base, **extra, "page": args.deep_page}, args.repeat)
+                print(f"{sort_by:<11} {mode:<22} {first:>10.2f} {deep:>14.2f}")
+
+            first = await timed(client, {**base, "count": "none"}, args.repeat)
+            deep = await timed(client, {**base, "count": "none", "cursor": deep_cursor}, args.repeat)
+            print(f"{sort_by:<11} {'cursor, count=none':<22} {first:>10.2f} {deep:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--deep-page", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
@@ -0,0 +1,60 @@
+"""
+Checkout cost by cart size: SQL statements per order and latency.
+
+    python -m benchmarks.bench_checkout --orders 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    QueryCounter,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    seed_catalog,
+)
+
+CART_SIZES = [1, 5, 10, 20, 50, 100]
+
+
+async def main(args):
+    init_database()
+    seed_catalog(max(CART_SIZES))
+    create_user("bench@example.com")
+
+    async with make_client() as client:
+        headers = await login(client, "bench@example.com")
+        # Warm up the auth cache so it does not skew the first cart size
+        await client.get("/api/auth/me", headers=headers)
+
+        print(f"{'cart size':>9}  {'statements':>10}  {'mean ms':>8}  {'p95 ms':>8}")
+        for size in CART_SIZES:
+            items = [{"product_id": i, "quantity": 1} for i in range(1, size + 1)]
+            payload = {"items": items, "shipping_address": SHIPPING_ADDRESS}
+            latencies = []
+            with QueryCounter() as counter:
+                for _ in range(args.orders):
+                    started = time.perf_counter()
+                    response = await client.post("/api/orders", json=payload, headers=headers)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 201, response.text
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                f"{size:>9}  {counter.count / args.orders:>10.1f}  "
+                f"{statistics.mean(latencies):>8.2f}  {p95:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=30, help="orders per cart size")
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
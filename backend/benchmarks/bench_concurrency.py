@@ -0,0 +1,73 @@
+"""
+Concurrency benchmark for the browse and checkout flows.
+
+Drives the ASGI app in-process at a fixed concurrency and reports requests/sec
+and latency percentiles. Run it on two checkouts (e.g. before and after a
+change to the session layer) against the same DATABASE_URL to compare.
+
+    python -m benchmarks.bench_concurrency --products 2000 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import (
+    CATEGORIES,
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    run_load,
+    seed_catalog,
+)
+
+
+async def main(args):
+    init_database()
+    seed_catalog(args.products)
+    create_user("bench@example.com")
+
+    rng = random.Random(7)
+    sorts = ["price_asc", "price_desc", "newest", "popularity"]
+
+    async with make_client() as client:
+        headers = await login(client, "bench@example.com")
+
+        async def browse(i):
+            params = {
+                "page": rng.randint(1, 20),
+                "page_size": 20,
+                "category": rng.choice(CATEGORIES),
+                "sort_by": rng.choice(sorts),
+            }
+            response = await client.get("/api/products", params=params)
+            return response.status_code == 200
+
+        async def checkout(i):
+            items = [
+                {"product_id": rng.randint(1, args.products), "quantity": 1}
+                for _ in range(rng.randint(1, 3))
+            ]
+            response = await client.post(
+                "/api/orders",
+                json={"items": items, "shipping_address": SHIPPING_ADDRESS},
+                headers=headers,
+            )
+            return response.status_code == 201
+
+        for name, flow in (("browse", browse), ("checkout", checkout)):
+            result = await run_load(name, flow, args.requests, args.concurrency)
+            print(result.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
@@ -0,0 +1,144 @@
+"""
+Facet endpoint latency on a large catalog, uncached and from the response cache.
+
+    python -m benchmarks.bench_facets --products 500000
+
+Requests without a search, and with price bounds on multiples of 100, are
+answered from the maintained counts (product_facet_counts when filtered by
+category only, product_facet_combinations otherwise); a search counts the
+matching rows ("source" column). Before timing, checks that the maintained
+counts equal a recount after admin creates, updates, deletes, bulk updates
+and imports, and exits with status 1 if they do not.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.common import (
+    COLORS,
+    SIZES,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    seed_catalog,
+)
+
+FILTER_SETS = [
+    {},
+    {"category": "Jeans"},
+    {"price_bucket_size": 1000},
+    {"category": "Jeans", "size": "32"},
+    {"category": "Shirts", "color": "Red", "min_price": 1000, "max_price": 3000},
+    {"size": "XL", "color": "Black"},
+    {"search": "denim"},
+]
+# (size, color, min_price, max_price) checked against a recount
+COMBINATIONS = [
+    ("M", None, None, None),
+    (None, "Black", 1000, None),
+    ("S", "Olive", None, 3000),
+    ("32", "Navy", 500, 2500),
+]
+# A new product and an update of the one created by the check
+IMPORT_ROWS = [
+    {"name": "Facet Import Dress", "price": 150, "category": "New Arrivals", "sizes": SIZES[:2], "colors": COLORS[:1]},
+    {"name": "Facet Check Jacket", "category": "New Arrivals", "price": 50},
+]
+
+
+async def main(args) -> int:
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from app.api.products import count_facet_rows
+    from app.core.catalog_cache import catalog_cache
+    from app.db.facets import facet_combination_rows, facet_count_rows
+    from app.db.session import async_engine
+
+    init_database()
+    started = time.perf_counter()
+    seed_catalog(args.products)
+    print(f"seeded {args.products} products in {time.perf_counter() - started:.1f}s")
+    create_user("facets-admin@example.com", is_admin=True)
+
+    async def counts_match() -> list:
+        """Listings whose maintained counts differ from a recount"""
+        mismatched = []
+        async with AsyncSession(async_engine) as session:
+            for category in (None, "Jeans", "New Arrivals"):
+                for bucket_size in (100, 500, 1000):
+                    maintained = await facet_count_rows(session, category, bucket_size)
+                    counted = await count_facet_rows(session, category, None, None, None, None, None, bucket_size)
+                    if sorted(maintained, key=repr) != sorted((tuple(row) for row in counted), key=repr):
+                        mismatched.append((category, bucket_size))
+                    for size, color, min_price, max_price in COMBINATIONS:
+                        filters = (min_price, max_price, size, color)
+                        maintained = await facet_combination_rows(session, category, *filters, bucket_size)
+                        counted = await count_facet_rows(session, category, *filters, None, bucket_size)
+                        if sorted(maintained, key=repr) != sorted((tuple(row) for row in counted), key=repr):
+                            mismatched.append((category, bucket_size, *filters))
+        return mismatched
+
+    ttl = catalog_cache.ttl
+    async with make_client() as client:
+        headers = await login(client, "facets-admin@example.com")
+
+        # One of each admin write that moves facet counts
+        created = await client.post("/api/admin/products", headers=headers, json={
+            "name": "Facet Check Jacket", "price": 2345.0, "category": "New Arrivals",
+            "sizes": ["M", "L"], "colors": ["Olive"], "stock": 5
+        })
+        product_id = created.json()["id"]
+        writes = [
+            created,
+            await client.put(f"/api/admin/products/{product_id}", headers=headers,
+                             json={"category": "Jeans", "price": 999.0, "sizes": ["S"]}),
+            await client.put("/api/admin/products/1", headers=headers, json={"colors": ["Olive", "Black"]}),
+            await client.delete("/api/admin/products/2", headers=headers),
+            await client.patch("/api/admin/products", headers=headers, json={"updates": [
+                {"id": 3, "price": 4321.0}, {"id": 4, "is_active": False}, {"id": 2, "is_active": True},
+            ]}),
+            await client.post("/api/admin/products/import", params={"upsert_by": "name"},
+                              headers={**headers, "content-type": "application/x-ndjson"},
+                              content="".join(json.dumps(row) + "\n" for row in IMPORT_ROWS)),
+        ]
+        statuses = [response.status_code for response in writes]
+        mismatched = await counts_match()
+        ok = statuses == [201, 200, 200, 204, 200, 200] and not mismatched
+        print(f"counts     {'ok' if ok else 'FAILED'}  after admin writes {statuses}, "
+              f"maintained == recount: {mismatched or 'all'}\n")
+
+        async def measure(params):
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = await client.get("/api/products/facets", params=params)
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+            return statistics.median(latencies), response.json()["total"]
+
+        print(f"{'filters':<70} {'source':>7} {'matches':>8} {'uncached ms':>12} {'cached ms':>10}")
+        for params in FILTER_SETS:
+            catalog_cache.ttl = 0
+            uncached, total = await measure(params)
+            catalog_cache.ttl = ttl
+            await client.get("/api/products/facets", params=params)
+            cached, _ = await measure(params)
+            source = "scan" if "search" in params else "counts"
+            print(f"{str(params):<70} {source:>7} {total:>8} {uncached:>12.2f} {cached:>10.2f}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,176 @@
+"""
+Checkout retry storms with Idempotency-Key.
+
+    python -m benchmarks.bench_idempotency --retries 50
+
+Checks, and exits with status 1 if any fails:
+
+    storm     --retries concurrent POST /api/orders with one key place one
+              order: the same order, item, stock and job writes as a
+              single checkout, and every 201 is that order. The others get
+              409 "in progress" (or, on SQLite, a 500 "database is locked"
+              when they cannot even write their claim)
+    replay    repeats after it completed all return the same order
+    mismatch  the key with a different cart is rejected (422)
+    release   a failed checkout (no stock) leaves its key free for a retry
+
+Then measures what a retry costs: full checkouts (a new key each) against
+replays of a completed key.
+"""
+import argparse
+import asyncio
+import re
+import sys
+import uuid
+from collections import Counter
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    run_load,
+    seed_catalog,
+)
+
+# Statements that make up one checkout's writes
+WRITES = re.compile(
+    r"^\s*(INSERT INTO (orders|order_items|background_jobs)\b|UPDATE products\b)",
+    re.IGNORECASE,
+)
+
+
+class WriteCounter:
+    """Checkout write statements executed through the API's engine"""
+
+    def __init__(self):
+        from sqlalchemy import event
+        from app.db.session import async_engine
+
+        self.counts = Counter()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        match = WRITES.match(statement)
+        if match:
+            self.counts[" ".join(match.group(1).split()[:3])] += 1
+
+    def take(self) -> Counter:
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+
+async def main(args) -> int:
+    from sqlmodel import Session, func, select
+    from app.db.session import engine
+    from app.models.order import Order
+    from app.models.product import Product
+
+    init_database()
+    seed_catalog(50, stock=1_000_000)
+    user_id = create_user("retry@example.com")
+    with Session(engine) as session:
+        scarce = session.exec(select(Product.id).order_by(Product.id)).first()
+        session.get(Product, scarce).stock = 1
+        session.commit()
+
+    def order_count() -> int:
+        with Session(engine) as session:
+            return session.exec(select(func.count()).select_from(Order).where(Order.user_id == user_id)).one()
+
+    def stock(product_id: int) -> int:
+        with Session(engine) as session:
+            return session.get(Product, product_id).stock
+
+    counter = WriteCounter()
+    failures = []
+
+    def check(name: str, ok: bool, detail: str) -> None:
+        print(f"{name:<9} {'ok' if ok else 'FAILED'}  {detail}")
+        if not ok:
+            failures.append(name)
+
+    # SQLite's "database is locked" under write load comes back as a 500
+    async with make_client(raise_app_exceptions=False) as client:
+        headers = await login(client, "retry@example.com")
+        cart = {"items": [{"product_id": 2, "quantity": 1}, {"product_id": 3, "quantity": 2}],
+                "shipping_address": SHIPPING_ADDRESS}
+
+        def checkout(key, body=cart):
+            return client.post("/api/orders", json=body, headers={**headers, "Idempotency-Key": key})
+
+        # What one checkout writes, for comparison
+        counter.take()
+        await checkout(str(uuid.uuid4()))
+        one_checkout = counter.take()
+        orders_before = order_count()
+
+        # Everything at once, as a client retrying on a short timeout would
+        key = str(uuid.uuid4())
+        stock_before = stock(2)
+        responses = await asyncio.gather(*(checkout(key) for _ in range(args.retries)))
+        statuses = Counter(response.status_code for response in responses)
+        order_ids = {response.json()["id"] for response in responses if response.status_code == 201}
+        allowed = {201, 409, 500} if engine.dialect.name == "sqlite" else {201, 409}
+        writes = counter.take()
+        placed = order_count() - orders_before
+        check(
+            "storm",
+            placed == 1 and len(order_ids) == 1 and set(statuses) <= allowed
+            and stock(2) == stock_before - 1 and writes == one_checkout,
+            f"statuses {dict(statuses)}, orders placed {placed}, writes {dict(writes)}",
+        )
+
+        responses = await asyncio.gather(*(checkout(key) for _ in range(args.retries)))
+        replayed = {
+            (r.status_code, r.json().get("id"), r.headers.get("idempotent-replayed"))
+            for r in responses if r.status_code != 500
+        }
+        writes = counter.take()
+        check("replay", replayed == {(201, *order_ids, "true")} and not writes,
+              f"responses {replayed}, writes {dict(writes)}")
+
+        other_cart = {**cart, "items": [{"product_id": 4, "quantity": 1}]}
+        response = await checkout(key, other_cart)
+        check("mismatch", response.status_code == 422 and order_count() == orders_before + 1,
+              f"status {response.status_code}")
+
+        retry_key = str(uuid.uuid4())
+        too_many = {**cart, "items": [{"product_id": scarce, "quantity": 2}]}
+        first = await checkout(retry_key, too_many)
+        second = await checkout(retry_key, {**too_many, "items": [{"product_id": scarce, "quantity": 1}]})
+        check("release", (first.status_code, second.status_code) == (400, 201),
+              f"statuses {first.status_code} then {second.status_code}")
+
+        print(f"\n{'request':<22} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+
+        async def fresh(i):
+            response = await checkout(str(uuid.uuid4()))
+            return response.status_code == 201
+
+        async def repeat(i):
+            response = await checkout(key)
+            return response.status_code == 201
+
+        for name, flow in (("checkout (new key)", fresh), ("replay (same key)", repeat)):
+            result = await run_load(name, flow, args.requests, args.concurrency)
+            print(f"{name:<22} {result.rps:>8.1f} {result.percentile(50):>8.2f} "
+                  f"{result.percentile(95):>8.2f} {result.errors:>7}")
+
+    if failures:
+        print(f"\nFAILED: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--retries", type=int, default=50, help="concurrent requests sharing one key")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    configure_environment()
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,117 @@
+"""
+Response serialization time per endpoint: stdlib JSONResponse vs orjson.
+
+    python -m benchmarks.bench_json_responses
+
+Times what FastAPI does after a handler returns: validate against
+response_model, convert to JSON-compatible data, and render the response
+class. Handler payloads are built in memory from ORM objects shaped like
+real rows, so no database is involved.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from benchmarks.common import COLORS, SHIPPING_ADDRESS, SIZES, configure_environment
+
+
+async def per_call_us(fn, budget: float) -> float:
+    """Mean microseconds per call, running for about `budget` seconds"""
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < budget:
+        await fn()
+        calls += 1
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def payloads():
+    """(endpoint, response_model, handler return value) for each case"""
+    from app.core.cache import TTLCache
+    from app.models.order import Order
+    from app.models.product import Product
+    from app.models.user import User
+    from app.schemas.order import OrderListResponse
+    from app.schemas.product import ProductListResponse, ProductResponse
+    from app.schemas.user import UserResponse
+
+    now = datetime.utcnow()
+    orders = [
+        Order(
+            id=i, user_id=7, subtotal=1999.0, tax=359.82, total_amount=2358.82, status="DELIVERED",
+            created_at=now, updated_at=now, **SHIPPING_ADDRESS
+        )
+        for i in range(200)
+    ]
+    products = [
+        Product(
+            id=i, name=f"Classic Cotton T-Shirt {i}", description="Cotton t-shirts with stretch fit.",
+            price=799.0, category="T-Shirts", sizes=SIZES[:3], colors=COLORS[:3],
+            images=[f"https://example.com/{i}.jpg"], stock=100, is_active=True, popularity=5,
+            created_at=now, updated_at=now
+        )
+        for i in range(100)
+    ]
+    user = User(id=7, email="user@example.com", password_hash="x", full_name="Bench User",
+                is_admin=False, is_active=True, created_at=now, updated_at=now)
+    cache = TTLCache(100, 60)
+
+    return [
+        ("GET /api/auth/me", UserResponse, user),
+        ("POST /api/admin/products", ProductResponse, products[0]),
+        ("GET /api/orders (100)", OrderListResponse,
+         {"orders": orders[:100], "total": 5000, "total_is_estimate": False, "next_cursor": "abc"}),
+        ("GET /api/admin/orders (200)", OrderListResponse,
+         {"orders": orders, "total": None, "total_is_estimate": False, "next_cursor": "abc"}),
+        ("GET /api/admin/metrics", None, {"cache": cache.stats(), "other": cache.stats()}),
+        ("product page (100) as model", ProductListResponse,
+         {"products": products, "total": 5000, "page": 1, "page_size": 100, "total_pages": 50}),
+    ]
+
+
+async def main(args):
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from app.core.responses import RESPONSE_CLASSES
+    from app.schemas.product import ProductListResponse, ProductResponse
+
+    print(f"{'endpoint':<30} {'json us':>9} {'orjson us':>10} {'speedup':>8}")
+    for name, model, content in payloads():
+        field = create_response_field(name="response", type_=model) if model else None
+        rendered = {}
+        timings = {}
+        for class_name in ("json", "orjson"):
+            response_class = RESPONSE_CLASSES[class_name]
+
+            async def render():
+                data = await serialize_response(field=field, response_content=content)
+                return response_class(data).body
+
+            rendered[class_name] = json.loads(await render())
+            timings[class_name] = await per_call_us(render, args.seconds)
+        assert rendered["json"] == rendered["orjson"], name
+        print(f"{name:<30} {timings['json']:>9.1f} {timings['orjson']:>10.1f} "
+              f"{timings['json'] / timings['orjson']:>7.2f}x")
+
+    # list_products renders its cached bytes with pydantic directly
+    page = payloads()[-1][2]
+
+    async def direct():
+        return ProductListResponse(
+            products=[ProductResponse.model_validate(product) for product in page["products"]],
+            **{key: value for key, value in page.items() if key != "products"}
+        ).model_dump_json().encode("utf-8")
+
+    direct_us = await per_call_us(direct, args.seconds)
+    print(f"{'product page (100) direct':<30} {direct_us:>9.1f}  (model_dump_json, as list_products does)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time budget per measurement")
+    args = parser.parse_args()
+
+    configure_environment()
+    asyncio.run(main(args))
@@ -0,0 +1,169 @@
+"""
+Admin order listing and export: latency and peak memory over a large order table.
+
+    python -m benchmarks.bench_order_export --orders 2000000
+
+Each mode runs in a fresh subprocess against the same database, so peak RSS
+is measured per mode. "unpaginated" replays what the old list endpoint did
+(load every order, serialize one response); the other modes go through the
+ASGI app and discard body chunks as they arrive.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import configure_environment, create_user, init_database, seed_orders
+
+MODES = ["page", "deep-page", "ndjson", "csv", "unpaginated"]
+ADMIN_EMAIL = "admin@example.com"
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def asgi_get(app, path: str, query: str, headers: dict):
+    """GET through the ASGI app without buffering the body.
+
+    Returns status, body bytes, body lines, seconds to first byte and total
+    seconds.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 1),
+    }
+    state = {"status": None, "bytes": 0, "lines": 0, "first": None}
+    done = asyncio.Event()
+
+    async def receive():
+        if not state.get("sent"):
+            state["sent"] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if body and state["first"] is None:
+                state["first"] = time.perf_counter()
+            state["bytes"] += len(body)
+            state["lines"] += body.count(b"\n")
+            if not message.get("more_body"):
+                done.set()
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    finished = time.perf_counter()
+    first = (state["first"] or finished) - started
+    return state["status"], state["bytes"], state["lines"], first, finished - started
+
+
+async def run_mode(mode: str) -> dict:
+    from app.main import app
+    from benchmarks.common import make_client, login
+
+    async with make_client() as client:
+        headers = await login(client, ADMIN_EMAIL)
+    baseline = peak_rss_mb()
+
+    if mode == "unpaginated":
+        from sqlmodel import select
+        from app.db.session import async_engine
+        from app.models.order import Order
+        from app.schemas.order import OrderListResponse
+        from sqlmodel.ext.asyncio.session import AsyncSession
+
+        started = time.perf_counter()
+        async with AsyncSession(async_engine) as session:
+            orders = (await session.exec(select(Order).order_by(Order.created_at.desc()))).all()
+            body = OrderListResponse(orders=orders, total=len(orders)).model_dump_json()
+        elapsed = time.perf_counter() - started
+        return {"rows": len(orders), "bytes": len(body), "first": elapsed, "total": elapsed,
+                "rss": peak_rss_mb() - baseline, "peak": peak_rss_mb()}
+
+    if mode in ("ndjson", "csv"):
+        status, size, lines, first, total = await asgi_get(
+            app, "/api/admin/orders/export", f"format={mode}", headers
+        )
+        assert status == 200, status
+        rows = lines - 1 if mode == "csv" else lines
+        return {"rows": rows, "bytes": size, "first": first, "total": total,
+                "rss": peak_rss_mb() - baseline, "peak": peak_rss_mb()}
+
+    # Paginated listing: first page, then a page a few thousand pages deep
+    query = "page_size=50&count=none"
+    status, size, _, first, total = await asgi_get(app, "/api/admin/orders", query, headers)
+    assert status == 200, status
+    if mode == "deep-page":
+        from sqlmodel import Session, select
+        from app.core.pagination import encode_cursor
+        from app.db.session import engine
+        from app.models.order import Order
+
+        with Session(engine) as session:
+            last = session.exec(
+                select(Order).order_by(Order.created_at.desc(), Order.id.desc()).offset(5000 * 50 - 1).limit(1)
+            ).one()
+        cursor = encode_cursor("orders", [last.created_at, last.id])
+        status, size, _, first, total = await asgi_get(
+            app, "/api/admin/orders", f"{query}&cursor={cursor}", headers
+        )
+        assert status == 200, status
+    return {"rows": 50, "bytes": size, "first": first, "total": total,
+            "rss": peak_rss_mb() - baseline, "peak": peak_rss_mb()}
+
+
+def main(args):
+    database = configure_environment()
+    print(f"database: {database}")
+    init_database()
+    admin_id = create_user(ADMIN_EMAIL, is_admin=True)
+    user_ids = [create_user(f"user{i}@example.com", password="x") for i in range(20)] + [admin_id]
+    started = time.perf_counter()
+    seed_orders(args.orders, user_ids)
+    print(f"seeded {args.orders} orders in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'mode':<12} {'rows':>9} {'MB sent':>9} {'first byte s':>13} {'total s':>9} {'peak RSS MB':>12} {'(+MB)':>8}")
+    for mode in MODES:
+        if mode == "unpaginated" and args.skip_unpaginated:
+            continue
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_order_export", "--run", mode],
+            env={**os.environ, "DATABASE_URL": database},
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<12} {result['rows']:>9} {result['bytes'] / 1e6:>9.1f} {result['first']:>13.3f} "
+              f"{result['total']:>9.2f} {result['peak']:>12.1f} {result['rss']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--skip-unpaginated", action="store_true",
+                        help="skip the old load-everything mode (needs ~4 GB RSS per million orders)")
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(asyncio.run(run_mode(args.run))))
+    else:
+        main(args)
@@ -0,0 +1,124 @@
+"""
+Order history latency for a heavy buyer, before and after the
+(user_id, created_at, id) index and cursor pagination.
+
+    python -m benchmarks.bench_order_history --user-orders 20000 --other-orders 1000000
+
+"unpaginated" replays the old list_orders (every order of the user, sorted,
+one response). The paginated rows go through GET /api/orders.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import (
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    seed_orders,
+)
+
+HEAVY_EMAIL = "heavy@example.com"
+
+
+async def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def use_indexes(composite: bool):
+    """Switch orders between the old user_id index and the composite one"""
+    from app.db.session import engine
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_orders_user_id")
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_orders_user_id_created_at_id")
+        if composite:
+            conn.exec_driver_sql(
+                "CREATE INDEX ix_orders_user_id_created_at_id ON orders (user_id, created_at, id)"
+            )
+        else:
+            conn.exec_driver_sql("CREATE INDEX ix_orders_user_id ON orders (user_id)")
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+
+
+async def main(args):
+    from sqlmodel import Session, select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.core.pagination import encode_cursor
+    from app.db.session import async_engine, engine
+    from app.models.order import Order
+    from app.schemas.order import OrderListResponse
+
+    init_database()
+    heavy_id = create_user(HEAVY_EMAIL)
+    others = [create_user(f"buyer{i}@example.com", password="x") for i in range(args.other_users)]
+    started = time.perf_counter()
+    seed_orders(args.user_orders, [heavy_id], seed=1)
+    seed_orders(args.other_orders, others, seed=2)
+    print(f"seeded {args.user_orders} + {args.other_orders} orders in {time.perf_counter() - started:.1f}s")
+
+    # Cursor for the page after the first `deep_page - 1` pages
+    page_size = 20
+    with Session(engine) as session:
+        last = session.exec(
+            select(Order)
+            .where(Order.user_id == heavy_id)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .offset((args.deep_page - 1) * page_size - 1)
+            .limit(1)
+        ).one()
+    deep_cursor = encode_cursor("orders", [last.created_at, last.id])
+
+    async def unpaginated():
+        async with AsyncSession(async_engine) as session:
+            statement = select(Order).where(Order.user_id == heavy_id).order_by(Order.created_at.desc())
+            orders = (await session.exec(statement)).all()
+            OrderListResponse(orders=orders, total=len(orders)).model_dump_json()
+
+    async with make_client() as client:
+        headers = await login(client, HEAVY_EMAIL)
+
+        def page(**params):
+            async def request():
+                response = await client.get("/api/orders", params=params, headers=headers)
+                assert response.status_code == 200, response.text
+            return request
+
+        cases = [
+            ("unpaginated (old endpoint)", unpaginated),
+            ("page 1, exact count", page(page_size=page_size)),
+            ("page 1, count=none", page(page_size=page_size, count="none")),
+            (f"page {args.deep_page} by cursor", page(page_size=page_size, count="none", cursor=deep_cursor)),
+            ("page 1, status=DELIVERED", page(page_size=page_size, count="none", status="DELIVERED")),
+        ]
+
+        print(f"{'request':<30} {'user_id index ms':>17} {'composite index ms':>19}")
+        results = {}
+        for composite in (False, True):
+            use_indexes(composite)
+            for name, fn in cases:
+                results[(name, composite)] = await timed(fn, args.repeat)
+        for name, _ in cases:
+            print(f"{name:<30} {results[(name, False)]:>17.2f} {results[(name, True)]:>19.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--user-orders", type=int, default=20_000)
+    parser.add_argument("--other-orders", type=int, default=1_000_000)
+    parser.add_argument("--other-users", type=int, default=100)
+    parser.add_argument("--deep-page", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
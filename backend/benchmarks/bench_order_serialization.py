@@ -0,0 +1,86 @@
+"""
+Order detail serialization cost for orders with 1, 50 and 500 items.
+
+    python -m benchmarks.bench_order_serialization
+
+"dump + re-validate" is the old path: model_dump() the ORM objects, build
+OrderDetailResponse from the dicts, then let FastAPI re-validate it against
+response_model and encode it with jsonable_encoder + json. "direct" is the
+new one: OrderDetailResponse.from_order() validates the loaded ORM values
+once and model_dump_json() encodes them.
+No database is involved; the ORM objects are built in memory.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from benchmarks.common import SHIPPING_ADDRESS, configure_environment
+
+
+def build_order(item_count: int):
+    from app.models.order import Order, OrderItem
+
+    now = datetime.utcnow()
+    order = Order(
+        id=1, user_id=1, subtotal=1000.0, tax=180.0, total_amount=1180.0, status="PAID",
+        created_at=now, updated_at=now, **SHIPPING_ADDRESS
+    )
+    order.items = [
+        OrderItem(
+            id=i + 1, order_id=1, product_id=i + 1, product_name=f"Product {i}",
+            product_image=f"https://example.com/{i}.jpg", unit_price=499.0, quantity=2,
+            selected_size="M", selected_color="Black", created_at=now
+        )
+        for i in range(item_count)
+    ]
+    return order
+
+
+async def per_call_us(fn, budget: float) -> float:
+    """Mean microseconds per call, running for about `budget` seconds"""
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < budget:
+        await fn()
+        calls += 1
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def main(args):
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from app.schemas.order import OrderDetailResponse, OrderItemResponse
+
+    response_field = create_response_field(name="response", type_=OrderDetailResponse)
+
+    print(f"{'items':>6} {'dump + re-validate us':>22} {'direct us':>10} {'speedup':>8}")
+    for item_count in args.items:
+        order = build_order(item_count)
+
+        async def old_path():
+            response = OrderDetailResponse(
+                **order.model_dump(),
+                items=[OrderItemResponse(**item.model_dump()) for item in order.items]
+            )
+            content = await serialize_response(field=response_field, response_content=response)
+            return JSONResponse(content).body
+
+        async def new_path():
+            return OrderDetailResponse.from_order(order).model_dump_json().encode("utf-8")
+
+        assert len(await old_path()) > 0 and len(await new_path()) > 0
+        old = await per_call_us(old_path, args.seconds)
+        new = await per_call_us(new_path, args.seconds)
+        print(f"{item_count:>6} {old:>22.1f} {new:>10.1f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time budget per measurement")
+    args = parser.parse_args()
+
+    configure_environment()
+    asyncio.run(main(args))
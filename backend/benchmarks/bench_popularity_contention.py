@@ -0,0 +1,130 @@
+"""
+Checkout contention on one hot product: popularity bumped in the stock
+UPDATE (the old reserve_stock) vs added by the orders' background jobs.
+
+    python -m benchmarks.bench_popularity_contention --orders 500
+
+Each round fires --orders simultaneous single-item orders for the same
+product with plenty of stock, then reports throughput and latency. In the
+write-behind round the orders' background jobs are run afterwards, and
+the product's popularity is checked against the units sold. Point DATABASE_URL at
+PostgreSQL to see row-lock contention; SQLite serializes every writer
+regardless.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    seed_catalog,
+)
+
+HOT_PRODUCT_ID = 1
+
+
+async def reserve_stock_with_popularity(session, quantities):
+    """reserve_stock as it was: stock and popularity in one UPDATE"""
+    from sqlalchemy import case, select, update
+    from sqlmodel import col
+    from app.models.product import Product
+
+    product_ids = sorted(quantities)
+    if len(product_ids) > 1:
+        await session.execute(
+            select(Product.id).where(col(Product.id).in_(product_ids))
+            .order_by(Product.id).with_for_update(key_share=True)
+        )
+    quantity_by_id = case(quantities, value=Product.id)
+    result = await session.execute(
+        update(Product)
+        .where(col(Product.id).in_(product_ids), Product.is_active == True, Product.stock >= quantity_by_id)
+        .values(stock=Product.stock - quantity_by_id, popularity=Product.popularity + quantity_by_id)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    reserved = set(result.scalars().all())
+    return [product_id for product_id in product_ids if product_id not in reserved]
+
+
+async def no_followups(session, order, quantities):
+    return None
+
+
+def popularity():
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.models.product import Product
+
+    with Session(engine) as session:
+        return session.get(Product, HOT_PRODUCT_ID).popularity
+
+
+async def run_round(client, headers, orders):
+    async def place():
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/orders",
+            json={"items": [{"product_id": HOT_PRODUCT_ID, "quantity": 1}], "shipping_address": SHIPPING_ADDRESS},
+            headers=headers,
+        )
+        return response.status_code, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(place() for _ in range(orders)))
+    elapsed = time.perf_counter() - started
+    statuses = [status for status, _ in results]
+    latencies = sorted(latency for _, latency in results)
+    return elapsed, statuses.count(201), latencies
+
+
+async def main(args):
+    import app.api.orders as orders_api
+    from app.db.jobs import job_worker
+
+    init_database()
+    seed_catalog(10)
+    create_user("bench@example.com")
+    original = orders_api.reserve_stock, orders_api.queue_order_followups
+
+    async with make_client() as client:
+        headers = await login(client, "bench@example.com")
+        print(f"{'mode':<26} {'orders':>7} {'ok':>5} {'seconds':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8}")
+
+        for mode in args.modes:
+            if mode == "inline":
+                orders_api.reserve_stock, orders_api.queue_order_followups = reserve_stock_with_popularity, no_followups
+            else:
+                orders_api.reserve_stock, orders_api.queue_order_followups = original
+
+            before = popularity()
+            elapsed, ok, latencies = await run_round(client, headers, args.orders)
+            p50 = statistics.median(latencies)
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{mode:<26} {args.orders:>7} {ok:>5} {elapsed:>8.2f} {ok / elapsed:>7.1f} {p50:>8.1f} {p95:>8.1f}")
+
+            if mode == "write-behind":
+                assert popularity() == before, "popularity moved before the jobs ran"
+                started = time.perf_counter()
+                await job_worker.run_pending()
+                print(f"  jobs for {ok} orders took {(time.perf_counter() - started) * 1000:.1f} ms")
+            assert popularity() == before + ok, (before, popularity(), ok)
+
+    orders_api.reserve_stock, orders_api.queue_order_followups = original
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--modes", nargs="+", default=["inline", "write-behind", "inline", "write-behind"],
+                        choices=["inline", "write-behind"])
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
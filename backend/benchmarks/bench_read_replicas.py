@@ -0,0 +1,124 @@
+"""
+Primary database load with and without a read replica.
+
+    python -m benchmarks.bench_read_replicas --requests 2000
+
+Local two-database setup: the catalogue is generated into the primary
+SQLite file, which is then copied to a second file configured as
+DATABASE_REPLICA_URLS. A mixed workload (catalog browsing, product pages
+and checkouts) runs twice, first with the replica taken out of the
+rotation, so every read falls back to the primary, then with it in. The
+report counts the statements each database executed.
+
+The catalog response cache is off (CATALOG_CACHE_TTL_SECONDS=0) so every
+read reaches a database; pass --cache to keep it on. Checkouts write to the
+primary only, so the copy drifts from it during the run; that does not
+matter for the counts. For a real primary/standby pair, see
+docker-compose.replica.yml in the repository root.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+
+from benchmarks.common import SHIPPING_ADDRESS, create_user, login, make_client, run_load
+
+PASSWORD = "bench123"
+
+
+class StatementCounter:
+    """Statements executed per engine"""
+
+    def __init__(self, engines: dict):
+        from sqlalchemy import event
+
+        self.counts = {name: 0 for name in engines}
+        for name, engine in engines.items():
+            event.listen(engine.sync_engine, "before_cursor_execute", self._counter(name))
+
+    def _counter(self, name):
+        def count(conn, cursor, statement, parameters, context, executemany):
+            self.counts[name] += 1
+        return count
+
+    def take(self) -> dict:
+        counts = dict(self.counts)
+        for name in self.counts:
+            self.counts[name] = 0
+        return counts
+
+
+async def main(args, replica_path):
+    from sqlmodel import Session, select
+    from app.db.session import async_engine, engine, init_db, replica_engines, replica_router
+    from app.db.synthetic import CATEGORY_WEIGHTS, generate
+    from app.models.product import Product
+
+    init_db()
+    generate(engine, products=args.products, users=20, orders=0, password=PASSWORD)
+    create_user("shopper@example.com", password=PASSWORD)
+    with Session(engine) as session:
+        active = list(session.exec(select(Product.id).where(Product.is_active == True)))
+        in_stock = list(session.exec(select(Product.id).where(Product.is_active == True, Product.stock >= 100)))
+    engine.dispose()
+    shutil.copyfile(make_path(os.environ["DATABASE_URL"]), replica_path)
+
+    counter = StatementCounter({"primary": async_engine, "replica": replica_engines[0]})
+    categories = list(CATEGORY_WEIGHTS)
+
+    async with make_client(raise_app_exceptions=False) as client:
+        headers = await login(client, "shopper@example.com", PASSWORD)
+
+        async def mixed(rng, i):
+            roll = rng.random()
+            if roll < args.write_share:
+                items = [{"product_id": rng.choice(in_stock), "quantity": 1}]
+                response = await client.post(
+                    "/api/orders", json={"items": items, "shipping_address": SHIPPING_ADDRESS}, headers=headers
+                )
+                return response.status_code == 201
+            if roll < 0.6:
+                params = {"category": rng.choice(categories), "page": rng.randint(1, 5), "sort_by": "price_asc"}
+                response = await client.get("/api/products", params=params)
+            else:
+                response = await client.get(f"/api/products/{rng.choice(active)}")
+            return response.status_code == 200
+
+        print(f"{'mode':<14} {'req/s':>8} {'p95 ms':>8} {'errors':>7} {'primary stmts':>14} {'replica stmts':>14}")
+        for mode in ("primary only", "with replica"):
+            replica_router.healthy = [] if mode == "primary only" else list(replica_engines)
+            rng = random.Random(7)
+            counter.take()
+            result = await run_load(mode, lambda i: mixed(rng, i), args.requests, args.concurrency)
+            counts = counter.take()
+            print(
+                f"{mode:<14} {result.rps:>8.1f} {result.percentile(95):>8.1f} {result.errors:>7} "
+                f"{counts['primary']:>14} {counts['replica']:>14}"
+            )
+    await replica_router.stop()
+
+
+def make_path(url: str) -> str:
+    return url.split("sqlite:///", 1)[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-share", type=float, default=0.1, help="share of requests that are checkouts")
+    parser.add_argument("--cache", action="store_true", help="keep the catalog response cache on")
+    args = parser.parse_args()
+
+    # Both databases must be configured before the app is imported
+    directory = tempfile.mkdtemp(prefix="ecommerce-replica-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/primary.db"
+    os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{directory}/replica.db"
+    os.environ.setdefault("DEBUG", "False")
+    if not args.cache:
+        os.environ["CATALOG_CACHE_TTL_SECONDS"] = "0"
+    print(f"primary: {os.environ['DATABASE_URL']}\nreplica: {os.environ['DATABASE_REPLICA_URLS']}")
+    asyncio.run(main(args, f"{directory}/replica.db"))
@@ -0,0 +1,254 @@
+"""
+Sales reports from the rollups against the same reports computed from
+orders and order_items.
+
+    python -m benchmarks.bench_sales_rollups --orders 1000000
+    python -m benchmarks.bench_sales_rollups --orders 5000000 --workers 8   # ~10M order items
+
+Generates an order history with app.db.synthetic, rebuilds the rollups
+(timed), then checks, and exits with status 1 if any fails:
+
+    rebuild      rollup totals match the orders they were built from
+    reports      each report matches its raw-scan equivalent
+    incremental  a rebuild skips orders whose job is still queued, and
+                 orders rolled up by their jobs give the same rows as a
+                 rebuild of their day
+    endpoints    the admin analytics endpoints answer
+
+Then times each report both ways (median of --repeat runs).
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+)
+
+
+async def main(args) -> int:
+    from sqlalchemy import distinct, func
+    from sqlmodel import Session, select, col
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from app.db import analytics
+    from app.db.jobs import job_worker
+    from app.db.rollups import COUNTED_STATUSES, DAY, HOUR, bucket_start, bucket_start_sql, rebuild_rollups
+    from app.db.session import async_engine, engine
+    from app.db.synthetic import generate
+    from app.models.order import Order, OrderItem
+    from app.models.product import Product
+    from app.models.sales import CategorySalesRollup, ProductSalesRollup, SalesRollup
+
+    init_database()
+    create_user("rollups@example.com")
+    create_user("rollups-admin@example.com", is_admin=True)
+    started = time.perf_counter()
+    report = generate(engine, products=args.products, users=args.users, orders=args.orders,
+                      workers=args.workers, days=args.days)
+    items = report.as_dict()["order_items"]["rows"]
+    print(f"generated {args.orders:,} orders, {items:,} order items in {time.perf_counter() - started:.0f}s")
+
+    started = time.perf_counter()
+    days = rebuild_rollups(engine)
+    with Session(engine) as session:
+        rollup_rows = sum(
+            session.exec(select(func.count()).select_from(model)).one()
+            for model in (SalesRollup, ProductSalesRollup, CategorySalesRollup)
+        )
+    print(f"rebuilt {days} days of rollups ({rollup_rows:,} rows) in {time.perf_counter() - started:.1f}s\n")
+
+    failures = []
+
+    def check(name: str, ok: bool, detail: str) -> None:
+        print(f"{name:<12} {'ok' if ok else 'FAILED'}  {detail}")
+        if not ok:
+            failures.append(name)
+
+    def close(a: float, b: float) -> bool:
+        return abs(a - b) <= max(0.05, abs(b) * 1e-9)
+
+    dialect = engine.dialect.name
+    counted = [col(Order.status).in_(COUNTED_STATUSES)]
+
+    # Raw-scan versions of the reports, as an ad-hoc query would do them
+    async def raw_revenue(session, start, end, granularity):
+        bucket = bucket_start_sql(Order.created_at, granularity, dialect)
+        in_range = [*counted, Order.created_at >= bucket_start(start, granularity), Order.created_at < end]
+        orders = (await session.execute(
+            select(bucket, func.count(), func.sum(Order.subtotal), func.sum(Order.tax), func.sum(Order.total_amount))
+            .where(*in_range).group_by(bucket).order_by(bucket)
+        )).all()
+        units = dict((await session.execute(
+            select(bucket, func.sum(OrderItem.quantity))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(*in_range).group_by(bucket)
+        )).all())
+        return [
+            {"bucket_start": row[0], "orders": row[1], "units": units.get(row[0], 0),
+             "subtotal": round(row[2], 2), "tax": round(row[3], 2), "revenue": round(row[4], 2)}
+            for row in orders
+        ]
+
+    async def raw_top_products(session, start, end, limit, by):
+        revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+        units = func.sum(OrderItem.quantity)
+        rows = (await session.execute(
+            select(OrderItem.product_id, Product.name, Product.category,
+                   func.count(distinct(OrderItem.order_id)), units, revenue)
+            .join(Order, Order.id == OrderItem.order_id)
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(*counted, Order.created_at >= start, Order.created_at < end)
+            .group_by(OrderItem.product_id, Product.name, Product.category)
+            .order_by((revenue if by == "revenue" else units).desc(), OrderItem.product_id)
+            .limit(limit)
+        )).all()
+        return [
+            {"product_id": row[0], "name": row[1], "category": row[2], "orders": row[3],
+             "units": row[4], "revenue": round(row[5], 2)}
+            for row in rows
+        ]
+
+    async def raw_categories(session, start, end):
+        revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+        rows = (await session.execute(
+            select(Product.category, func.count(distinct(OrderItem.order_id)), func.sum(OrderItem.quantity), revenue)
+            .join(Order, Order.id == OrderItem.order_id)
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(*counted, Order.created_at >= start, Order.created_at < end)
+            .group_by(Product.category)
+            .order_by(revenue.desc(), Product.category)
+        )).all()
+        return [{"category": row[0], "orders": row[1], "units": row[2], "revenue": round(row[3], 2)} for row in rows]
+
+    def same(rollup: list, raw: list) -> bool:
+        return len(rollup) == len(raw) and all(
+            a.keys() == b.keys() and all(
+                close(a[k], b[k]) if isinstance(a[k], float) else a[k] == b[k] for k in a
+            )
+            for a, b in zip(rollup, raw)
+        )
+
+    with Session(engine) as session:
+        first, last = session.exec(select(func.min(Order.created_at), func.max(Order.created_at))).one()
+        raw_totals = session.exec(
+            select(func.count(), func.sum(Order.total_amount)).where(*counted)
+        ).one()
+        rollup_totals = session.exec(
+            select(func.sum(SalesRollup.orders), func.sum(SalesRollup.revenue)).where(SalesRollup.period == DAY)
+        ).one()
+    check("rebuild", raw_totals[0] == rollup_totals[0] and close(rollup_totals[1], raw_totals[1]),
+          f"{rollup_totals[0]:,} orders, {rollup_totals[1]:,.2f} revenue")
+
+    # Reports as an admin would ask for them, ending at the last order
+    end = bucket_start(last, HOUR) + timedelta(hours=1)
+    everything = (bucket_start(first, DAY), end)
+    reports = [
+        ("revenue by day, all", analytics.revenue_series, raw_revenue, (*everything, DAY)),
+        ("revenue by hour, 7 days", analytics.revenue_series, raw_revenue, (end - timedelta(days=7), end, HOUR)),
+        ("top 10 products, 30 days", analytics.top_products, raw_top_products,
+         (end - timedelta(days=30, hours=5), end, 10, "revenue")),
+        ("top 10 products, all", analytics.top_products, raw_top_products, (*everything, 10, "revenue")),
+        ("categories, 90 days", analytics.category_breakdown, raw_categories, (end - timedelta(days=90), end)),
+        ("categories, all", analytics.category_breakdown, raw_categories, everything),
+    ]
+
+    async def timed(report, params):
+        runs = []
+        async with AsyncSession(async_engine) as session:
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                result = await report(session, *params)
+                runs.append((time.perf_counter() - started) * 1000)
+        return result, statistics.median(runs)
+
+    timings = []
+    mismatched = []
+    for name, from_rollups, from_orders, params in reports:
+        rollup_result, rollup_ms = await timed(from_rollups, params)
+        raw_result, raw_ms = await timed(from_orders, params)
+        if not same(rollup_result, raw_result):
+            mismatched.append(name)
+        timings.append((name, len(rollup_result), raw_ms, rollup_ms))
+    check("reports", not mismatched, f"{len(reports)} reports compared" + (f", mismatched: {mismatched}" if mismatched else ""))
+
+    today = bucket_start(datetime.utcnow(), DAY)
+
+    def today_rows():
+        with Session(engine) as session:
+            return {
+                model.__tablename__: sorted(
+                    (row.period, row.bucket_start, getattr(row, "product_id", getattr(row, "category", "")),
+                     row.orders, row.units, round(row.revenue, 2))
+                    for row in session.exec(select(model).where(model.bucket_start >= today)).all()
+                )
+                for model in (SalesRollup, ProductSalesRollup, CategorySalesRollup)
+            }
+
+    async with make_client() as client:
+        headers = await login(client, "rollups@example.com")
+        admin_headers = await login(client, "rollups-admin@example.com")
+        with Session(engine) as session:
+            product_ids = session.exec(select(Product.id).where(Product.stock > 10).order_by(Product.id).limit(5)).all()
+        # Generated history ends at midnight, so today only has these
+        for i in range(args.checkouts):
+            cart = {"items": [{"product_id": product_ids[i % len(product_ids)], "quantity": 1 + i % 3},
+                              {"product_id": product_ids[(i + 1) % len(product_ids)], "quantity": 1}],
+                    "shipping_address": SHIPPING_ADDRESS}
+            response = await client.post("/api/orders", json=cart, headers=headers)
+            assert response.status_code == 201, response.text
+
+        rebuild_rollups(engine, start=today, end=today + timedelta(days=1))
+        before_jobs = today_rows()
+        await job_worker.run_pending()
+        from_jobs = today_rows()
+        rebuild_rollups(engine, start=today, end=today + timedelta(days=1))
+        rebuilt = today_rows()
+        sales = [row for row in from_jobs["sales_rollups"] if row[0] == DAY]
+        check("incremental",
+              not any(before_jobs.values()) and from_jobs == rebuilt and sales and sales[0][3] == args.checkouts,
+              f"{args.checkouts} checkouts; skipped while queued: {not any(before_jobs.values())}, "
+              f"jobs == rebuild: {from_jobs == rebuilt}")
+
+        statuses = [
+            (await client.get(path, headers=admin_headers, params=params)).status_code
+            for path, params in (
+                ("/api/admin/analytics/revenue", {"granularity": "hour"}),
+                ("/api/admin/analytics/top-products", {"by": "units", "limit": 5}),
+                ("/api/admin/analytics/categories", {"start": first.isoformat()}),
+                ("/api/admin/analytics/revenue", {"start": "2030-01-01T00:00:00", "end": "2029-01-01T00:00:00"}),
+            )
+        ]
+        check("endpoints", statuses == [200, 200, 200, 400], f"statuses {statuses}")
+
+    print(f"\n{'report':<26} {'rows':>6} {'raw scan ms':>12} {'rollups ms':>11} {'speed-up':>9}")
+    for name, rows, raw_ms, rollup_ms in timings:
+        print(f"{name:<26} {rows:>6} {raw_ms:>12.1f} {rollup_ms:>11.2f} {raw_ms / rollup_ms:>8.0f}x")
+
+    if failures:
+        print(f"\nFAILED: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=730, help="how far back the order history goes")
+    parser.add_argument("--workers", type=int, default=1, help="processes generating rows")
+    parser.add_argument("--checkouts", type=int, default=20, help="orders placed through the API")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per report, median reported")
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,65 @@
+"""
+Product search latency: substring (ILIKE) vs full-text index.
+
+    python -m benchmarks.bench_search --products 300000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import configure_environment, init_database, make_client, seed_catalog
+
+QUERIES = [
+    "denim",
+    "cotton shirt",
+    "slim jean",
+    "vint",
+    "leather jacket",
+    "breathable",
+    "silk dress summer",
+    "hidden zip",
+]
+
+
+async def main(args):
+    from app.core.catalog_cache import catalog_cache
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    catalog_cache.ttl = 0  # Measure the database, not the response cache
+
+    init_database()
+    started = time.perf_counter()
+    seed_catalog(args.products)
+    print(f"seeded {args.products} products in {time.perf_counter() - started:.1f}s")
+
+    async with make_client() as client:
+        async def measure(query, extra):
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = await client.get("/api/products", params={"search": query, **extra})
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+            return statistics.median(latencies), response.json()["total"]
+
+        print(f"{'query':<20} {'mode':<10} {'matches':>8} {'exact count ms':>15} "
+              f"{'count=none ms':>14} {'relevance ms':>13}")
+        for query in QUERIES:
+            for mode in ("substring", "fulltext"):
+                settings.PRODUCT_SEARCH_MODE = mode
+                exact, total = await measure(query, {})
+                uncounted, _ = await measure(query, {"count": "none"})
+                ranked, _ = await measure(query, {"count": "none", "sort_by": "relevance"})
+                print(f"{query:<20} {mode:<10} {total:>8} {exact:>15.2f} {uncounted:>14.2f} {ranked:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
@@ -0,0 +1,52 @@
+"""
+Cost of the per-request SQL profiler.
+
+    python -m benchmarks.bench_sql_profiler
+
+Calls a trivial ASGI app directly with ProfilingMiddleware around it, once
+sampling nothing and once sampling every request, then times the
+SQLAlchemy listeners that run around every statement, with and without a
+profile active. The numbers say how high SQL_PROFILE_SAMPLE_RATE can go in
+production.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.bench_metrics_overhead import per_call_us, trivial_app
+from benchmarks.common import configure_environment
+
+
+async def main(args):
+    from app.core.profiling import ProfilingMiddleware, RequestProfile, _after_execute, _before_execute, _profile
+
+    bare = await per_call_us(trivial_app, args.calls)
+    unsampled = await per_call_us(ProfilingMiddleware(trivial_app, 0.0, 1e9, 1_000_000), args.calls)
+    sampled = await per_call_us(ProfilingMiddleware(trivial_app, 1.0, 1e9, 1_000_000), args.calls)
+    print(f"trivial app, bare:            {bare:6.2f} us/request")
+    print(f"middleware, not sampled:      {unsampled - bare:6.2f} us/request")
+    print(f"middleware, sampled:          {sampled - bare:6.2f} us/request")
+
+    # The listeners alone, on a fixed statement (fingerprint cached)
+    class Context:
+        pass
+
+    context = Context()
+    statement = "SELECT products.id FROM products WHERE products.id IN (?, ?, ?)"
+    for label, profile in (("listeners, no profile:", None), ("listeners, profiled:", RequestProfile())):
+        token = _profile.set(profile)
+        started = time.perf_counter()
+        for _ in range(args.calls):
+            _before_execute(None, None, statement, None, context, False)
+            _after_execute(None, None, statement, None, context, False)
+        print(f"{label:<30}{(time.perf_counter() - started) / args.calls * 1e6:6.2f} us/statement")
+        _profile.reset(token)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    configure_environment()
+    asyncio.run(main(args))
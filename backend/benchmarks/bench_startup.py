@@ -0,0 +1,119 @@
+"""
+Time to first request of a freshly started server.
+
+    python -m benchmarks.bench_startup --workers 2 --runs 5
+
+Seeds a catalogue, then repeatedly starts the API as a real server process
+and measures how long it takes, from launch, to answer a product listing
+("ready"). It then sends a pass of catalog requests, each shape once per
+worker and one connection each, so they spread over the workers: the
+"first pass" total is what the first visitors wait, the "warm pass" total
+the same requests once the workers have served a pass already. Launchers:
+
+    uvicorn        uvicorn app.main:app --workers N (each worker imports the
+                   app and warms up on its own)
+    gunicorn-cold  gunicorn -c gunicorn.conf.py with CATALOG_WARMUP=False
+    gunicorn       gunicorn -c gunicorn.conf.py app.main:app (the master
+                   imports and warms the app once, then forks the workers)
+
+The catalog response cache is off (CATALOG_CACHE_TTL_SECONDS=0) so every
+request reaches the database; pass --cache to keep it on.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import configure_environment, init_database
+
+PORT = 8765
+
+FIRST_REQUESTS = [
+    "/api/products?page_size=20",
+    "/api/products?category=Jeans&sort_by=price_asc",
+    "/api/products?sort_by=popularity&page=2",
+    "/api/products?size=M&color=Black",
+    "/api/products?search=cotton",
+    "/api/products/facets",
+    "/api/products/facets?category=Dresses",
+    "/api/products/1",
+]
+
+
+LAUNCHERS = ["uvicorn", "gunicorn-cold", "gunicorn"]
+
+
+def command(launcher: str, workers: int) -> list:
+    if launcher == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT),
+                "--workers", str(workers), "--log-level", "warning"]
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app",
+            "--bind", f"127.0.0.1:{PORT}", "--workers", str(workers), "--log-level", "warning"]
+
+
+def get(path: str, timeout: float = 10.0) -> float:
+    """Milliseconds to fetch `path` over a new connection"""
+    started = time.perf_counter()
+    with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}", timeout=timeout) as response:
+        response.read()
+    return (time.perf_counter() - started) * 1000
+
+
+def measure(launcher: str, args) -> dict:
+    env = dict(os.environ, CATALOG_WARMUP=str(launcher != "gunicorn-cold"))
+    started = time.perf_counter()
+    server = subprocess.Popen(command(launcher, args.workers), stdout=subprocess.DEVNULL, env=env)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"{launcher} exited with status {server.returncode}")
+            try:
+                get(FIRST_REQUESTS[0], timeout=1.0)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        ready_ms = (time.perf_counter() - started) * 1000
+        passes = [sum(get(path) for path in FIRST_REQUESTS * args.workers) for _ in range(3)]
+        return {"ready_ms": ready_ms, "first_ms": passes[0], "warm_ms": passes[2]}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(args):
+    from app.db.session import engine
+    from app.db.synthetic import generate
+
+    init_database()
+    generate(engine, products=args.products, users=0, orders=0)
+    engine.dispose()
+
+    print(f"{args.workers} workers, {len(FIRST_REQUESTS) * args.workers} requests per pass, median of {args.runs} starts")
+    print(f"{'launcher':<14} {'ready ms':>9} {'first pass ms':>14} {'warm pass ms':>13}")
+    for launcher in args.launchers:
+        runs = [measure(launcher, args) for _ in range(args.runs)]
+        print(
+            f"{launcher:<14} {statistics.median(r['ready_ms'] for r in runs):>9.0f} "
+            f"{statistics.median(r['first_ms'] for r in runs):>14.1f} "
+            f"{statistics.median(r['warm_ms'] for r in runs):>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--launchers", nargs="+", choices=LAUNCHERS, default=LAUNCHERS)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5, help="server starts per launcher (median reported)")
+    parser.add_argument("--cache", action="store_true", help="keep the catalog response cache on")
+    args = parser.parse_args()
+
+    # The servers inherit the benchmark database through the environment
+    configure_environment()
+    if not args.cache:
+        os.environ["CATALOG_CACHE_TTL_SECONDS"] = "0"
+    main(args)
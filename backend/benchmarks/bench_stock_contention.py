@@ -0,0 +1,96 @@
+"""
+Stress test for stock reservation under contention.
+
+Fires many simultaneous single-unit orders at one low-stock product, plus
+orders for other products that should proceed in parallel, then checks that
+stock never went negative and exactly `--stock` hot orders succeeded.
+
+    python -m benchmarks.bench_stock_contention --orders 500 --stock 50
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    seed_catalog,
+)
+
+
+async def main(args):
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.models.product import Product
+
+    init_database()
+    seed_catalog(args.other_products + 1)
+    create_user("bench@example.com")
+
+    hot_product_id = 1
+    with Session(engine) as session:
+        product = session.get(Product, hot_product_id)
+        product.stock = args.stock
+        session.add(product)
+        session.commit()
+
+    async with make_client() as client:
+        headers = await login(client, "bench@example.com")
+
+        async def place(items):
+            response = await client.post(
+                "/api/orders",
+                json={"items": items, "shipping_address": SHIPPING_ADDRESS},
+                headers=headers,
+            )
+            return response.status_code
+
+        hot = [place([{"product_id": hot_product_id, "quantity": 1}]) for _ in range(args.orders)]
+        # Multi-product carts that include the hot product, in both id orders
+        mixed = [
+            place([
+                {"product_id": 2 + i % args.other_products, "quantity": 1},
+                {"product_id": hot_product_id, "quantity": 1},
+            ][::1 if i % 2 else -1])
+            for i in range(args.orders // 5)
+        ]
+        other = [
+            place([{"product_id": 2 + i % args.other_products, "quantity": 1}])
+            for i in range(args.orders)
+        ]
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*hot, *mixed, *other)
+        elapsed = time.perf_counter() - started
+
+    hot_statuses = statuses[:len(hot) + len(mixed)]
+    other_statuses = statuses[len(hot) + len(mixed):]
+    with Session(engine) as session:
+        final_stock = session.get(Product, hot_product_id).stock
+
+    sold = hot_statuses.count(201)
+    print(f"requests:        {len(statuses)} in {elapsed:.2f}s ({len(statuses) / elapsed:.1f} req/s)")
+    print(f"hot product:     {sold} sold, {hot_statuses.count(400)} rejected, "
+          f"{len(hot_statuses) - sold - hot_statuses.count(400)} errors")
+    print(f"other products:  {other_statuses.count(201)}/{len(other_statuses)} succeeded")
+    print(f"final stock:     {final_stock} (started at {args.stock})")
+
+    assert final_stock >= 0, "stock went negative"
+    assert sold == args.stock - final_stock, "sold units do not match stock decrement"
+    assert final_stock == 0, "hot product should have sold out"
+    print("OK: no oversell")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--other-products", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"database: {configure_environment()}")
+    asyncio.run(main(args))
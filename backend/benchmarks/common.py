@@ -0,0 +1,238 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Benchmarks are plain scripts run from the backend directory, e.g.
+
+    python -m benchmarks.bench_concurrency
+
+Unless DATABASE_URL is already set they point the app at a throwaway SQLite
+database, so they run without a PostgreSQL server.
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List
+
+
+CATEGORIES = ["T-Shirts", "Shirts", "Jeans", "Dresses", "Jackets"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+COLORS = ["White", "Black", "Grey", "Navy", "Red", "Blue", "Green"]
+MATERIALS = ["Cotton", "Linen", "Denim", "Wool", "Silk", "Leather", "Fleece", "Jersey"]
+FEATURES = [
+    "breathable fabric", "stretch fit", "button front", "ribbed cuffs", "soft finish",
+    "relaxed silhouette", "reinforced seams", "machine washable", "tapered leg",
+    "side pockets", "hidden zip", "contrast stitching", "organic fibres",
+]
+
+SHIPPING_ADDRESS = {
+    "shipping_name": "Bench User",
+    "shipping_address_line1": "1 Benchmark Road",
+    "shipping_city": "Pune",
+    "shipping_state": "MH",
+    "shipping_pincode": "411001",
+    "shipping_phone": "+910000000000",
+}
+
+
+def configure_environment() -> str:
+    """Point the app at the benchmark database (call before importing app)"""
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecommerce-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("DEBUG", "False")
+    return os.environ["DATABASE_URL"]
+
+
+def init_database() -> None:
+    """Create the schema (importing the app registers every model)"""
+    import app.main  # noqa: F401
+    from app.db.session import init_db
+
+    init_db()
+
+
+def seed_catalog(count: int, stock: int = 1_000_000, seed: int = 42, batch_size: int = 10_000) -> None:
+    """Append `count` products from app.db.synthetic, every one of them
+    active and holding `stock` units so checkouts never run out"""
+    from sqlalchemy import func, update
+    from sqlmodel import Session, select
+    from app.db import synthetic
+    from app.db.facets import rebuild_facet_counts
+    from app.db.session import engine
+    from app.models.product import Product
+
+    with Session(engine) as session:
+        first_id = session.exec(select(func.coalesce(func.max(Product.id), 0) + 1)).one()
+    synthetic.generate(engine, products=count, seed=seed, chunk_size=batch_size)
+
+    with Session(engine) as session:
+        session.execute(
+            update(Product)
+            .where(Product.id >= first_id)
+            .values(stock=stock, is_active=True)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+    # The synthetic catalogue has a few inactive products
+    rebuild_facet_counts(engine)
+
+
+def seed_orders(
+    count: int,
+    user_ids: List[int],
+    seed: int = 42,
+    batch_size: int = 10_000,
+    days: int = 365,
+) -> None:
+    """Insert `count` orders (without items) spread over the last `days` days"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from app.db.session import engine
+    from app.models.order import Order, OrderStatus
+
+    rng = random.Random(seed)
+    statuses = [status.value for status in OrderStatus]
+    start = datetime.utcnow() - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+    with Session(engine) as session:
+        for offset in range(0, count, batch_size):
+            rows = []
+            for i in range(offset, min(count, offset + batch_size)):
+                created_at = start + timedelta(seconds=i * step)
+                subtotal = round(rng.uniform(199, 20000), 2)
+                rows.append({
+                    "user_id": rng.choice(user_ids),
+                    "subtotal": subtotal,
+                    "tax": round(subtotal * 0.18, 2),
+                    "total_amount": round(subtotal * 1.18, 2),
+                    "status": rng.choice(statuses),
+                    **SHIPPING_ADDRESS,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+            session.execute(insert(Order), rows)
+        session.commit()
+
+
+def create_user(email: str, password: str = "bench123", is_admin: bool = False) -> int:
+    """Insert a user directly, bypassing the API, and return its id"""
+    from sqlmodel import Session
+    from app.core.security import get_password_hash
+    from app.db.session import engine
+    from app.models.user import User
+
+    with Session(engine) as session:
+        user = User(
+            email=email,
+            password_hash=get_password_hash(password),
+            is_admin=is_admin,
+        )
+        session.add(user)
+        session.commit()
+        return user.id
+
+
+def make_client(raise_app_exceptions: bool = True):
+    """In-process HTTP client bound to the ASGI app
+
+    With raise_app_exceptions=False an unhandled error comes back as a 500,
+    as it would from a server, instead of propagating to the caller.
+    """
+    import httpx
+    from app.main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=raise_app_exceptions),
+        base_url="http://bench",
+        timeout=None,
+    )
+
+
+async def login(client, email: str, password: str = "bench123") -> dict:
+    """Log in and return the Authorization header"""
+    response = await client.post("/api/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class QueryCounter:
+    """Counts SQL statements executed through the app's engines"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        from app.db.session import async_engine
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        from app.db.session import async_engine
+
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+
+@dataclass
+class LoadResult:
+    """Latency samples collected by run_load"""
+    name: str
+    elapsed: float
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def rps(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Latency percentile in milliseconds"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    def report(self) -> str:
+        return (
+            f"{self.name:<28} {len(self.latencies):>7} req  {self.rps:>9.1f} req/s  "
+            f"p50 {self.percentile(50):>8.2f} ms  p95 {self.percentile(95):>8.2f} ms  "
+            f"p99 {self.percentile(99):>8.2f} ms  errors {self.errors}"
+        )
+
+
+async def run_load(
+    name: str,
+    request: Callable[[int], Awaitable[bool]],
+    total: int,
+    concurrency: int,
+) -> LoadResult:
+    """Issue `total` calls of `request(i)` from `concurrency` workers.
+
+    `request` returns True on success; failures are counted, not timed.
+    """
+    counter = iter(range(total))
+    result = LoadResult(name=name, elapsed=0.0)
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            ok = await request(i)
+            if ok:
+                result.latencies.append(time.perf_counter() - started)
+            else:
+                result.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
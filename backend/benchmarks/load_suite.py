@@ -0,0 +1,263 @@
+"""
+Load-test suite for the main user journeys, with stored baselines.
+
+    python -m benchmarks.load_suite                       # run and compare with the baseline
+    python -m benchmarks.load_suite --save-baseline       # run and record a new baseline
+    python -m benchmarks.load_suite --scenarios browse search --requests 500
+
+Seeds a fresh local database (SQLite in a temp dir unless DATABASE_URL is
+set) with app.db.synthetic, so sales and customers are skewed as in a
+real shop, drives app.main:app in-process through httpx at a fixed concurrency
+and reports requests/sec and p50/p95/p99 per scenario. Nothing leaves the
+machine.
+
+Scenarios:
+    browse        GET /api/products with random category/size/color/price filters and sorts
+    search        GET /api/products?search=... with catalogue words
+    login         POST /api/auth/login (one bcrypt check per request)
+    checkout      POST /api/orders with 1-3 random items
+    admin_orders  GET /api/admin/orders, first page or filtered by status
+
+Each scenario's random stream is seeded, so two runs send the same
+requests. Results are compared with the baseline file (by default
+benchmarks/baselines/load_suite.json): a scenario regresses when its
+req/s drops, or its p95 rises, by more than --threshold, or when it
+returns more errors than it did then. The default threshold of 25% sits
+above the run-to-run noise seen on a small machine (about 15%). The exit
+status is 1 on any regression, so the suite can gate a release. Baselines
+only mean something on the machine and with the options they were
+recorded with; a mismatch in options is reported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+from datetime import datetime
+
+from benchmarks.common import (
+    SHIPPING_ADDRESS,
+    configure_environment,
+    create_user,
+    init_database,
+    login,
+    make_client,
+    run_load,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "load_suite.json")
+
+# Logins verify a bcrypt hash each, so they get a smaller share of requests
+REQUEST_SHARE = {"browse": 1.0, "search": 1.0, "login": 0.1, "checkout": 0.5, "admin_orders": 0.5}
+SCENARIOS = list(REQUEST_SHARE)
+PASSWORD = "bench123"
+SORTS = ["price_asc", "price_desc", "newest", "popularity"]
+
+# Options that change what is measured; a baseline only applies when they match
+COMPARABLE_OPTIONS = ("products", "users", "orders", "requests", "concurrency")
+
+
+def seed(args) -> None:
+    from app.db.session import engine
+    from app.db.synthetic import generate
+
+    init_database()
+    # Customers are users 1..args.users, customer<id>@example.com
+    report = generate(engine, products=args.products, users=args.users, orders=args.orders,
+                      workers=args.workers, password=PASSWORD)
+    for table, stats in report.as_dict().items():
+        print(f"seeded {table}: {stats['rows']:,} rows ({stats['rows_per_second']:,} rows/s)")
+    create_user("admin@example.com", password=PASSWORD, is_admin=True)
+
+
+async def build_scenarios(client, args) -> dict:
+    """Scenario name -> request(rng, i) coroutine function"""
+    from sqlmodel import Session, select
+    from app.db import synthetic
+    from app.db.session import engine
+    from app.models.order import OrderStatus
+    from app.models.product import Product
+
+    # A handful of logged-in shoppers spread checkouts across users
+    shoppers = [await login(client, f"customer{i}@example.com", PASSWORD) for i in range(1, min(args.users, 20) + 1)]
+    admin = await login(client, "admin@example.com", PASSWORD)
+    statuses = [status.value for status in OrderStatus]
+    # Checkouts buy what is buyable, so out-of-stock lines do not count as errors
+    with Session(engine) as session:
+        in_stock = list(session.exec(select(Product.id).where(Product.is_active == True, Product.stock >= 100)))
+    categories = list(synthetic.CATEGORY_WEIGHTS)
+    sizes = synthetic.APPAREL_SIZES + synthetic.WAIST_SIZES
+    colors = list(synthetic.COLOR_WEIGHTS)
+    search_words = sorted({word.lower() for words in synthetic.MATERIALS.values() for word in words}
+                          | {word.lower() for word in synthetic.ADJECTIVES})
+
+    async def browse(rng, i):
+        params = {"page": rng.randint(1, 10), "page_size": 20, "sort_by": rng.choice(SORTS)}
+        if rng.random() < 0.7:
+            params["category"] = rng.choice(categories)
+        if rng.random() < 0.3:
+            params["size"] = rng.choice(sizes)
+        if rng.random() < 0.3:
+            params["color"] = rng.choice(colors)
+        if rng.random() < 0.3:
+            low = rng.choice([0, 500, 1000, 2000])
+            params["min_price"], params["max_price"] = low, low + rng.choice([500, 1000, 3000])
+        response = await client.get("/api/products", params=params)
+        return response.status_code == 200
+
+    async def search(rng, i):
+        params = {"search": rng.choice(search_words), "page_size": 20}
+        if rng.random() < 0.5:
+            params["sort_by"] = "relevance"
+        response = await client.get("/api/products", params=params)
+        return response.status_code == 200
+
+    async def login_request(rng, i):
+        response = await client.post(
+            "/api/auth/login",
+            json={"email": f"customer{rng.randint(1, args.users)}@example.com", "password": PASSWORD},
+        )
+        return response.status_code == 200
+
+    async def checkout(rng, i):
+        items = [
+            {"product_id": product_id, "quantity": rng.randint(1, 2)}
+            for product_id in rng.sample(in_stock, rng.randint(1, 3))
+        ]
+        response = await client.post(
+            "/api/orders",
+            json={"items": items, "shipping_address": SHIPPING_ADDRESS},
+            headers=rng.choice(shoppers),
+        )
+        return response.status_code == 201
+
+    async def admin_orders(rng, i):
+        params = {"page_size": 50}
+        if rng.random() < 0.5:
+            params["status"] = rng.choice(statuses)
+        response = await client.get("/api/admin/orders", params=params, headers=admin)
+        return response.status_code == 200
+
+    return {
+        "browse": browse,
+        "search": search,
+        "login": login_request,
+        "checkout": checkout,
+        "admin_orders": admin_orders,
+    }
+
+
+async def run(args) -> dict:
+    """Scenario name -> measured figures"""
+    results = {}
+    # A failing request (e.g. SQLite's "database is locked" under write
+    # contention) counts as an error instead of ending the run
+    async with make_client(raise_app_exceptions=False) as client:
+        flows = await build_scenarios(client, args)
+        for name in args.scenarios:
+            flow = flows[name]
+            total = max(1, int(args.requests * REQUEST_SHARE[name]))
+
+            # Warm caches and connections with an unmeasured stream
+            warmup_rng = random.Random(f"{name}-warmup")
+            await run_load(name, lambda i: flow(warmup_rng, i), min(total, args.warmup), args.concurrency)
+
+            rng = random.Random(name)
+            result = await run_load(name, lambda i: flow(rng, i), total, args.concurrency)
+            print(result.report())
+            results[name] = {
+                "requests": len(result.latencies),
+                "errors": result.errors,
+                "rps": round(result.rps, 1),
+                "p50_ms": round(result.percentile(50), 2),
+                "p95_ms": round(result.percentile(95), 2),
+                "p99_ms": round(result.percentile(99), 2),
+            }
+    return results
+
+
+def compare(results: dict, baseline: dict, options: dict, threshold: float) -> bool:
+    """Print the comparison with the baseline; True if nothing regressed"""
+    mismatched = [
+        f"{name}={baseline['options'].get(name)} (now {options[name]})"
+        for name in options
+        if baseline["options"].get(name) != options[name]
+    ]
+    if mismatched:
+        print(f"warning: baseline recorded with different options: {', '.join(mismatched)}")
+
+    ok = True
+    print(f"\n{'scenario':<14} {'req/s':>9} {'base':>9} {'change':>8}   {'p95 ms':>8} {'base':>8} {'change':>8}")
+    for name, current in results.items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name:<14} no baseline")
+            continue
+        rps_change = current["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        p95_change = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        problems = []
+        if rps_change < -threshold:
+            problems.append("throughput")
+        if p95_change > threshold:
+            problems.append("p95")
+        if current["errors"] > base["errors"]:
+            problems.append(f"{current['errors']} errors")
+        ok = ok and not problems
+        print(
+            f"{name:<14} {current['rps']:>9.1f} {base['rps']:>9.1f} {rps_change:>+8.1%}   "
+            f"{current['p95_ms']:>8.2f} {base['p95_ms']:>8.2f} {p95_change:>+8.1%}"
+            + (f"   REGRESSED: {', '.join(problems)}" if problems else "")
+        )
+    return ok
+
+
+def main(args) -> int:
+    database_url = configure_environment()
+    print(f"database: {database_url}")
+    seed(args)
+    results = asyncio.run(run(args))
+
+    from app.core.config import get_settings
+
+    options = {name: getattr(args, name) for name in COMPARABLE_OPTIONS}
+    # Login throughput is set by the bcrypt cost
+    options["bcrypt_rounds"] = get_settings().BCRYPT_ROUNDS
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "machine": f"{platform.machine()} {os.cpu_count()} CPU, Python {platform.python_version()}",
+                "database": database_url.split(":", 1)[0],
+                "options": options,
+                "scenarios": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    return 0 if compare(results, baseline, options, args.threshold) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=1000, help="per scenario, scaled by its share")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes generating the data")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative drop in req/s or rise in p95 (default 0.25)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,45 @@
+"""
+Gunicorn settings: the multi-worker launcher for the API.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The master imports the app once (preload_app), applies pending migrations
+when DATABASE_MIGRATE_ON_STARTUP is set (or refuses to start when the
+schema is behind), and runs the catalog warm-up (app.core.warmup). Only
+then does it fork the uvicorn workers, which inherit the imported modules,
+the compiled SQL and the built serializers. Each worker's startup is then
+a one-row schema version check.
+
+PORT (or BIND) and WEB_CONCURRENCY set the address and the number of
+workers; command-line options override everything here.
+"""
+import asyncio
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    """Schema and warm-up, once, in the master"""
+    from app.core.config import get_settings
+    from app.db.session import engine, prepare_schema
+
+    settings = get_settings()
+    prepare_schema()
+    if settings.CATALOG_WARMUP:
+        asyncio.run(_warm_up(server.app.wsgi()))
+    # Connections must not be shared with the forked workers
+    engine.dispose()
+
+
+async def _warm_up(app):
+    from app.core import warmup
+    from app.db.session import async_engine, replica_router
+
+    await warmup.run_warm_up(app)
+    await replica_router.stop()
+    await async_engine.dispose()
@@ -0,0 +1,86 @@
+"""
+Alembic environment: runs migrations against settings.DATABASE_URL.
+
+    cd backend
+    alembic upgrade head
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+from sqlmodel import SQLModel
+
+from app.core.config import get_settings
+from app.models import job, order, product, sales, user  # noqa: F401  (register the tables)
+
+config = context.config
+config.set_main_option("sqlalchemy.url", get_settings().DATABASE_URL.replace("%", "%%"))
+
+# Leave logging alone when called from the app (init_db passes a connection)
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+# Full-text search objects from migration 0006 are not in the models
+SEARCH_OBJECTS = {"search_vector", "ix_products_search_vector"}
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the search column, index and FTS tables out of autogenerate"""
+    if type_ == "table":
+        return not name.startswith("products_fts")
+    return name not in SEARCH_OBJECTS
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting (alembic upgrade --sql)"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations over a live connection"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        do_run_migrations(connection)
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite cannot ALTER most things in place
+        render_as_batch=connection.dialect.name == "sqlite",
+        # Index builds commit mid-migration (autocommit blocks), so each
+        # migration gets its own transaction and version bump
+        transaction_per_migration=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
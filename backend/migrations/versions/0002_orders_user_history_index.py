@@ -0,0 +1,60 @@
+"""Index a user's order history on (user_id, created_at, id)
+
+Serves the newest-first, cursor-paginated GET /api/orders without sorting a
+heavy buyer's orders in memory. It also covers plain user_id lookups, so
+the single-column ix_orders_user_id is dropped.
+
+On PostgreSQL the index is built CONCURRENTLY, so checkouts keep writing
+to orders while it builds.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_id_created_at_id",
+            "orders",
+            ["user_id", "created_at", "id"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_orders_user_id",
+            table_name="orders",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_id",
+            "orders",
+            ["user_id"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_orders_user_id_created_at_id",
+            table_name="orders",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,46 @@
+"""Queue table for write-behind popularity counters
+
+Checkout appends units sold here instead of updating products.popularity;
+app.db.popularity folds the rows into products in the background.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 20:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases adopted from create_all() (see 0001) may have it already
+    if sa.inspect(op.get_bind()).has_table("product_popularity_events"):
+        return
+    op.create_table(
+        "product_popularity_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    # Apply anything still queued before dropping the queue
+    op.execute(
+        "UPDATE products SET popularity = popularity + ("
+        "SELECT coalesce(sum(quantity), 0) FROM product_popularity_events "
+        "WHERE product_popularity_events.product_id = products.id)"
+    )
+    op.drop_table("product_popularity_events")
@@ -0,0 +1,46 @@
+"""Keyset pagination indexes for product sorts and admin order listings
+
+(sort column, id) for each product sort_by, and (created_at, id) /
+(status, created_at, id) for GET /api/admin/orders. Until now they only
+existed on databases whose tables were created from the models.
+
+On PostgreSQL the indexes are built CONCURRENTLY, so the catalog and
+checkouts keep working while they build.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_products_price_id", "products", ["price", "id"]),
+    ("ix_products_created_at_id", "products", ["created_at", "id"]),
+    ("ix_products_popularity_id", "products", ["popularity", "id"]),
+    ("ix_orders_created_at_id", "orders", ["created_at", "id"]),
+    ("ix_orders_status_created_at_id", "orders", ["status", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
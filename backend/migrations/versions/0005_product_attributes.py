@@ -0,0 +1,72 @@
+"""Product attributes: one row per product size and color
+
+The indexable copy of products.sizes and products.colors behind the
+size/color filters and facet counts (see app.db.attributes). Existing
+products are backfilled in batches.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+products = sa.table(
+    "products",
+    sa.column("id", sa.Integer()),
+    sa.column("sizes", sa.JSON()),
+    sa.column("colors", sa.JSON()),
+)
+
+
+def upgrade() -> None:
+    # Tables created from the models have it, filled, already
+    if sa.inspect(op.get_bind()).has_table("product_attributes"):
+        return
+
+    attributes = op.create_table(
+        "product_attributes",
+        sa.Column("kind", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("value", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("kind", "value", "product_id"),
+    )
+    op.create_index("ix_product_attributes_product_id", "product_attributes", ["product_id"])
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            sa.select(products.c.id, products.c.sizes, products.c.colors)
+            .where(products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        rows = []
+        for product_id, sizes, colors in batch:
+            rows += [{"kind": "size", "value": value, "product_id": product_id} for value in set(sizes or [])]
+            rows += [{"kind": "color", "value": value, "product_id": product_id} for value in set(colors or [])]
+        if rows:
+            connection.execute(attributes.insert(), rows)
+        last_id = batch[-1].id
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_attributes_product_id", table_name="product_attributes")
+    op.drop_table("product_attributes")
@@ -0,0 +1,48 @@
+"""Idempotency keys for checkout
+
+One row per (user, Idempotency-Key) sent to POST /api/orders: claimed
+while the order is placed, then holding the response replayed for
+repeats until it expires. Expired rows are purged in the background
+(app.db.idempotency).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 23:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "checkout_idempotency_keys",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("key", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("request_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("response_status", sa.Integer(), nullable=True),
+        sa.Column("response_body", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("locked_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "key"),
+    )
+    op.create_index(
+        "ix_checkout_idempotency_keys_expires_at", "checkout_idempotency_keys", ["expires_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_checkout_idempotency_keys_expires_at", table_name="checkout_idempotency_keys")
+    op.drop_table("checkout_idempotency_keys")
@@ -0,0 +1,46 @@
+"""Background job queue
+
+Durable queue for work done after a request returns, such as the
+follow-ups of a checkout. See app.db.jobs for how jobs are claimed,
+retried and completed.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "background_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_background_jobs_status_available_at", "background_jobs", ["status", "available_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_background_jobs_status_available_at", table_name="background_jobs")
+    op.drop_table("background_jobs")
@@ -0,0 +1,81 @@
+"""Product facet counts
+
+Active products per category, and per category and size, color or price
+bucket, behind the unfiltered facet counts (see app.db.facets). Filled
+from the existing products.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRICE_STEP = 100
+
+products = sa.table(
+    "products",
+    sa.column("id", sa.Integer()),
+    sa.column("category", sa.String()),
+    sa.column("price", sa.Float()),
+    sa.column("is_active", sa.Boolean()),
+)
+attributes = sa.table(
+    "product_attributes",
+    sa.column("kind", sa.String()),
+    sa.column("value", sa.String()),
+    sa.column("product_id", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    facet_counts = op.create_table(
+        "product_facet_counts",
+        sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("facet", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("value", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("products", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("category", "facet", "value"),
+    )
+
+    connection = op.get_bind()
+    bucket = products.c.price / sa.literal_column(repr(float(PRICE_STEP)))
+    if connection.dialect.name == "postgresql":
+        bucket = sa.func.floor(bucket)
+    bucket = sa.cast(bucket, sa.Integer)
+    active = products.c.is_active == sa.true()
+
+    parts = [
+        sa.select(products.c.category, sa.literal("category"), sa.literal(""), sa.func.count())
+        .where(active)
+        .group_by(products.c.category),
+        sa.select(products.c.category, sa.literal("price"), bucket, sa.func.count())
+        .where(active)
+        .group_by(products.c.category, bucket),
+        sa.select(products.c.category, attributes.c.kind, attributes.c.value, sa.func.count())
+        .select_from(attributes.join(products, products.c.id == attributes.c.product_id))
+        .where(active)
+        .group_by(products.c.category, attributes.c.kind, attributes.c.value),
+    ]
+    rows = [
+        {"category": category, "facet": facet, "value": str(value), "products": count}
+        for part in parts
+        for category, facet, value, count in connection.execute(part)
+    ]
+    if rows:
+        connection.execute(facet_counts.insert(), rows)
+
+
+def downgrade() -> None:
+    op.drop_table("product_facet_counts")
@@ -0,0 +1,45 @@
+"""Drop the popularity event queue
+
+The order_placed background job now adds units sold to products.popularity
+itself (see app.db.popularity). Events still queued are applied before
+the table goes.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only products with queued sales are touched
+    op.execute(
+        "UPDATE products SET popularity = popularity + ("
+        "SELECT sum(quantity) FROM product_popularity_events "
+        "WHERE product_popularity_events.product_id = products.id) "
+        "WHERE id IN (SELECT product_id FROM product_popularity_events)"
+    )
+    op.drop_table("product_popularity_events")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "product_popularity_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
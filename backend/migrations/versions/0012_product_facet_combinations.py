@@ -0,0 +1,103 @@
+"""Product facet combinations
+
+Active products per category, size, color and price slot, behind the
+facet counts of listings filtered by size, color or price (see
+app.db.facets). Filled from the existing products.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRICE_STEP = 100
+
+products = sa.table(
+    "products",
+    sa.column("id", sa.Integer()),
+    sa.column("category", sa.String()),
+    sa.column("price", sa.Float()),
+    sa.column("is_active", sa.Boolean()),
+)
+attributes = sa.table(
+    "product_attributes",
+    sa.column("kind", sa.String()),
+    sa.column("value", sa.String()),
+    sa.column("product_id", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    combinations = op.create_table(
+        "product_facet_combinations",
+        sa.Column("category", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("size", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("color", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("price_slot", sa.Integer(), nullable=False),
+        sa.Column("products", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("category", "size", "color", "price_slot"),
+    )
+    op.create_index(
+        "ix_product_facet_combinations_size_color", "product_facet_combinations", ["size", "color"]
+    )
+    op.create_index(
+        "ix_product_facet_combinations_color_size", "product_facet_combinations", ["color", "size"]
+    )
+
+    connection = op.get_bind()
+    bucket = products.c.price / sa.literal_column(repr(float(PRICE_STEP)))
+    if connection.dialect.name == "postgresql":
+        bucket = sa.func.floor(bucket)
+    bucket = sa.cast(bucket, sa.Integer)
+    # Twice the bucket, plus one unless the price is the bucket's lower bound
+    slot = 2 * bucket + sa.case((products.c.price == bucket * PRICE_STEP, 0), else_=1)
+
+    def values_or_any(kind: str):
+        return sa.union_all(
+            sa.select(attributes.c.product_id, attributes.c.value).where(attributes.c.kind == kind),
+            sa.select(products.c.id, sa.literal("")),
+        ).subquery()
+
+    sizes, colors = values_or_any("size"), values_or_any("color")
+    pairs = (
+        sa.select(
+            products.c.category,
+            sizes.c.value.label("size"),
+            colors.c.value.label("color"),
+            slot.label("price_slot"),
+        )
+        .select_from(
+            products
+            .join(sizes, sizes.c.product_id == products.c.id)
+            .join(colors, colors.c.product_id == products.c.id)
+        )
+        .where(products.c.is_active == sa.true())
+        .subquery()
+    )
+    key = (pairs.c.category, pairs.c.size, pairs.c.color, pairs.c.price_slot)
+    rows = [
+        {"category": category, "size": size, "color": color, "price_slot": price_slot, "products": count}
+        for category, size, color, price_slot, count in connection.execute(
+            sa.select(*key, sa.func.count()).group_by(*key)
+        )
+    ]
+    if rows:
+        connection.execute(combinations.insert(), rows)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_facet_combinations_color_size", table_name="product_facet_combinations")
+    op.drop_index("ix_product_facet_combinations_size_color", table_name="product_facet_combinations")
+    op.drop_table("product_facet_combinations")
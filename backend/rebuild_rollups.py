@@ -0,0 +1,39 @@
+"""
+Recompute the sales rollups from the orders
+
+    python rebuild_rollups.py                              # every day with orders
+    python rebuild_rollups.py --from 2026-01-01 --to 2026-02-01
+
+Needed once after upgrading to migration 0009, and after orders are loaded
+or corrected other than through checkout (seed.py runs it for the orders it
+generates). Each day is rebuilt in its own transaction, so it can run while
+the shop takes orders.
+"""
+import argparse
+import time
+from datetime import datetime
+
+from app.db.session import engine
+from app.db.rollups import rebuild_rollups
+
+
+def main(args):
+    """Rebuild the requested days and report how long it took"""
+    started = time.perf_counter()
+    days = rebuild_rollups(
+        engine,
+        start=args.start,
+        end=args.end,
+        progress=print if args.verbose else None,
+    )
+    print(f"✅ Rebuilt sales rollups for {days} days in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the sales rollups from the orders")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                        help="first day to rebuild (UTC; default: the first order)")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat,
+                        help="day to stop before (UTC; default: the day after the last order)")
+    parser.add_argument("--verbose", action="store_true", help="print progress per day")
+    main(parser.parse_args())
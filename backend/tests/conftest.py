@@ -0,0 +1,115 @@
+"""
+Shared fixtures for the backend tests.
+
+    python -m pytest
+
+The app is pointed at a throwaway SQLite database before it is imported,
+and is driven in-process through httpx's ASGI transport. Tests are plain
+functions that hand a coroutine to the `run` fixture.
+"""
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ecommerce-tests-"), "test.db")
+os.environ["DEBUG"] = "False"
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.core.security import get_password_hash  # noqa: E402
+from app.db.session import async_engine, engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+PASSWORD = "test-password"
+
+SHIPPING_ADDRESS = {
+    "shipping_name": "Test User",
+    "shipping_address_line1": "1 Test Road",
+    "shipping_city": "Pune",
+    "shipping_state": "MH",
+    "shipping_pincode": "411001",
+    "shipping_phone": "+910000000000",
+}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the schema once for the whole run"""
+    init_db()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop, closing the pooled
+    connections opened on it before the loop goes away"""
+    def run(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def make_client():
+    """In-process HTTP client bound to the ASGI app"""
+    def make() -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    return make
+
+
+@pytest.fixture
+def login():
+    """Log in and return the Authorization header"""
+    async def login(client: httpx.AsyncClient, email: str) -> dict:
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return login
+
+
+@pytest.fixture
+def order_body():
+    """Checkout request body for `quantity` of one product"""
+    def body(product_id: int, quantity: int = 1) -> dict:
+        return {
+            "items": [{"product_id": product_id, "quantity": quantity, "selected_size": "M"}],
+            "shipping_address": SHIPPING_ADDRESS,
+        }
+    return body
+
+
+@pytest.fixture
+def create_user():
+    """Insert a user directly; returns it"""
+    def create(email: str, is_admin: bool = False) -> User:
+        with Session(engine, expire_on_commit=False) as session:
+            user = User(email=email, password_hash=get_password_hash(PASSWORD), is_admin=is_admin)
+            session.add(user)
+            session.commit()
+            return user
+    return create
+
+
+@pytest.fixture
+def create_product():
+    """Insert an active product directly; returns it"""
+    def create(name: str, stock: int = 100, price: float = 499.0) -> Product:
+        with Session(engine, expire_on_commit=False) as session:
+            product = Product(
+                name=name, description=f"{name} for tests", price=price, category="Shirts",
+                sizes=["M", "L"], colors=["Blue"], images=[], stock=stock
+            )
+            session.add(product)
+            session.commit()
+            return product
+    return create
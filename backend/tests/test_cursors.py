@@ -0,0 +1,71 @@
+"""Keyset cursors (app.core.pagination) reject tampered values with a 400"""
+import base64
+import itertools
+import json
+
+import pytest
+
+EMAILS = (f"cursor-{i}@example.com" for i in itertools.count())
+
+
+def cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("payload", [
+    ["price_asc", [1], 1],
+    ["price_asc", 499.0, True],
+    ["price_asc", "499", 1],
+    ["newest", 1700000000, 1],
+    ["newest", {"at": "2026-01-01T00:00:00"}, 1],
+    ["popularity", 3, 1.5],
+])
+def test_tampered_product_cursor(run, make_client, create_product, payload):
+    create_product("Cursor Shirt")
+
+    async def scenario():
+        async with make_client() as client:
+            return await client.get(
+                "/api/products", params={"sort_by": payload[0], "cursor": cursor(payload)}
+            )
+
+    response = run(scenario())
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_product_cursor_round_trip(run, make_client, create_product):
+    for i in range(3):
+        create_product(f"Cursor Page Shirt {i}", price=100.0 + i)
+
+    async def scenario():
+        async with make_client() as client:
+            params = {"sort_by": "price_asc", "page_size": 1}
+            first = await client.get("/api/products", params=params)
+            second = await client.get(
+                "/api/products", params={**params, "cursor": first.json()["next_cursor"]}
+            )
+            return first, second
+
+    first, second = run(scenario())
+    assert second.status_code == 200, second.text
+    assert second.json()["products"][0]["id"] != first.json()["products"][0]["id"]
+
+
+@pytest.mark.parametrize("payload", [
+    ["orders", [{"dt": "2026-01-01T00:00:00"}], 1],
+    ["orders", {"at": "2026-01-01T00:00:00"}, 1],
+    ["orders", {"dt": "2026-01-01T00:00:00"}, {}],
+    ["orders", "2026-01-01T00:00:00", 1],
+])
+def test_tampered_order_cursor(run, make_client, login, create_user, payload):
+    user = create_user(next(EMAILS))
+
+    async def scenario():
+        async with make_client() as client:
+            headers = await login(client, user.email)
+            return await client.get("/api/orders", params={"cursor": cursor(payload)}, headers=headers)
+
+    response = run(scenario())
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,46 @@
+"""Streaming export encoders (app.core.export)"""
+import csv
+import io
+from datetime import datetime
+
+import orjson
+
+from app.core.export import csv_chunks, ndjson_chunks
+
+COLUMNS = ["id", "shipping_name", "total_amount", "created_at"]
+ROWS = [
+    (1, "=HYPERLINK(\"http://example.com\")", -12.5, datetime(2026, 1, 2, 3, 4, 5)),
+    (2, "@SUM(A1)", 10.0, datetime(2026, 1, 2, 3, 4, 5, 600)),
+    (3, "Plain Name", 20.0, datetime(2026, 1, 2)),
+]
+
+
+async def batches():
+    yield ROWS[:2]
+    yield ROWS[2:]
+
+
+async def collect(chunks) -> list:
+    return [chunk async for chunk in chunks]
+
+
+def test_csv_escapes_formula_cells(run):
+    text = "".join(run(collect(csv_chunks(COLUMNS, batches()))))
+    rows = list(csv.reader(io.StringIO(text)))
+
+    assert rows[0] == COLUMNS
+    assert [row[1] for row in rows[1:]] == ["'=HYPERLINK(\"http://example.com\")", "'@SUM(A1)", "Plain Name"]
+    # Only text is escaped; numbers keep their sign
+    assert rows[1][2] == "-12.5"
+    assert rows[2][3] == "2026-01-02T03:04:05.000600"
+
+
+def test_ndjson_rows(run):
+    chunks = run(collect(ndjson_chunks(COLUMNS, batches())))
+    rows = [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+
+    assert len(chunks) == 2
+    assert rows[0] == {
+        "id": 1, "shipping_name": ROWS[0][1], "total_amount": -12.5, "created_at": "2026-01-02T03:04:05"
+    }
+    assert rows[1]["created_at"] == "2026-01-02T03:04:05.000600"
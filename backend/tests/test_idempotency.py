@@ -0,0 +1,174 @@
+"""Checkout idempotency keys (Idempotency-Key on POST /api/orders)"""
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+import app.api.orders as orders_api
+from app.core.config import get_settings
+from app.db.session import engine
+from app.models.order import CheckoutIdempotencyKey, Order
+from app.models.product import Product
+
+DUPLICATES = 10
+
+
+def order_count(user_id: int) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Order).where(Order.user_id == user_id)).one()
+
+
+def stock(product_id: int) -> int:
+    with Session(engine) as session:
+        return session.get(Product, product_id).stock
+
+
+def age_claim(user_id: int, key: str) -> None:
+    """Make a claim old enough to be taken over"""
+    stale = timedelta(seconds=get_settings().IDEMPOTENCY_KEY_LOCK_TIMEOUT_SECONDS + 1)
+    with Session(engine) as session:
+        claim = session.get(CheckoutIdempotencyKey, (user_id, key))
+        claim.locked_at -= stale
+        session.add(claim)
+        session.commit()
+
+
+def test_concurrent_duplicates_place_one_order(run, make_client, login, create_user, create_product, order_body):
+    user = create_user("idempotency-concurrent@example.com")
+    product = create_product("Idempotency Concurrent Shirt", stock=50)
+
+    async def scenario():
+        async with make_client() as client:
+            headers = {**await login(client, user.email), "Idempotency-Key": "concurrent"}
+            return await asyncio.gather(*(
+                client.post("/api/orders", json=order_body(product.id, 2), headers=headers)
+                for _ in range(DUPLICATES)
+            ))
+
+    responses = run(scenario())
+
+    placed = [r for r in responses if r.status_code == 201 and "Idempotent-Replayed" not in r.headers]
+    assert len(placed) == 1
+    # The others saw the claim (409) or, once it completed, its response
+    for response in responses:
+        if response is not placed[0]:
+            assert response.status_code in (201, 409), response.text
+            if response.status_code == 201:
+                assert response.headers["Idempotent-Replayed"] == "true"
+                assert response.json() == placed[0].json()
+    assert order_count(user.id) == 1
+    assert stock(product.id) == 48
+
+
+def test_replay_returns_first_response(run, make_client, login, create_user, create_product, order_body):
+    user = create_user("idempotency-replay@example.com")
+    product = create_product("Idempotency Replay Shirt", stock=10)
+
+    async def scenario():
+        async with make_client() as client:
+            headers = {**await login(client, user.email), "Idempotency-Key": "replay"}
+            first = await client.post("/api/orders", json=order_body(product.id), headers=headers)
+            replay = await client.post("/api/orders", json=order_body(product.id), headers=headers)
+            return first, replay
+
+    first, replay = run(scenario())
+
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert order_count(user.id) == 1
+    assert stock(product.id) == 9
+
+
+def test_key_reused_for_another_order_is_rejected(run, make_client, login, create_user, create_product, order_body):
+    user = create_user("idempotency-mismatch@example.com")
+    product = create_product("Idempotency Mismatch Shirt", stock=10)
+
+    async def scenario():
+        async with make_client() as client:
+            headers = {**await login(client, user.email), "Idempotency-Key": "mismatch"}
+            first = await client.post("/api/orders", json=order_body(product.id, 1), headers=headers)
+            other = await client.post("/api/orders", json=order_body(product.id, 3), headers=headers)
+            return first, other
+
+    first, other = run(scenario())
+
+    assert first.status_code == 201
+    assert other.status_code == 422
+    assert order_count(user.id) == 1
+    assert stock(product.id) == 9
+
+
+def test_duplicate_while_first_is_running_gets_409(
+    run, make_client, login, create_user, create_product, order_body, monkeypatch
+):
+    user = create_user("idempotency-in-flight@example.com")
+    product = create_product("Idempotency In Flight Shirt", stock=10)
+    place_order = orders_api.place_order
+
+    async def scenario():
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        # Hold the first request after it has claimed the key
+        async def held_place_order(*args):
+            entered.set()
+            await release.wait()
+            return await place_order(*args)
+
+        monkeypatch.setattr(orders_api, "place_order", held_place_order)
+        async with make_client() as client:
+            headers = {**await login(client, user.email), "Idempotency-Key": "in-flight"}
+            first = asyncio.create_task(client.post("/api/orders", json=order_body(product.id), headers=headers))
+            await asyncio.wait_for(entered.wait(), timeout=10)
+            monkeypatch.setattr(orders_api, "place_order", place_order)
+
+            duplicate = await client.post("/api/orders", json=order_body(product.id), headers=headers)
+            release.set()
+            return await first, duplicate
+
+    first, duplicate = run(scenario())
+
+    assert duplicate.status_code == 409
+    assert duplicate.headers["Retry-After"] == "1"
+    assert first.status_code == 201
+    assert order_count(user.id) == 1
+    assert stock(product.id) == 9
+
+
+def test_request_whose_claim_was_taken_over_places_no_order(
+    run, make_client, login, create_user, create_product, order_body, monkeypatch
+):
+    user = create_user("idempotency-taken-over@example.com")
+    product = create_product("Idempotency Taken Over Shirt", stock=10)
+    place_order = orders_api.place_order
+
+    async def scenario():
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        async def held_place_order(*args):
+            entered.set()
+            await release.wait()
+            return await place_order(*args)
+
+        monkeypatch.setattr(orders_api, "place_order", held_place_order)
+        async with make_client() as client:
+            headers = {**await login(client, user.email), "Idempotency-Key": "taken-over"}
+            first = asyncio.create_task(client.post("/api/orders", json=order_body(product.id), headers=headers))
+            await asyncio.wait_for(entered.wait(), timeout=10)
+            monkeypatch.setattr(orders_api, "place_order", place_order)
+
+            # The first request looks crashed, so the retry takes the key over
+            age_claim(user.id, "taken-over")
+            retry = await client.post("/api/orders", json=order_body(product.id), headers=headers)
+            release.set()
+            return await first, retry
+
+    first, retry = run(scenario())
+
+    assert retry.status_code == 201, retry.text
+    assert first.status_code == 409
+    assert order_count(user.id) == 1
+    assert stock(product.id) == 9
@@ -0,0 +1,79 @@
+"""Statement budgets for the busiest endpoints (app.core.profiling.query_budget)
+
+Each budget is what the endpoint runs today for a request touching
+several rows, so a per-row query (an N+1 loop) breaks it. The user is
+looked up once beforehand, so the budgets leave the auth cache out.
+"""
+from app.core.catalog_cache import catalog_cache
+from app.core.profiling import query_budget
+
+CART_ITEMS = 3
+
+# Products, order, order items, stock lock, stock update and the follow-up
+# job. SQLite inserts the order items one row at a time (its RETURNING
+# order cannot be relied on); PostgreSQL inserts them in one statement.
+CHECKOUT_QUERIES = 6 + CART_ITEMS
+# Plus the key's lookup, its claim and the stored response
+IDEMPOTENT_CHECKOUT_QUERIES = CHECKOUT_QUERIES + 3
+ORDER_DETAIL_QUERIES = 1
+# Count and page
+PRODUCT_LIST_QUERIES = 2
+
+
+def cart(products, order_body) -> dict:
+    body = order_body(products[0].id)
+    body["items"] = [{"product_id": product.id, "quantity": 1, "selected_size": "M"} for product in products]
+    return body
+
+
+def test_checkout(run, make_client, login, create_user, create_product, order_body):
+    user = create_user("budget-checkout@example.com")
+    products = [create_product(f"Budget Checkout Shirt {i}") for i in range(CART_ITEMS)]
+
+    async def scenario():
+        async with make_client() as client:
+            headers = await login(client, user.email)
+            await client.get("/api/auth/me", headers=headers)
+            with query_budget(CHECKOUT_QUERIES):
+                plain = await client.post("/api/orders", json=cart(products, order_body), headers=headers)
+            with query_budget(IDEMPOTENT_CHECKOUT_QUERIES):
+                keyed = await client.post(
+                    "/api/orders", json=cart(products, order_body), headers={**headers, "Idempotency-Key": "budget"}
+                )
+            return plain, keyed
+
+    plain, keyed = run(scenario())
+    assert plain.status_code == 201, plain.text
+    assert keyed.status_code == 201, keyed.text
+
+
+def test_order_detail(run, make_client, login, create_user, create_product, order_body):
+    user = create_user("budget-detail@example.com")
+    products = [create_product(f"Budget Detail Shirt {i}") for i in range(CART_ITEMS)]
+
+    async def scenario():
+        async with make_client() as client:
+            headers = await login(client, user.email)
+            order = await client.post("/api/orders", json=cart(products, order_body), headers=headers)
+            with query_budget(ORDER_DETAIL_QUERIES):
+                return await client.get(f"/api/orders/{order.json()['id']}", headers=headers)
+
+    response = run(scenario())
+    assert response.status_code == 200, response.text
+    assert len(response.json()["items"]) == CART_ITEMS
+
+
+def test_product_list(run, make_client, create_product):
+    for i in range(5):
+        create_product(f"Budget Listing Shirt {i}")
+
+    async def scenario():
+        async with make_client() as client:
+            # A cached page would run no statements at all
+            catalog_cache.clear()
+            with query_budget(PRODUCT_LIST_QUERIES):
+                return await client.get("/api/products", params={"category": "Shirts", "page_size": 20})
+
+    response = run(scenario())
+    assert response.status_code == 200, response.text
+    assert len(response.json()["products"]) >= 5